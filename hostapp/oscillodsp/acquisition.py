@@ -0,0 +1,204 @@
+"""
+Acquisition Worker
+
+
+Copyright (c) 2020-2021, Chubu University and Firmlogics
+
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this
+   list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation
+   and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+import threading
+import time
+from collections import deque
+
+DEFAULT_RING_SIZE = 8  # frames
+
+
+class Frame:  # pylint: disable=too-few-public-methods,
+    # pylint: disable=too-many-instance-attributes
+    """
+    A WaveGroup acquired from the peer DSP, together with the settings which
+    were effective when it was acquired
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments,
+        # pylint: disable=too-many-positional-arguments
+        self,
+        seq,
+        waves,
+        config_seq,
+        config_reply,
+        timescale,
+        acq_time,
+        decode_time=0.0,
+    ):
+        self.seq = seq
+        self.waves = waves
+        self.config_seq = config_seq
+        self.config_reply = config_reply
+        self.timescale = timescale
+        self.acq_time = acq_time  # seconds spent by get_waves()
+        self.decode_time = decode_time  # part of acq_time spent to decode
+        self.timestamp = time.time()
+
+
+class FrameRing:
+    """
+    Bounded ring of frames with drop-oldest semantics
+
+    The producer (acquisition thread) and the consumer (renderer) don't need
+    any lock, because deque.append() and deque[-1] are atomic in CPython.
+    The consumer only takes the newest frame, and frames which were
+    overwritten or skipped are counted as dropped.
+    """
+
+    def __init__(self, size=DEFAULT_RING_SIZE):
+        self.frames = deque(maxlen=size)
+        self.last_seq = -1  # sequence number of the frame taken last
+        self.dropped = 0
+
+    def push(self, frame):
+        self.frames.append(frame)
+
+    def latest(self):
+        """
+        Return the newest frame which hasn't been taken yet, or None
+        """
+        try:
+            frame = self.frames[-1]
+        except IndexError:
+            return None
+
+        if frame.seq <= self.last_seq:
+            return None
+
+        if self.last_seq >= 0:
+            self.dropped += frame.seq - self.last_seq - 1
+        self.last_seq = frame.seq
+        return frame
+
+
+class Acquisition(  # pylint: disable=too-many-instance-attributes
+    threading.Thread
+):
+    """
+    Worker thread which owns a DSP object, repeats get_waves() at link speed
+    and pushes the frames into a FrameRing
+
+    Once started, no other thread may talk to the DSP object.  Configuration
+    changes are requested by request_config() and applied by the worker
+    between frames.  If communication fails, the exception is kept in
+    'error' and the worker exits.
+
+    Targets which replay frames (e.g. playback.Playback) may tell the
+    configuration of each frame by 'config_reply' and 'timescale'
+    attributes, and return None from get_waves() while no frame is due.
+
+    If 'recorder' is set (e.g. recorder.Recorder), recorder.record() is
+    called with every frame.  It may be set or cleared at any time.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments,
+        # pylint: disable=too-many-positional-arguments
+        self,
+        target,
+        config_reply,
+        timescale,
+        ring_size=DEFAULT_RING_SIZE,
+        logger=None,
+    ):
+        super().__init__(daemon=True)
+
+        self.target = target
+        self.config_reply = config_reply
+        self.timescale = timescale
+        self.ring = FrameRing(ring_size)
+        self.logger = logger
+
+        self.config_requests = deque(maxlen=1)  # only the last one matters
+        self.config_seq = 0
+        self.seq = 0
+        self.error = None
+        self.stop_requested = False
+        self.recorder = None
+
+    def request_config(self, **kwargs):
+        """
+        Ask the worker to call DSP.config(**kwargs) before the next frame.
+        Return the configuration sequence number which frames acquired with
+        the new configuration will have.
+        """
+        self.config_seq += 1
+        self.config_requests.append((self.config_seq, kwargs))
+        return self.config_seq
+
+    def latest(self):
+        return self.ring.latest()
+
+    def run(self):
+        config_seq = 0
+
+        try:
+            while not self.stop_requested:
+                try:
+                    config_seq, kwargs = self.config_requests.pop()
+                except IndexError:
+                    pass
+                else:
+                    self.config_reply = self.target.config(**kwargs)
+                    if kwargs.get("timescale"):
+                        self.timescale = kwargs["timescale"]
+
+                start = time.time()
+                waves = self.target.get_waves()
+                if waves is None:
+                    continue
+                frame = Frame(
+                    self.seq,
+                    waves,
+                    config_seq,
+                    getattr(self.target, "config_reply", self.config_reply),
+                    getattr(self.target, "timescale", self.timescale),
+                    time.time() - start,
+                    getattr(self.target, "decode_time", 0.0),
+                )
+                self.ring.push(frame)
+                self.seq += 1
+
+                recorder = self.recorder
+                if recorder:
+                    recorder.record(frame)
+        except Exception as err:  # pylint: disable=broad-exception-caught
+            if self.logger:
+                self.logger.debug(f"Acquisition stopped by error: {err}")
+            self.error = err
+
+    def stop(self):
+        """
+        Stop the worker and wait for it.  The DSP object can be used by the
+        caller again after this returns.
+        """
+        self.stop_requested = True
+        if self.is_alive():
+            self.join()
@@ -0,0 +1,161 @@
+"""
+asyncio Client of DSP
+
+AsyncDSP provides awaitable config() and get_waves(), so that an asyncio
+event loop (e.g. of a Jupyter kernel) isn't blocked while waiting for the
+DSP.  Replies are awaited by the event loop watching the file descriptor
+of the interface if possible (sockets and POSIX serial ports), and
+otherwise the blocking DSP methods run in a worker thread.
+
+
+
+Copyright (c) 2020-2021, Chubu University and Firmlogics
+
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this
+   list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation
+   and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+import asyncio
+import functools
+import io
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from . import dsp  # pylint: disable=no-name-in-module
+
+
+class AsyncDSP:
+    """
+    asyncio counterpart of dsp.DSP
+
+    Arguments of the constructor are the same as those of DSP.  The
+    wrapped DSP object is 'dsp', which may be used directly before any
+    coroutine of AsyncDSP runs (e.g. for the first configuration).
+    Coroutines may be awaited by several tasks, but are served one by
+    one.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.dsp = dsp.DSP(*args, **kwargs)
+        self.lock = asyncio.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.frames = deque()  # frames received but not returned yet
+        try:
+            self.fd = self.dsp.fileno()
+        except io.UnsupportedOperation:
+            self.fd = None  # get_waves() runs in the worker thread
+
+    def get_logger(self):
+        return self.dsp.get_logger()
+
+    async def run(self, func, *args, **kwargs):
+        """
+        Run a blocking method of DSP in the worker thread
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, functools.partial(func, *args, **kwargs)
+        )
+
+    async def config(self, **kwargs):
+        """
+        Counterpart of DSP.config()
+        """
+        async with self.lock:
+            # Frames acquired with the previous configuration are stale
+            self.frames.clear()
+            return await self.run(self.dsp.config, **kwargs)
+
+    async def echo_request(self, content):
+        """
+        Counterpart of DSP.echo_request()
+        """
+        async with self.lock:
+            self.frames.clear()
+            return await self.run(self.dsp.echo_request, content)
+
+    async def get_waves(self):
+        """
+        Counterpart of DSP.get_waves().  GetWaveGroup requests are kept in
+        flight as many as pipeline_depth of DSP.
+        """
+        async with self.lock:
+            if self.fd is None:
+                return await self.run(self.dsp.get_waves)
+
+            try:
+                return await self.poll_waves()
+            except NotImplementedError:
+                # The event loop can't watch file descriptors (e.g. the
+                # proactor loop on Windows)
+                self.fd = None
+                return await self.run(self.dsp.get_waves)
+            except TimeoutError:
+                # Same as DSP.get_waves(), request again only once
+                self.dsp.logger.warning("Timeout.  Requesting waves again")
+                self.dsp.discard()
+                return await self.poll_waves()
+
+    async def poll_waves(self):
+        """
+        Wait for frames by the event loop, and return the oldest one
+        """
+        if not self.frames:
+            self.dsp.send_requests()
+        while not self.frames:
+            await self.wait_readable()
+            self.frames.extend(self.dsp.poll_waves())
+        return self.frames.popleft()
+
+    async def wait_readable(self):
+        """
+        Wait until the interface has bytes to read
+        """
+        loop = asyncio.get_running_loop()
+        readable = loop.create_future()
+
+        def callback():
+            if not readable.done():
+                readable.set_result(None)
+
+        loop.add_reader(self.fd, callback)
+        try:
+            await asyncio.wait_for(readable, dsp.DEFAULT_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError as err:
+            raise TimeoutError("Timeout.  No response from DSP.") from err
+        finally:
+            loop.remove_reader(self.fd)
+
+    def terminate(self):
+        """
+        Counterpart of DSP.terminate().  It doesn't wait for anything.
+        """
+        self.frames.clear()
+        self.dsp.terminate()
+
+    def close(self):
+        """
+        Stop the worker thread and close the interface
+        """
+        self.executor.shutdown()
+        self.dsp.transport.close()
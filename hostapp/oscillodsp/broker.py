@@ -0,0 +1,618 @@
+"""
+Fan-out Broker
+
+The broker owns the connection to the peer DSP, and shares its frames with
+local clients (viewers, capture, etc.) connected by TCP or Unix-domain
+sockets.  As the broker speaks the same protocol as the DSP, a client
+connects to the broker by its socket URL as if it were the DSP.
+
+    $ python -m oscillodsp.broker /dev/ttyUSB0 -l unix:///tmp/oscillo.sock
+    $ python -m oscillodsp.capture unix:///tmp/oscillo.sock -o run1.rec
+
+Ownership of the configuration:
+    The client which has been connected longest owns the configuration.
+    Configure from the owner is applied to the DSP.  Configure from other
+    clients sets only their own resolution and framing (CRC and packed
+    samples), and is answered with the configuration in effect.  When the
+    owner disconnects, the next oldest client becomes the owner.  Terminate
+    is ignored, as the DSP is shared.
+
+Rates:
+    Each client receives frames at its own pace.  A reply to GetWaveGroup
+    is the newest frame which the client hasn't received yet, and
+    StartStream.max_rate limits the rate of streaming.  Frames aren't
+    queued for a client whose socket can't take them now (a slow client),
+    but skipped, so that no client slows down the DSP link or the others.
+
+Samples are offered to clients only as plain varints or packed 16-bit
+samples.
+
+Shared memory:
+    With --shm, frames are also written to a shmring.SharedFrameRing of the
+    name, which consumers on the same host attach to read frames without
+    sockets nor copying.
+
+    $ python -m oscillodsp.broker /dev/ttyUSB0 --shm oscillo
+
+
+
+
+Copyright (c) 2020-2021, Chubu University and Firmlogics
+
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this
+   list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation
+   and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+import argparse
+import logging
+import os
+import selectors
+import signal
+import socket
+import sys
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+import numpy as np
+from google.protobuf.message import DecodeError
+
+from . import dsp  # pylint: disable=no-name-in-module
+from . import oscillodsp_pb2  # pylint: disable=no-name-in-module
+from .recorder import frame_samples
+from .session import POLL_INTERVAL_SEC, Session
+from .shmring import DEFAULT_SAMPLES, DEFAULT_SLOTS, SharedFrameRing
+from .transport import MAX_MESSAGE_TO_DSP_BYTES, FrameReader, frame_message
+
+DEFAULT_LISTEN_URL = "tcp://127.0.0.1:5556"
+DEFAULT_BITRATE = 115200  # not used by sockets
+DEFAULT_RESOLUTION = 16
+DEFAULT_PIPELINE_DEPTH = 4
+PACKED_SAMPLE_BITS = 16  # ConfigReply.sample_bits offered to clients
+
+
+class BrokerClient:  # pylint: disable=too-many-instance-attributes
+    """
+    A client connected to Broker, with the settings it has requested
+    """
+
+    def __init__(self, sock, name):
+        self.sock = sock
+        self.name = name
+        self.reader = FrameReader(
+            self.recv_into, max_length=MAX_MESSAGE_TO_DSP_BYTES
+        )
+        self.out = bytearray()  # bytes not sent yet
+        self.crc = False
+        self.sample_bits = 0  # ConfigReply.sample_bits, 0 for varints
+        self.resolution = None  # requested by Configure
+        self.requests = deque()  # IDs of GetWaveGroup waiting for frames
+        self.stream_id = None  # ID of StartStream while streaming
+        self.stream_interval = 0.0  # seconds between streamed frames
+        self.last_seq = -1  # sequence number of the frame sent last
+        self.last_sent = 0.0  # time.monotonic() when it was sent
+        self.skipped = 0  # frames not sent as the socket was full
+
+    def recv_into(self, view):
+        n = self.sock.recv_into(view)
+        if n == 0:
+            raise ConnectionError("Connection closed by client")
+        return n
+
+    def send(self, payload):
+        """
+        Queue a serialized MessageToHost, and send queued bytes as many as
+        the socket takes now
+        """
+        self.out += frame_message(payload, self.crc)
+        self.flush()
+
+    def flush(self):
+        if self.out:
+            try:
+                n = self.sock.send(self.out)
+            except BlockingIOError:
+                n = 0
+            del self.out[:n]
+
+
+class Broker(Session):
+    """
+    Worker thread which owns a DSP object (as Session does) and serves its
+    frames to clients
+
+    The DSP is added by add() and the sockets to listen on by listen(),
+    before start().  If communication with the DSP fails, the exception is
+    kept in 'error' of the target, and the worker disconnects the clients
+    and exits.
+    """
+
+    def __init__(self, timeout=dsp.DEFAULT_TIMEOUT_SECONDS, logger=None):
+        super().__init__(timeout, logger)
+
+        self.resolution = None  # of samples from the DSP
+        self.listeners = []
+        self.clients = []  # in order of connection.  The first one owns.
+        self.cache = (None, {})  # (seq, serialized WaveGroups by settings)
+        self.shmring = None  # SharedFrameRing which frames are written to
+
+    def add(  # pylint: disable=arguments-differ,arguments-renamed,
+        # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self,
+        name,
+        target,
+        config_reply,
+        timescale,
+        resolution,
+    ):
+        """
+        Add the configured DSP object and return its SessionTarget
+        @param resolution is the resolution which the DSP is configured with
+        """
+        if self.targets:
+            raise RuntimeError("a broker has only one target")
+        self.resolution = resolution
+        return super().add(name, target, config_reply, timescale)
+
+    def listen(self, url):
+        """
+        Listen on the socket of the URL (tcp://host:port or unix://path),
+        and return the URL (with the port bound if it was 0)
+        """
+        parts = urlsplit(url)
+        if parts.scheme == "tcp":
+            sock = socket.create_server((parts.hostname or "", parts.port))
+            url = f"tcp://{parts.hostname}:{sock.getsockname()[1]:d}"
+        elif parts.scheme == "unix":
+            if os.path.exists(parts.path):
+                # Left by a broker which didn't exit cleanly
+                os.unlink(parts.path)
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.bind(parts.path)
+            sock.listen()
+        else:
+            raise ValueError(f"{url} isn't a socket URL")
+
+        sock.setblocking(False)
+        self.selector.register(sock, selectors.EVENT_READ)
+        self.listeners.append(sock)
+        return url
+
+    def share(self, name=None, n_slots=DEFAULT_SLOTS):
+        """
+        Write frames also to a SharedFrameRing of the name, and return it.
+        The ring is removed when the broker stops.
+        """
+        entry = self.targets[0]
+        self.shmring = SharedFrameRing.create(
+            len(entry.config_reply.chconfig),
+            self.resolution,
+            n_samples=DEFAULT_SAMPLES,
+            n_slots=n_slots,
+            name=name,
+        )
+        entry.recorder = self.shmring
+        return self.shmring
+
+    def owner(self):
+        return self.clients[0] if self.clients else None
+
+    def run(self):
+        entry = self.targets[0]
+        self.service(entry, entry.target.send_requests)
+
+        while not self.stop_requested and entry.error is None:
+            for key, events in self.selector.select(POLL_INTERVAL_SEC):
+                if key.data is entry:
+                    self.service(entry, self.poll, entry)
+                elif key.data is None:
+                    self.accept(key.fileobj)
+                else:
+                    self.serve(key.data, events)
+
+            now = time.monotonic()
+            if entry.error is None:
+                self.service(entry, self.check, entry, now)
+            if entry.error is None:
+                self.service(entry, self.publish, entry, now)
+
+        if entry.error is None:
+            entry.target.drain()
+        for client in list(self.clients):
+            self.disconnect(client)
+        for sock in self.listeners:
+            if sock.family == getattr(socket, "AF_UNIX", None):
+                os.unlink(sock.getsockname())
+            sock.close()
+        self.selector.close()
+        if self.shmring is not None:
+            self.shmring.close()
+
+    def accept(self, listener):
+        try:
+            sock, addr = listener.accept()
+        except BlockingIOError:
+            return
+        sock.setblocking(False)
+        if sock.family in [socket.AF_INET, socket.AF_INET6]:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        if addr:
+            name = f"{addr[0]}:{addr[1]:d}"
+        else:
+            name = f"unix client {sock.fileno():d}"
+        client = BrokerClient(sock, name)
+        self.selector.register(sock, selectors.EVENT_READ, client)
+        self.clients.append(client)
+        self.log(
+            "%s connected%s",
+            client.name,
+            " (owner)" if client is self.owner() else "",
+        )
+
+    def disconnect(self, client):
+        self.selector.unregister(client.sock)
+        client.sock.close()
+        was_owner = client is self.owner()
+        self.clients.remove(client)
+        self.log(
+            "%s disconnected (%d frames skipped)", client.name, client.skipped
+        )
+        if was_owner and self.clients:
+            self.log("%s is the owner now", self.owner().name)
+
+    def log(self, *args):
+        if self.logger:
+            self.logger.info(*args)
+
+    def serve(self, client, events):
+        """
+        Handle messages from the client, and send bytes queued for it
+        """
+        try:
+            if events & selectors.EVENT_READ:
+                client.reader.feed()
+                while True:
+                    s = client.reader.parse()
+                    if s is None:
+                        break
+                    msg = oscillodsp_pb2.MessageToDSP()
+                    msg.ParseFromString(s)
+                    self.handle(client, msg)
+            client.flush()
+        except (OSError, DecodeError) as err:
+            self.log("%s: %s", client.name, err)
+            self.disconnect(client)
+            return
+
+        self.selector.modify(
+            client.sock,
+            selectors.EVENT_READ
+            | (selectors.EVENT_WRITE if client.out else 0),
+            client,
+        )
+
+    def handle(self, client, msg):
+        """
+        Handle a message from the client
+        """
+        reply = oscillodsp_pb2.MessageToHost()
+        reply.id = msg.id
+        payload = msg.WhichOneof("payload")
+        if payload == "getwave":
+            client.requests.append(msg.id)
+            return
+        if payload == "config":
+            self.configure(client, msg, reply)
+            return
+
+        if payload == "echoreq":
+            reply.echorep.content = msg.echoreq.content
+        elif payload == "startstream":
+            client.requests.clear()
+            client.stream_id = msg.id
+            rate = msg.startstream.max_rate
+            client.stream_interval = 1.0 / rate if rate > 0 else 0.0
+            reply.ack.err = oscillodsp_pb2.NoError
+        elif payload == "stopstream":
+            client.stream_id = None
+            reply.ack.err = oscillodsp_pb2.NoError
+        else:
+            self.log("%s: %s is ignored", client.name, payload)
+            return
+        client.send(reply.SerializeToString())
+
+    def configure(self, client, msg, reply):
+        """
+        Apply Configure of the owner to the DSP, and reply the configuration
+        in effect with the framing requested by the client
+        """
+        entry = self.targets[0]
+        config = msg.config
+        if client is self.owner():
+            self.service(entry, self.apply, entry, config, reply)
+            if entry.error is not None:
+                return
+        else:
+            self.log(
+                "%s isn't the owner.  Only its resolution is applied.",
+                client.name,
+            )
+            reply.configreply.CopyFrom(entry.config_reply)
+
+        for field in ["crc", "sample_bits", "encoding"]:
+            reply.configreply.ClearField(field)
+        if config.crc:
+            reply.configreply.crc = True
+        if config.compact and config.resolution <= PACKED_SAMPLE_BITS:
+            reply.configreply.sample_bits = PACKED_SAMPLE_BITS
+        client.send(reply.SerializeToString())
+
+        # Following messages are framed and packed as replied, and only
+        # frames acquired after the configuration are sent
+        client.crc = config.crc
+        client.sample_bits = reply.configreply.sample_bits
+        client.resolution = config.resolution
+        client.requests.clear()
+        client.stream_id = None
+        client.last_seq = max(client.last_seq, entry.seq - 1)
+
+    def apply(self, entry, config, reply):
+        """
+        Configure the DSP as Configure of the owner, and put the result into
+        the reply.  If the DSP refuses it, the configuration in effect is
+        kept.
+        """
+        try:
+            entry.config_reply = entry.target.config(
+                resolution=config.resolution,
+                trigmode=config.trigmode,
+                trigtype=config.trigtype,
+                ch_trig=config.ch_trig,
+                triglevel=config.triglevel,
+                timescale=config.timescale,
+            )
+        except RuntimeError:
+            reply.configreply.CopyFrom(entry.config_reply)
+            reply.configreply.err = oscillodsp_pb2.ConfigError
+        else:
+            reply.configreply.CopyFrom(entry.config_reply)
+            self.resolution = config.resolution
+            if self.shmring is not None:
+                self.shmring.resolution = config.resolution
+            if config.timescale:
+                entry.timescale = config.timescale
+            entry.config_seq += 1
+            entry.applied_config_seq = entry.config_seq
+
+            # Frames acquired before may have another resolution
+            for client in self.clients:
+                client.last_seq = max(client.last_seq, entry.seq - 1)
+
+        entry.target.send_requests()
+        entry.last_time = time.monotonic()
+
+    def publish(self, entry, now):
+        """
+        Send the newest frame to clients which are waiting for it
+        """
+        try:
+            frame = entry.ring.frames[-1]
+        except IndexError:
+            return
+
+        for client in list(self.clients):
+            if frame.seq <= client.last_seq:
+                continue
+            if client.stream_id is not None:
+                if now - client.last_sent < client.stream_interval:
+                    continue
+            elif not client.requests:
+                continue
+
+            client.last_seq = frame.seq
+            if client.out:
+                # The client hasn't taken the previous frame yet
+                client.skipped += 1
+                continue
+
+            id_ = client.stream_id
+            if id_ is None:
+                id_ = client.requests.popleft()
+            try:
+                client.send(
+                    oscillodsp_pb2.MessageToHost(id=id_).SerializeToString()
+                    + self.wavegroup(frame, client)
+                )
+            except OSError as err:
+                self.log("%s: %s", client.name, err)
+                self.disconnect(client)
+                continue
+            client.last_sent = now
+            if client.out:
+                self.selector.modify(
+                    client.sock,
+                    selectors.EVENT_READ | selectors.EVENT_WRITE,
+                    client,
+                )
+
+    def wavegroup(self, frame, client):
+        """
+        Return the 'wavegroup' field of MessageToHost serialized for the
+        frame and the settings of the client.  It is appended to the
+        serialized 'id' field, and cached while the frame is the newest.
+        A frame without waves (not triggered yet) is forwarded as is.
+        """
+        key = (client.resolution, client.sample_bits)
+        if self.cache[0] != frame.seq:
+            self.cache = (frame.seq, {})
+        if key in self.cache[1]:
+            return self.cache[1][key]
+
+        msg = oscillodsp_pb2.MessageToHost()
+        msg.wavegroup.triggered = bool(frame.waves.triggered)
+        if len(frame.waves.wave) == 0:
+            s = msg.SerializePartialToString()
+            self.cache[1][key] = s
+            return s
+
+        ch_ids, samples = frame_samples(frame.waves)
+        if client.resolution and client.resolution != self.resolution:
+            shift = client.resolution - self.resolution
+            samples = samples.astype(np.int32)
+            if shift > 0:
+                samples <<= shift
+            else:
+                samples >>= -shift
+
+        for ch_id, row in zip(ch_ids.tolist(), samples):
+            wave = msg.wavegroup.wave.add()
+            wave.ch_id = ch_id
+            if client.sample_bits:
+                wave.packed_samples = row.astype("<i2").tobytes()
+            else:
+                wave.samples.extend(row.tolist())
+        s = msg.SerializePartialToString()  # without 'id'
+        self.cache[1][key] = s
+        return s
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m oscillodsp.broker",
+        description="Share an OscilloDSP with local clients",
+    )
+    parser.add_argument("interface", help="serial port or socket URL")
+    parser.add_argument(
+        "-l",
+        "--listen",
+        action="append",
+        metavar="URL",
+        help=(
+            "tcp://host:port or unix://path to listen on (may be repeated, "
+            f"default: {DEFAULT_LISTEN_URL})"
+        ),
+    )
+    parser.add_argument(
+        "-b", "--bitrate", type=int, default=DEFAULT_BITRATE, help="bitrate"
+    )
+    parser.add_argument(
+        "-r",
+        "--resolution",
+        type=int,
+        default=DEFAULT_RESOLUTION,
+        help="quantization bits of samples until the owner configures",
+    )
+    parser.add_argument(
+        "--pipeline-depth",
+        type=int,
+        default=DEFAULT_PIPELINE_DEPTH,
+        help="requests kept in flight to DSP",
+    )
+    parser.add_argument(
+        "--shm",
+        metavar="NAME",
+        help="write frames also to a shared-memory ring of the name",
+    )
+    parser.add_argument(
+        "--shm-slots",
+        type=int,
+        default=DEFAULT_SLOTS,
+        help="frames kept in the shared-memory ring",
+    )
+    parser.add_argument(
+        "-v", "--verbose", action="store_true", help="print DSP driver logs"
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    logger = logging.getLogger("broker")
+    logger.setLevel(logging.INFO)
+    logger.addHandler(logging.StreamHandler())
+
+    broker = Broker(logger=logger)
+    try:
+        peer = dsp.DSP(
+            args.interface,
+            args.bitrate,
+            loglevel=logging.INFO if args.verbose else logging.WARNING,
+            console_handler=logging.StreamHandler(),
+            file_handler=logging.NullHandler(),
+            pipeline_depth=args.pipeline_depth,
+            fast_decode=True,
+            crc=True,
+            compact=True,
+        )
+        config_reply = peer.config(
+            resolution=args.resolution,
+            trigmode=oscillodsp_pb2.Auto,
+            trigtype=oscillodsp_pb2.RisingEdge,
+        )
+        # A selector must be able to watch the interface
+        broker.add(
+            args.interface,
+            peer,
+            config_reply,
+            config_reply.default_timescale,
+            args.resolution,
+        )
+        for url in args.listen or [DEFAULT_LISTEN_URL]:
+            logger.info("Listening on %s", broker.listen(url))
+        if args.shm:
+            broker.share(args.shm, args.shm_slots)
+            logger.info("Writing frames to shared memory %s", args.shm)
+    except (OSError, RuntimeError, ValueError) as err:
+        # Including time-out
+        logger.error("Can't start the broker: %s", err)
+        return 1
+
+    broker.start()
+    interrupted = False
+    try:
+        # Not by join(), which may leave the thread looking stopped if
+        # interrupted
+        while broker.is_alive():
+            time.sleep(POLL_INTERVAL_SEC)
+    except KeyboardInterrupt:
+        interrupted = True
+    broker.stop()
+
+    error = broker.targets[0].error
+    if error is not None:
+        logger.error("Broker stopped by error: %s", error)
+        return 1
+    if not interrupted:
+        # The worker has died by an exception which it didn't catch
+        logger.error("Broker stopped unexpectedly")
+        return 1
+    peer.transport.close()
+    return 0
+
+
+if __name__ == "__main__":
+    # Stop by SIGTERM (e.g. from a service manager) as by Ctrl-C
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    sys.exit(main())
@@ -0,0 +1,606 @@
+"""
+Headless Capture
+
+Frames are streamed from the peer DSP to a file or the standard output at
+link speed, without any GUI, e.g. for unattended logging on a rack PC.
+
+    $ python -m oscillodsp.capture tcp://192.168.1.10:5555 -o run1.rec
+    $ python -m oscillodsp.capture /dev/ttyUSB0 -f csv -n 100 > waves.csv
+
+Formats:
+    bin: A recording of recorder.Recorder (data file and index), which can
+         be replayed by QtOscillo.  To the standard output, only records of
+         the data file are written, as the index needs seeking.
+    npz: NumPy arrays of all frames, written when the capture ends.  The
+         frames are kept in memory until then.
+    csv: A row per sample, which has the frame number, time in the frame
+         and physical values of channels.
+
+Frames without waves, which the DSP returns while the normal or single
+trigger mode waits for a trigger, are not written.
+
+Throughput is printed to the standard error every second.
+
+
+
+
+Copyright (c) 2020-2021, Chubu University and Firmlogics
+
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this
+   list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation
+   and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+import argparse
+import logging
+import os
+import signal
+import sys
+import time
+
+import numpy as np
+
+from . import dsp  # pylint: disable=no-name-in-module
+from . import export  # pylint: disable=no-name-in-module
+from . import oscillodsp_pb2  # pylint: disable=no-name-in-module
+from . import recorder  # pylint: disable=no-name-in-module
+from .acquisition import Frame
+from .dequantize import get_dequantizer
+from .governor import RateMeter
+
+DEFAULT_BITRATE = 115200  # not used by sockets
+DEFAULT_RESOLUTION = 16
+DEFAULT_PIPELINE_DEPTH = 4
+
+TRIGGER_MODES = {
+    "auto": oscillodsp_pb2.Auto,
+    "normal": oscillodsp_pb2.Normal,
+    "single": oscillodsp_pb2.Single,
+}
+TRIGGER_TYPES = {
+    "rising": oscillodsp_pb2.RisingEdge,
+    "falling": oscillodsp_pb2.FallingEdge,
+}
+ENCODINGS = {
+    "plain": oscillodsp_pb2.Plain,
+    "sample-delta": oscillodsp_pb2.SampleDelta,
+    "frame-delta": oscillodsp_pb2.FrameDelta,
+}
+FORMATS = ["bin", "npz", "csv"]
+
+
+class RecordingSink:
+    """
+    Sink which writes frames to a recording by a recorder.Recorder thread
+
+    If the writer can't keep up, frames are dropped and counted in
+    'dropped'.
+    """
+
+    keeps_frames = True  # frames are queued to the writer thread
+
+    def __init__(self, filename, resolution, logger=None):
+        self.recorder = recorder.Recorder(filename, resolution, logger=logger)
+        self.recorder.start()
+
+    @property
+    def dropped(self):
+        return self.recorder.dropped
+
+    def write(self, frame):
+        self.check_error()
+        self.recorder.record(frame)
+
+    def close(self):
+        self.recorder.stop()
+        self.check_error()
+
+    def check_error(self):
+        """
+        Raise the error which stopped the writer thread if any.  Errors
+        other than OSError are raised as RuntimeError.
+        """
+        err = self.recorder.error
+        if isinstance(err, OSError):
+            raise err
+        if err is not None:
+            raise RuntimeError(f"Recorder stopped by error: {err!r}") from err
+
+
+class StreamSink:
+    """
+    Sink which writes records of the data file of a recording (see
+    recorder.py) to a binary stream, e.g. the standard output
+    """
+
+    keeps_frames = False
+
+    def __init__(self, f, resolution):
+        self.f = f
+        self.encoder = recorder.RecordEncoder(resolution)
+        self.buf = bytearray(
+            recorder.FILE_HEADER.pack(
+                recorder.FILE_MAGIC, recorder.FORMAT_VERSION
+            )
+        )
+        self.offset = 0  # stream offset of self.buf
+        self.dropped = 0
+
+    def write(self, frame):
+        self.encoder.encode(frame, self.buf, self.offset)
+        self.f.write(self.buf)
+        self.offset += len(self.buf)
+        self.buf.clear()
+
+    def close(self):
+        self.f.flush()
+
+
+class NpzSink:  # pylint: disable=too-many-instance-attributes
+    """
+    Sink which keeps frames in memory and writes them to an NPZ file at the
+    end
+
+    The file has arrays 'samples' (frames x channels x samples), 'seq',
+    'timestamp', 'triggered', 'timescale', 'n_channels' and 'n_samples' of
+    frames, 'ch_id' of the first frame, and 'resolution', 'samplerate',
+    'ch_name', 'ch_unit', 'ch_min' and 'ch_max' of the configuration.
+    Frames with fewer channels or samples than others are padded with
+    zeros, up to their 'n_channels' and 'n_samples'.
+    """
+
+    keeps_frames = False  # samples are copied
+
+    def __init__(self, f, resolution):
+        """
+        @param f is a filename or a binary stream
+        """
+        self.f = f
+        self.resolution = resolution
+        self.dtype = recorder.sample_dtype(resolution)
+        self.dropped = 0
+        self.ch_ids = None
+        self.config_reply = None
+        self.samples = []
+        self.meta = []  # (seq, timestamp, triggered, timescale) of frames
+
+    def write(self, frame):
+        ch_ids, samples = recorder.frame_samples(frame.waves)
+        if self.ch_ids is None:
+            self.ch_ids = ch_ids
+            self.config_reply = frame.config_reply
+
+        # Copied, as the decoder may reuse the array for the next frame
+        self.samples.append(samples.astype(self.dtype))
+        self.meta.append(
+            (
+                frame.seq,
+                frame.timestamp,
+                bool(frame.waves.triggered),
+                frame.timescale,
+            )
+            + samples.shape
+        )
+
+    def close(self):
+        meta = np.array(
+            self.meta,
+            dtype=[
+                ("seq", "<u8"),
+                ("timestamp", "<f8"),
+                ("triggered", "?"),
+                ("timescale", "<f8"),
+                ("n_channels", "<u2"),
+                ("n_samples", "<u4"),
+            ],
+        )
+        samples = np.zeros(
+            (
+                len(self.samples),
+                meta["n_channels"].max(initial=0),
+                meta["n_samples"].max(initial=0),
+            ),
+            self.dtype,
+        )
+        for out, frame_samples in zip(samples, self.samples):
+            out[: len(frame_samples), : frame_samples.shape[1]] = frame_samples
+        chconfig = self.config_reply.chconfig if self.config_reply else []
+        arrays = {
+            "samples": samples,
+            "seq": meta["seq"],
+            "timestamp": meta["timestamp"],
+            "triggered": meta["triggered"],
+            "timescale": meta["timescale"],
+            "n_channels": meta["n_channels"],
+            "n_samples": meta["n_samples"],
+            "ch_id": np.array(
+                [] if self.ch_ids is None else self.ch_ids, dtype="<u2"
+            ),
+            "resolution": self.resolution,
+            "samplerate": (
+                self.config_reply.samplerate if self.config_reply else 0.0
+            ),
+            "ch_name": np.array([ch.name for ch in chconfig], dtype=str),
+            "ch_unit": np.array([ch.unit for ch in chconfig], dtype=str),
+            "ch_min": np.array([ch.min for ch in chconfig], dtype=float),
+            "ch_max": np.array([ch.max for ch in chconfig], dtype=float),
+        }
+
+        # A file is opened here, as np.savez() would append '.npz' to the
+        # filename
+        if isinstance(self.f, (str, os.PathLike)):
+            with open(self.f, "wb") as f:
+                np.savez(f, **arrays)
+        else:
+            np.savez(self.f, **arrays)
+
+
+class CsvSink:  # pylint: disable=too-many-instance-attributes
+    """
+    Sink which writes a row per sample to a text stream.  Samples are
+    converted to physical values as QtOscillo does.
+
+    Columns are the channels of the configuration.  Those of channels
+    which a frame doesn't have are 'nan'.
+    """
+
+    keeps_frames = False
+
+    def __init__(self, f, resolution):
+        """
+        @param f is a filename or a text stream
+        """
+        self.owned = isinstance(f, (str, os.PathLike))
+        if self.owned:
+            # pylint: disable=consider-using-with
+            f = open(f, "w", encoding="utf-8")
+        self.f = f
+        self.resolution = resolution
+        self.dropped = 0
+        self.last_config = None
+        self.dequantizer = None
+        self.row_format = None
+
+    def write(self, frame):
+        ch_ids, samples = recorder.frame_samples(frame.waves)
+        chconfig = frame.config_reply.chconfig
+        if frame.config_reply is not self.last_config:
+            if self.last_config is None:
+                self.f.write("frame," + export.csv_header(chconfig) + "\n")
+            self.dequantizer = get_dequantizer(
+                self.dequantizer, chconfig, self.resolution
+            )
+            self.row_format = "%d," + ",".join(["%e"] * (len(chconfig) + 1))
+            self.row_format += "\n"
+            self.last_config = frame.config_reply
+
+        n_samples = samples.shape[1]
+        export.write_csv_rows(
+            self.f,
+            np.column_stack(
+                [
+                    np.full(n_samples, frame.seq),
+                    np.linspace(
+                        -frame.timescale / 2, frame.timescale / 2, n_samples
+                    ),
+                    self.dequantizer(samples).T,
+                    np.full(
+                        (n_samples, max(len(chconfig) - len(ch_ids), 0)),
+                        np.nan,
+                    ),
+                ]
+            ),
+            self.row_format,
+        )
+
+    def close(self):
+        if self.owned:
+            self.f.close()
+        else:
+            self.f.flush()
+
+
+def open_sink(fmt, output, resolution, logger=None):
+    """
+    Return a sink of the format which writes to the output file, or to the
+    standard output if output is '-'
+    """
+    if fmt == "bin":
+        if output == "-":
+            return StreamSink(sys.stdout.buffer, resolution)
+        return RecordingSink(output, resolution, logger)
+    if fmt == "npz":
+        return NpzSink(
+            sys.stdout.buffer if output == "-" else output, resolution
+        )
+    return CsvSink(sys.stdout if output == "-" else output, resolution)
+
+
+class ThroughputStats:  # pylint: disable=too-few-public-methods
+    """
+    Print frame rate, link rate and drop counters every RATE_WINDOW_SEC
+    """
+
+    def __init__(self, peer, sink, f=None):
+        self.peer = peer
+        self.sink = sink
+        self.f = f
+        self.frame_rate = RateMeter()
+        self.link_rate = RateMeter()
+        self.untriggered = 0  # frames without waves, not written
+
+    def update(self, n_frames, now):
+        updated = self.frame_rate.update(n_frames, now)
+        self.link_rate.update(self.peer.recvd_total, now)
+        if not updated:
+            return
+
+        reader = self.peer.transport.reader
+        print(
+            f"{time.strftime('%H:%M:%S')} {n_frames:d} frames, "
+            f"{self.frame_rate.rate:.1f} fps, "
+            f"{self.link_rate.rate * 8 / 1e3:.1f} kbps "
+            f"(dropped: {reader.dropped_frames:d} frames, "
+            f"{self.peer.corrupted:d} corrupted, "
+            f"{self.peer.dropped_replies:d} replies, "
+            f"{self.sink.dropped:d} not written, "
+            f"{self.untriggered:d} untriggered)",
+            file=self.f or sys.stderr,
+            flush=True,
+        )
+
+
+def capture(  # pylint: disable=too-many-arguments,
+    # pylint: disable=too-many-positional-arguments
+    peer,
+    sink,
+    config_reply,
+    timescale,
+    max_frames=None,
+    duration=None,
+    max_rate=None,
+    stats=None,
+):
+    """
+    Write frames from the DSP to the sink until max_frames or duration is
+    reached (forever if both are None).  Return the number of frames.
+    Frames without waves (not triggered yet) are neither written nor
+    counted.
+    @param max_rate is None for get_waves() requests, or maximum number of
+           frames per second of streaming (0.0 for link speed)
+    @param stats is a ThroughputStats, or None
+    """
+    if max_rate is None:
+        frames = iter(peer.get_waves, None)
+    else:
+        frames = peer.stream_waves(max_rate)
+
+    start = time.monotonic()
+    seq = 0
+    try:
+        while max_frames is None or seq < max_frames:
+            acq_start = time.monotonic()
+            waves = next(frames)
+            now = time.monotonic()
+            if len(waves.wave) > 0:
+                sink.write(
+                    Frame(
+                        seq,
+                        waves,
+                        0,
+                        config_reply,
+                        timescale,
+                        now - acq_start,
+                        peer.decode_time,
+                    )
+                )
+                seq += 1
+            elif stats:
+                stats.untriggered += 1
+
+            if stats:
+                stats.update(seq, now)
+            if duration is not None and now - start >= duration:
+                break
+    finally:
+        if max_rate is not None:
+            frames.close()
+    return seq
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m oscillodsp.capture",
+        description="Capture frames from OscilloDSP without GUI",
+    )
+    parser.add_argument("interface", help="serial port or socket URL")
+    parser.add_argument(
+        "-b", "--bitrate", type=int, default=DEFAULT_BITRATE, help="bitrate"
+    )
+    parser.add_argument(
+        "-r",
+        "--resolution",
+        type=int,
+        default=DEFAULT_RESOLUTION,
+        help="quantization bits of samples",
+    )
+    parser.add_argument(
+        "--trigmode",
+        choices=TRIGGER_MODES,
+        default="auto",
+        help="trigger mode",
+    )
+    parser.add_argument(
+        "--trigtype",
+        choices=TRIGGER_TYPES,
+        default="rising",
+        help="trigger type",
+    )
+    parser.add_argument(
+        "--ch-trig", type=int, default=0, help="channel ID of trigger"
+    )
+    parser.add_argument(
+        "--triglevel", type=float, default=0.0, help="trigger level"
+    )
+    parser.add_argument(
+        "--timescale",
+        type=float,
+        default=0.0,
+        help="time length of a frame in seconds (default: by DSP)",
+    )
+    parser.add_argument(
+        "--encoding",
+        choices=ENCODINGS,
+        default="plain",
+        help="encoding of samples on the link",
+    )
+    parser.add_argument(
+        "-f", "--format", choices=FORMATS, default="bin", help="output format"
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        default="-",
+        help="output file, or '-' for the standard output (default)",
+    )
+    parser.add_argument(
+        "-n", "--frames", type=int, help="number of frames to capture"
+    )
+    parser.add_argument(
+        "-t", "--duration", type=float, help="seconds to capture"
+    )
+    parser.add_argument(
+        "--stream",
+        nargs="?",
+        type=float,
+        const=0.0,
+        metavar="MAX_RATE",
+        help="let DSP stream frames without requests (up to MAX_RATE fps)",
+    )
+    parser.add_argument(
+        "--pipeline-depth",
+        type=int,
+        default=DEFAULT_PIPELINE_DEPTH,
+        help="requests kept in flight without --stream",
+    )
+    parser.add_argument(
+        "-q", "--quiet", action="store_true", help="don't print throughput"
+    )
+    parser.add_argument(
+        "-v", "--verbose", action="store_true", help="print DSP driver logs"
+    )
+    args = parser.parse_args(argv)
+
+    if args.output == "-" and args.format != "csv" and sys.stdout.isatty():
+        parser.error(f"{args.format} output to a terminal; use -o")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    logger = logging.getLogger("capture")
+    logger.setLevel(logging.WARNING if args.quiet else logging.INFO)
+    logger.addHandler(logging.StreamHandler())
+
+    encoding = ENCODINGS[args.encoding]
+    try:
+        peer = dsp.DSP(
+            args.interface,
+            args.bitrate,
+            loglevel=logging.INFO if args.verbose else logging.WARNING,
+            console_handler=logging.StreamHandler(),
+            file_handler=logging.NullHandler(),
+            pipeline_depth=args.pipeline_depth,
+            fast_decode=True,
+            crc=True,
+            # Delta encodings are of varints, not of raw samples
+            compact=encoding == oscillodsp_pb2.Plain,
+            encoding=encoding,
+        )
+        config_reply = peer.config(
+            resolution=args.resolution,
+            trigmode=TRIGGER_MODES[args.trigmode],
+            trigtype=TRIGGER_TYPES[args.trigtype],
+            ch_trig=args.ch_trig,
+            triglevel=args.triglevel,
+            timescale=args.timescale,
+        )
+    except (OSError, RuntimeError) as err:
+        # Including time-out
+        logger.error("Can't open %s: %s", args.interface, err)
+        return 1
+    if config_reply.encoding != encoding:
+        logger.warning(
+            "DSP doesn't support %s encoding.  Samples are sent in plain.",
+            args.encoding,
+        )
+
+    status = 0
+    try:
+        sink = open_sink(args.format, args.output, args.resolution, logger)
+    except OSError as err:
+        logger.error("Can't open %s: %s", args.output, err)
+        peer.transport.close()
+        return 1
+
+    # Samples of the next frame can be decoded into the same array, unless
+    # the sink refers to the frame after write()
+    peer.reuse_samples = not sink.keeps_frames
+
+    try:
+        n_frames = capture(
+            peer,
+            sink,
+            config_reply,
+            args.timescale or config_reply.default_timescale,
+            args.frames,
+            args.duration,
+            args.stream,
+            None if args.quiet else ThroughputStats(peer, sink),
+        )
+        logger.info("Captured %d frames", n_frames)
+    except KeyboardInterrupt:
+        pass
+    except BrokenPipeError:
+        # The reader of the standard output (e.g. head) has gone.  Further
+        # writes are discarded.
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+    except (OSError, RuntimeError) as err:
+        # Including time-out and a closed pipe
+        logger.error("Capture stopped by error: %s", err)
+        status = 1
+    finally:
+        try:
+            sink.close()
+        except (OSError, RuntimeError) as err:
+            logger.error("Can't write %s: %s", args.output, err)
+            status = 1
+        peer.transport.close()
+    return status
+
+
+if __name__ == "__main__":
+    # Stop by SIGTERM (e.g. from a service manager) as by Ctrl-C
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    sys.exit(main())
@@ -0,0 +1,73 @@
+"""
+Peak-preserving Decimation
+
+A frame may have far more samples than the canvas has pixel columns.
+Samples are reduced to the minimum and the maximum of each column, so
+that the rendering cost depends on the display width rather than the
+record length, while narrow glitches stay visible.
+
+
+Copyright (c) 2020-2021, Chubu University and Firmlogics
+
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this
+   list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation
+   and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+import numpy as np
+
+POINTS_PER_COLUMN = 2  # the minimum and the maximum
+
+
+def minmax_decimate(xser, ysers, n_columns):
+    """
+    Reduce waves to n_columns pixel columns, keeping the minimum and the
+    maximum samples of each column
+
+    @param xser is the common x-axis values among channels
+    @param ysers is a list (or a 2-D array) of y-axis values of channels
+    @param n_columns is the number of pixel columns
+    @return (xser, ysers) where ysers is a 2-D array.  If samples are
+            not more than POINTS_PER_COLUMN * n_columns, they are returned
+            as they are.
+    """
+    xser = np.asarray(xser)
+    ysers = np.asarray(ysers)
+    n_samples = ysers.shape[-1]
+    if n_columns < 1 or n_samples <= POINTS_PER_COLUMN * n_columns:
+        return xser, ysers
+
+    # Start index of each column.  Every column has one or more samples.
+    starts = (np.arange(n_columns) * n_samples) // n_columns
+
+    mins = np.minimum.reduceat(ysers, starts, axis=-1)
+    maxs = np.maximum.reduceat(ysers, starts, axis=-1)
+
+    # Draw a vertical segment at the start of each column
+    xout = np.repeat(xser[starts], POINTS_PER_COLUMN)
+    yout = np.empty(
+        ysers.shape[:-1] + (n_columns * POINTS_PER_COLUMN,), dtype=ysers.dtype
+    )
+    yout[..., 0::2] = mins
+    yout[..., 1::2] = maxs
+
+    return xout, yout
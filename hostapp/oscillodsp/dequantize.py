@@ -0,0 +1,116 @@
+"""
+Dequantization of Samples
+
+Samples from the peer DSP are integers of 'resolution' bits which span
+the range [min, max] of each channel config.  A Dequantizer is built
+once per configuration and converts a whole (channels, samples) block
+to float32 at once.
+
+
+
+Copyright (c) 2020-2021, Chubu University and Firmlogics
+
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this
+   list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation
+   and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+import numpy as np
+
+LUT_MAX_RESOLUTION = 16  # samples up to which a lookup table can be used
+
+
+class Dequantizer:
+    """
+    Converter of samples to values in units of channels
+
+    value = sample * scale + offset, where scale and offset are of each
+    channel.  For resolution <= LUT_MAX_RESOLUTION, a lookup table of all
+    16-bit samples can be used instead, which is worth only if the table
+    stays in the cache and arithmetic is slower than the lookup.
+    """
+
+    def __init__(self, chconfig, resolution, lut=False):
+        """
+        @param chconfig is a list of ChConfig of channels in order of rows
+        @param resolution is the number of quantization bits
+        @param lut is if the lookup table is used
+        """
+        self.key = config_key(chconfig, resolution)
+        spans = np.array([ch.max - ch.min for ch in chconfig], np.float64)
+        centers = np.array([ch.max + ch.min for ch in chconfig], np.float64)
+        self.scale = (spans / (1 << resolution)).astype(np.float32)[
+            :, np.newaxis
+        ]
+        self.offset = (centers / 2).astype(np.float32)[:, np.newaxis]
+
+        self.lut = None
+        if lut and resolution <= LUT_MAX_RESOLUTION:
+            # Indexed by samples as uint16 (two's complement)
+            samples = np.arange(1 << 16, dtype=np.uint16).view(np.int16)
+            self.lut = samples * self.scale + self.offset
+
+    def __call__(self, samples, out=None):
+        """
+        Return float32 values of samples
+        @param samples is a (channels, samples) integer array (or a list
+               of waves).  Channels may be fewer than chconfig.
+        @param out is a float32 array of the same shape to put the values
+               into, or None
+        """
+        samples = np.asarray(samples)
+        n_channels = samples.shape[0]
+        if out is None:
+            out = np.empty(samples.shape, np.float32)
+
+        if self.lut is not None:
+            indices = samples.astype(np.uint16, copy=False)
+            for ch in range(n_channels):
+                np.take(self.lut[ch], indices[ch], out=out[ch])
+            return out
+
+        np.copyto(out, samples, casting="unsafe")
+        out *= self.scale[:n_channels]
+        out += self.offset[:n_channels]
+        return out
+
+    def matches(self, chconfig, resolution):
+        """
+        Return True if this converts samples of the configuration
+        """
+        return self.key == config_key(chconfig, resolution)
+
+
+def config_key(chconfig, resolution):
+    return resolution, tuple((ch.min, ch.max) for ch in chconfig)
+
+
+def get_dequantizer(dequantizer, chconfig, resolution, lut=False):
+    """
+    Return dequantizer if it converts samples of the configuration, or a
+    new Dequantizer otherwise, so that callers rebuild it only when the
+    configuration changes
+    @param dequantizer is a Dequantizer or None
+    """
+    if dequantizer is not None and dequantizer.matches(chconfig, resolution):
+        return dequantizer
+    return Dequantizer(chconfig, resolution, lut)
@@ -26,16 +26,21 @@ OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 """
 
 import logging
-import struct
 import sys
+import time
+from collections import deque
 from datetime import datetime, timedelta
 
+from google.protobuf.message import DecodeError
+
 from . import oscillodsp_pb2  # pylint: disable=no-name-in-module
+from . import transport  # pylint: disable=no-name-in-module
+from . import wavedecode  # pylint: disable=no-name-in-module
 
 DEBUG_TIMEOUT_CONFIG = False
 DEBUG_TIMEOUT_GET_WAVES = False
-FTDI_PRODUCT_IDS = {0xA6D0}
 DEFAULT_TIMEOUT_SECONDS = 3.0  # wait forever if None
+DEFAULT_PIPELINE_DEPTH = 1  # GetWaveGroup requests kept in flight
 
 
 def dump(s):
@@ -54,42 +59,17 @@ def dump(s):
 
 
 def open_interface(tty, bitrate, logger=None):
-    if logger:
-        logger.debug(f"open_interface: {tty} {bitrate:d}")
-
-    # Different procedures are required for PyFTDI and PySerial
-    if len(tty) > 4 and tty[:4] == "ftdi":
-        # The reason for importing here is that it may be required for
-        # PyInstaller. This needs to be re-checked.
-        import pyftdi.serialext  # pylint: disable=import-outside-toplevel
-        from pyftdi.ftdi import Ftdi  # pylint: disable=import-outside-toplevel
-
-        for pid in FTDI_PRODUCT_IDS:
-            try:
-                Ftdi.add_custom_product(Ftdi.DEFAULT_VENDOR, pid)
-            except ValueError:
-                pass
-
-        if logger:
-            logger.info("Using pyftdi")
-
-        Ftdi.show_devices()
-        ser = pyftdi.serialext.serial_for_url(
-            tty, baudrate=bitrate, timeout=DEFAULT_TIMEOUT_SECONDS
-        )
-        # XXX should raise exception for illegal caudrate
-    else:
-        import serial  # pylint: disable=import-outside-toplevel
-
-        if logger:
-            logger.debug("Using pyserial")
-        # This may raise serial.SerialException:
-        ser = serial.Serial(tty, bitrate, timeout=DEFAULT_TIMEOUT_SECONDS)
-
-    return ser
+    """
+    Open the interface (serial port, FTDI device or socket URL) and return
+    a transport.Transport
+    """
+    return transport.open_transport(
+        tty, bitrate, DEFAULT_TIMEOUT_SECONDS, logger
+    )
 
 
-class DSP:
+class DSP:  # pylint: disable=too-many-instance-attributes
+    # pylint: disable=too-many-public-methods
     """
     DSP class definition to abstract communication with peer DSP
     """
@@ -104,8 +84,35 @@ class DSP:
         console_handler=None,
         file_handler=None,
         logformatter=logging.Formatter("dsp.py: %(message)s"),
+        pipeline_depth=DEFAULT_PIPELINE_DEPTH,
+        fast_decode=False,
+        crc=False,
+        compact=False,
+        encoding=oscillodsp_pb2.Plain,
+        reuse_samples=False,
     ):
-
+        """
+        @param pipeline_depth is number of GetWaveGroup requests kept in
+               flight by get_waves().  1 means plain stop-and-wait.
+        @param fast_decode is if get_waves() should decode WaveGroup replies
+               by wavedecode and return WaveGroupArray objects instead of
+               WaveGroup messages
+        @param crc is if config() should request the sync word and CRC on
+               messages from DSP, so that corrupted ones are detected.  It
+               is used only if the DSP supports it.
+        @param compact is if config() should request raw samples (8, 12 or
+               16 bits each by the resolution) instead of varints.  It
+               requires fast_decode, and is used only if the DSP supports
+               it.
+        @param encoding is encoding of samples (varints) which config()
+               should request (Plain, SampleDelta or FrameDelta).  Encodings
+               other than Plain require fast_decode and no compact, and are
+               used only if the DSP supports them.
+        @param reuse_samples is if samples of every frame should be decoded
+               into the same preallocated array.  It requires fast_decode.
+               Set it only if each frame is consumed before the next one is
+               received, as the samples are overwritten then.
+        """
         self.debug_ct = 0
 
         logger = logging.getLogger("dsp")
@@ -121,12 +128,42 @@ class DSP:
             logger.addHandler(loghandler)
         self.logger = logger
 
-        self.ser = open_interface(tty, bitrate, self.logger)
+        if pipeline_depth < 1:
+            raise ValueError("pipeline_depth must be 1 or larger")
+        if compact and not fast_decode:
+            raise ValueError("compact requires fast_decode")
+        if encoding != oscillodsp_pb2.Plain and not fast_decode:
+            raise ValueError("encoding requires fast_decode")
+        if encoding != oscillodsp_pb2.Plain and compact:
+            # The DSP would send raw samples in Plain
+            raise ValueError("encoding can't be used with compact")
+        if reuse_samples and not fast_decode:
+            raise ValueError("reuse_samples requires fast_decode")
+
+        self.transport = open_interface(tty, bitrate, self.logger)
 
         self.msg = oscillodsp_pb2.MessageToDSP()
         self.id = 0
+        self.pipeline_depth = pipeline_depth
+        self.fast_decode = fast_decode
+        self.crc = crc
+        self.compact = compact
+        self.sample_bits = 0  # ConfigReply.sample_bits, 0 for varints
+        self.encoding = encoding
+        self.reply_encoding = oscillodsp_pb2.Plain  # ConfigReply.encoding
+        self.delta_decoder = wavedecode.DeltaDecoder()
+        self.reuse_samples = reuse_samples
+        self.samples_out = None  # array reused for samples of frames
+        self.need_keyframe = False
+        self.inflight = deque()  # IDs of GetWaveGroup requests in flight
+        self.config_id = None  # ID of Configure sent by send_config()
+        self.stream_id = None  # ID of StartStream while streaming
+        self.decode_time = 0.0  # seconds spent to decode the last WaveGroup
         self.last_recvdtime = datetime.now()
         self.recvd_bytes = 0
+        self.recvd_total = 0  # bytes of messages received since opened
+        self.corrupted = 0  # messages which couldn't be decoded
+        self.dropped_replies = 0  # replies lost or to earlier requests
 
     def get_logger(self):
         return self.logger
@@ -150,9 +187,7 @@ class DSP:
 
         self.logger.debug("send_msg length = %d", length)
 
-        self.ser.write(struct.pack("!H", length))
-        self.ser.write(s)
-        self.ser.flush()
+        self.transport.send_frame(s)
 
         if with_id:
             last_sent_id = self.id
@@ -160,57 +195,208 @@ class DSP:
             return last_sent_id
         return None
 
-    def recv_msg_raw(self):
+    def recv_bytes(self):
         """
-        Receive a raw message from DSP
+        Receive a serialized message from DSP.  The returned memoryview is
+        valid until the next receive.
         """
-        s = self.ser.read(2)
-        if len(s) < 2:
-            raise TimeoutError("Timeout.  No response from DSP.")
+        s = self.transport.recv_frame()
+        self.log_recv_rate(len(s))
+        return s
 
-        length = struct.unpack("!H", s)[0]
+    def log_recv_rate(self, length):
+        """
+        Count a received message, and log the receive rate every second
+        @param length is length of the message
+        """
         self.logger.debug("recv_msg_raw length = %d", length)
 
         self.recvd_bytes += 2 + length
+        self.recvd_total += 2 + length
         time_delta = datetime.now() - self.last_recvdtime
         if time_delta > timedelta(seconds=1):
             sec = time_delta.seconds + time_delta.microseconds / 1e6
+            reader = self.transport.reader
             self.logger.info(
-                "recv rate = %5.1f kbps", self.recvd_bytes * 8 / sec / 1e3
+                "recv rate = %5.1f kbps, compression ratio = %.2f "
+                "(dropped: %d bytes, %d frames, %d corrupted, %d replies)",
+                self.recvd_bytes * 8 / sec / 1e3,
+                self.compression_ratio(),
+                reader.dropped_bytes,
+                reader.dropped_frames,
+                self.corrupted,
+                self.dropped_replies,
             )
             self.recvd_bytes = 0
             self.last_recvdtime = datetime.now()
 
-        reply = oscillodsp_pb2.MessageToHost()
-        reply.ParseFromString(self.ser.read(length))
-
-        return reply
+    def drop_corrupted(self):
+        """
+        Drop the message received last which couldn't be decoded, and look
+        for the next one
+        """
+        self.corrupted += 1
+        self.logger.warning("Dropped a corrupted message")
+        self.transport.reader.resync()
 
-    def recv_msg(self, id_when_sent=None):
+    def recv_msg_raw(self):
         """
-        Receive a message from DSP and also check any errors
-        @param id_when_sent is expected ID which will come from DSP peer
+        Receive a raw message from DSP.  Messages which can't be decoded
+        are dropped.
+        """
+        reply = oscillodsp_pb2.MessageToHost()
+        while True:
+            try:
+                reply.ParseFromString(self.recv_bytes())
+            except DecodeError:
+                self.drop_corrupted()
+            else:
+                return reply
+
+    def check_id(self, id_received, id_when_sent):
         """
-        reply = self.recv_msg_raw()
+        Check ID of a message received from DSP.  Return False if the
+        message is a reply to an earlier request, which should be dropped.
 
-        if id_when_sent is not None and reply.id != id_when_sent:
-            self.logger.error("[ERROR] ID mismatch:")
-            self.logger.error(
-                "  expected=%d received=%d", id_when_sent, reply.id
+        The DSP replies in the order of requests, so a reply with a later ID
+        means that replies to requests in between have been lost.  Such
+        requests are forgotten.  Streamed WaveGroups are silently dropped
+        while waiting for other replies.
+        """
+        if id_when_sent is None or id_received == id_when_sent:
+            return True
+        if id_received == self.stream_id:
+            # A streamed WaveGroup while waiting for another reply
+            return False
+        if id_received >= self.id:
+            # Not a reply to this session (e.g. a stale one or garbage)
+            self.logger.warning(
+                "Dropped a reply to unknown ID %d", id_received
             )
+            self.dropped_replies += 1
+            return False
+
+        self.logger.warning(
+            "ID mismatch: expected=%d received=%d", id_when_sent, id_received
+        )
+        if id_received < id_when_sent:
+            self.dropped_replies += 1
+            return False
+
+        self.dropped_replies += id_received - id_when_sent
+        while self.inflight and self.inflight[0] <= id_received:
+            self.inflight.popleft()
+        return True
+
+    def check_reply(self, reply, id_when_sent):
+        """
+        Check ID and any errors of a message received from DSP.  Return
+        False if the message should be dropped (see check_id()).
+        """
+        if not self.check_id(reply.id, id_when_sent):
+            return False
 
         # XXX  Don't we have much better way?
         if reply.HasField("ack") and reply.ack.err != oscillodsp_pb2.NoError:
             error_code_name = oscillodsp_pb2.ErrorCode.Name(reply.ack.err)
             raise ValueError(f"reply.ack has error: {error_code_name}")
+        return True
 
-        return reply
+    def recv_msg(self, id_when_sent=None):
+        """
+        Receive a message from DSP and also check any errors
+        @param id_when_sent is expected ID which will come from DSP peer
+        """
+        while True:
+            reply = self.recv_msg_raw()
+            if self.check_reply(reply, id_when_sent):
+                return reply
+
+    def decode_waves(self, s):
+        """
+        Decode a reply to GetWaveGroup, and return (ID, WaveGroupArray) if
+        fast_decode is set and possible, otherwise (ID, MessageToHost)
+        """
+        if self.fast_decode:
+            try:
+                msg_id, waves = wavedecode.decode_message(
+                    s,
+                    self.samples_out if self.reuse_samples else None,
+                    self.sample_bits,
+                )
+                if self.reuse_samples:
+                    self.samples_out = waves.samples
+                return msg_id, waves
+            except wavedecode.NotWaveGroupError:
+                # E.g. an error acknowledgement.  Leave it to the generated
+                # class below.
+                pass
+
+        reply = oscillodsp_pb2.MessageToHost()
+        reply.ParseFromString(s)
+        return reply.id, reply
+
+    def recv_waves(self, id_when_sent=None):
+        """
+        Receive a reply to GetWaveGroup.  If fast_decode is set, return
+        WaveGroupArray decoded by wavedecode, otherwise return WaveGroup.
+        Return None if the reply is a FrameDelta frame whose reference frame
+        has been lost.  A key frame is requested then.
+        """
+        while True:
+            taken, waves = self.take_waves(self.recv_bytes(), id_when_sent)
+            if taken:
+                return waves
+
+    def take_waves(self, s, id_when_sent):
+        """
+        Decode a message which should be a reply to GetWaveGroup, and
+        return (True, waves) like recv_waves() does, or (False, None) if
+        the message should be dropped (see check_id())
+        """
+        start = time.perf_counter()
+        try:
+            id_received, waves = self.decode_waves(s)
+        except DecodeError:
+            self.drop_corrupted()
+            return False, None
+        self.decode_time = time.perf_counter() - start
+
+        if isinstance(waves, oscillodsp_pb2.MessageToHost):
+            if self.check_reply(waves, id_when_sent):
+                return True, waves.wavegroup
+        elif self.check_id(id_received, id_when_sent):
+            if self.delta_decoder.decode(waves, self.reply_encoding):
+                self.need_keyframe = False
+                return True, waves
+            self.logger.warning("Dropped a frame without its reference")
+            self.need_keyframe = True
+            return True, None
+        return False, None
+
+    def drain(self):
+        """
+        Receive and drop replies to GetWaveGroup requests still in flight.
+        This must be done before sending any other request, because the DSP
+        replies in the order it received requests.
+        """
+        try:
+            while self.inflight or self.config_id is not None:
+                if self.config_next():
+                    self.take_config(self.recv_bytes())
+                else:
+                    self.recv_msg(self.inflight.popleft())
+        except TimeoutError:
+            # The last replies have been lost
+            self.logger.warning("Timeout while draining replies")
+            self.discard()
 
     def echo_request(self, content):
         """
         Message to DSP: EchoRequest
         @param content is echo message to DSP peer
         """
+        self.drain()
         self.msg.echoreq.content = content
         id_ = self.send_msg()
         return self.recv_msg(id_).echorep.content
@@ -243,22 +429,95 @@ class DSP:
             if self.debug_ct > 3:
                 raise TimeoutError("Timeout.  No response from DSP.")
 
+        self.drain()
+        self.send_config(
+            resolution, trigmode, trigtype, ch_trig, triglevel, timescale
+        )
+        try:
+            reply = None
+            while reply is None:
+                reply = self.take_config(self.recv_bytes())
+        finally:
+            self.config_id = None
+
+        if reply.err != oscillodsp_pb2.NoError:
+            raise RuntimeError("Configuration Error")
+        return reply
+
+    def send_config(  # pylint: disable=too-many-arguments,
+        # pylint: disable=too-many-positional-arguments
+        self,
+        resolution,
+        trigmode,
+        trigtype,
+        ch_trig=0,
+        triglevel=0,
+        timescale=0.0,
+    ):
+        """
+        Non-blocking counterpart of config() for a selector loop
+
+        Send Configure (with the same parameters as config()) without
+        waiting for replies to GetWaveGroup requests in flight.  Its reply
+        is taken by poll_waves() in order among them, and the ID is kept in
+        'config_id' until then.
+        """
         self.msg.config.resolution = resolution
         self.msg.config.trigmode = trigmode
         self.msg.config.trigtype = trigtype
         self.msg.config.ch_trig = ch_trig
         self.msg.config.triglevel = triglevel
         self.msg.config.timescale = timescale
-        id_ = self.send_msg()
-        reply = self.recv_msg(id_).configreply
-        if reply.err != oscillodsp_pb2.NoError:
-            raise RuntimeError("Configuration Error")
+        for field in ["crc", "compact", "encoding"]:
+            if getattr(self, field):
+                setattr(self.msg.config, field, getattr(self, field))
+            else:
+                self.msg.config.ClearField(field)
+        self.config_id = self.send_msg()
+
+    def config_next(self):
+        """
+        Return True if the next reply should be the one to Configure
+        """
+        return self.config_id is not None and (
+            not self.inflight or self.config_id < self.inflight[0]
+        )
+
+    def take_config(self, s):
+        """
+        Decode a message which should be the reply to Configure, and apply
+        the framing and packing which it tells.  Return its ConfigReply, or
+        None if the message should be dropped.
+        """
+        reply = oscillodsp_pb2.MessageToHost()
+        try:
+            reply.ParseFromString(s)
+        except DecodeError:
+            self.drop_corrupted()
+            return None
+        if reply.id != self.config_id:
+            if self.check_id(reply.id, self.config_id):
+                # Following messages may be framed as the lost reply tells
+                raise TimeoutError("Reply to Configure has been lost")
+            return None
+        self.config_id = None
+        reply = reply.configreply
+
+        # Following messages are framed and packed as the DSP tells
+        self.transport.reader.crc = reply.HasField("crc") and reply.crc
+        self.sample_bits = reply.sample_bits
+        self.reply_encoding = reply.encoding
+        self.delta_decoder.reset()
         return reply
 
     def get_waves(self):
         """
         Message to DSP: GetWaveGroup
         Returns a WaveGroup object
+
+        Up to pipeline_depth requests are kept in flight, so that the DSP can
+        already prepare the next frames while the oldest reply is being
+        received.  The returned WaveGroup is the reply to the oldest request.
         """
         if DEBUG_TIMEOUT_GET_WAVES:
             self.debug_ct += 1
@@ -266,15 +525,149 @@ class DSP:
             if self.debug_ct > 10:
                 raise TimeoutError("Timeout.  No response from DSP.")
 
+        try:
+            return self.request_waves()
+        except TimeoutError:
+            # The reply may have been lost by corruption.  Request again
+            # only once, as the DSP may have really stopped.
+            self.logger.warning("Timeout.  Requesting waves again")
+            self.discard()
+            return self.request_waves()
+
+    def request_waves(self):
+        """
+        Fill the pipeline with GetWaveGroup requests and receive the reply
+        to the oldest one
+        """
+        while True:
+            self.send_requests()
+
+            # check_id() may forget requests whose replies have been lost
+            id_ = self.inflight.popleft()
+            waves = self.recv_waves(id_)
+            if waves is not None:
+                return waves
+
+    def send_requests(self):
+        """
+        Send GetWaveGroup requests until pipeline_depth requests are in
+        flight
+        """
         self.msg.getwave.SetInParent()
+        if self.need_keyframe:
+            self.msg.getwave.keyframe = True
+        else:
+            self.msg.getwave.ClearField("keyframe")
+        while len(self.inflight) < self.pipeline_depth:
+            self.inflight.append(self.send_msg())
+
+    def fileno(self):
+        """
+        Return the file descriptor of the interface, which a selector can
+        watch for replies
+        """
+        return self.transport.fileno()
+
+    def poll_waves(self):
+        """
+        Non-blocking counterpart of get_waves() for a selector loop
+
+        Read bytes available once, and return a list of frames (replies to
+        GetWaveGroup) which have been completed.  The ConfigReply to
+        send_config() is put among them in the order received.  The
+        pipeline is filled again by send_requests().  This should be called
+        only when fileno() is readable, as the read waits otherwise.
+        """
+        reader = self.transport.reader
+        reader.feed()
+
+        frames = []
+        while self.inflight or self.config_id is not None:
+            s = reader.parse()
+            if s is None:
+                break
+            self.log_recv_rate(len(s))
+
+            if self.config_next():
+                reply = self.take_config(s)
+                if reply is not None:
+                    frames.append(reply)
+                continue
+
+            # check_id() may forget requests whose replies have been lost
+            id_ = self.inflight.popleft()
+            taken, waves = self.take_waves(s, id_)
+            if not taken:
+                self.inflight.appendleft(id_)
+            elif waves is not None:
+                frames.append(waves)
+
+        self.send_requests()
+        return frames
+
+    def start_stream(self, max_rate=0.0):
+        """
+        Message to DSP: StartStream
+        The DSP sends WaveGroups without requests until stop_stream().
+        @param max_rate is maximum number of frames per second, or 0.0 for
+               as fast as the link allows
+        """
+        self.drain()
+        self.msg.startstream.max_rate = max_rate
+        id_ = self.send_msg()
+        self.recv_msg(id_)
+        self.stream_id = id_
+
+    def stop_stream(self):
+        """
+        Message to DSP: StopStream
+        WaveGroups already sent before the acknowledgement are dropped.
+        """
+        if self.stream_id is None:
+            return
+        self.msg.stopstream.SetInParent()
         id_ = self.send_msg()
-        return self.recv_msg(id_).wavegroup
+        try:
+            self.recv_msg(id_)
+        except TimeoutError:
+            self.logger.warning("Timeout while stopping stream")
+            self.discard()
+        finally:
+            self.stream_id = None
+
+    def stream_waves(self, max_rate=0.0):
+        """
+        Generator which starts streaming and yields frames as they arrive,
+        like get_waves() does.  Streaming stops when the generator is
+        closed.  config() may be called between frames.
+        @param max_rate is maximum number of frames per second, or 0.0 for
+               as fast as the link allows
+        """
+        self.start_stream(max_rate)
+        try:
+            while True:
+                # Streamed WaveGroups have the ID of StartStream.  Key
+                # frames come periodically.
+                waves = self.recv_waves(self.stream_id)
+                if waves is not None:
+                    yield waves
+        finally:
+            self.stop_stream()
+
+    def compression_ratio(self):
+        """
+        Return the ratio of bytes which samples received so far would take
+        as plain varints, to bytes which they actually took
+        """
+        return self.delta_decoder.ratio()
 
     def terminate(self):
         """
         Message to DSP: Terminate
         """
         self.logger.info("Terminating peer DSP")
+        self.inflight.clear()  # the DSP won't reply to them anymore
+        self.stream_id = None
         self.msg.terminate.SetInParent()
         self.send_msg()
 
@@ -282,9 +675,11 @@ class DSP:
         """
         Discard any bytes in transmit or receive buffers
         """
-        while self.ser.in_waiting > 0 or self.ser.out_waiting > 0:
-            self.ser.reset_input_buffer()
-            self.ser.reset_output_buffer()
+        self.inflight.clear()
+        self.config_id = None
+        while self.transport.in_waiting > 0 or self.transport.out_waiting > 0:
+            self.transport.reset_input_buffer()
+            self.transport.reset_output_buffer()
 
     def check(self):
         """
@@ -292,5 +687,7 @@ class DSP:
         """
         self.logger.warning("In check()")
         self.logger.warning(
-            "  in: %d out: %d\n", self.ser.in_waiting, self.ser.out_waiting
+            "  in: %d out: %d\n",
+            self.transport.in_waiting,
+            self.transport.out_waiting,
         )
@@ -0,0 +1,113 @@
+"""
+Wave Data Exporters
+
+
+Copyright (c) 2020-2021, Chubu University and Firmlogics
+
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this
+   list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation
+   and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+import threading
+
+import numpy as np
+
+CSV_CHUNK_ROWS = 1024  # rows formatted at once (while holding the GIL)
+
+
+def csv_header(chconfig):
+    """
+    Return the CSV header line (without newline) for channel configs
+    """
+    return "time [sec]" + "".join(f",{ch.name} [{ch.unit}]" for ch in chconfig)
+
+
+def write_csv(filename, header, data):
+    """
+    Write a header line and rows of a 2-D array to a CSV file
+
+    Rows are formatted by chunks of CSV_CHUNK_ROWS with a single '%'
+    operation each, instead of per sample.  The GIL is released between
+    chunks, so other threads (e.g. acquisition) keep running.
+    """
+    with open(filename, "w", encoding="utf-8") as f:
+        f.write(header + "\n")
+        write_csv_rows(f, data)
+
+
+def write_csv_rows(f, data, row_format=None):
+    """
+    Write rows of a 2-D array to an opened text file, as write_csv() does
+    @param row_format is '%' format of a row (with newline), or None for
+           '%e' of all columns
+    """
+    if row_format is None:
+        row_format = ",".join(["%e"] * data.shape[1]) + "\n"
+    for start in range(0, len(data), CSV_CHUNK_ROWS):
+        chunk = data[start : start + CSV_CHUNK_ROWS]
+        f.write((row_format * len(chunk)) % tuple(chunk.ravel().tolist()))
+
+
+def save_csv(filename, xser, ysers, chconfig):
+    """
+    Save waves to a CSV file.  The first column is time, and channels follow.
+
+    @param xser is the time of each sample
+    @param ysers is a list (or a 2-D array) of samples of channels
+    @param chconfig is a list of ChConfig which gives column names
+    """
+    write_csv(
+        filename, csv_header(chconfig), np.column_stack([xser] + list(ysers))
+    )
+
+
+def save_csv_in_background(  # pylint: disable=too-many-arguments,
+    # pylint: disable=too-many-positional-arguments
+    filename,
+    xser,
+    ysers,
+    chconfig,
+    logger=None,
+):
+    """
+    Same as save_csv() but the file is written by a worker thread, so that
+    the caller (e.g. GUI thread) doesn't wait for it.  Return the started
+    thread.
+    """
+    # Header and data are copied here, so the caller may modify them later
+    header = csv_header(chconfig)
+    data = np.column_stack([xser] + list(ysers))
+
+    def run():
+        try:
+            write_csv(filename, header, data)
+            if logger:
+                logger.info(f"Saved CSV file: {filename}")
+        except OSError as err:
+            if logger:
+                logger.error(f"Failed to save CSV file: {err}")
+
+    # Not a daemon, so that the file is completed even when quitting
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
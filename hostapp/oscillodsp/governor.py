@@ -0,0 +1,156 @@
+"""
+Frame-rate Governor
+
+
+Copyright (c) 2020-2021, Chubu University and Firmlogics
+
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this
+   list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation
+   and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+DEFAULT_TARGET_FPS = 30.0
+DEFAULT_EMA_ALPHA = 0.1
+MAX_GUI_LOAD = 0.5  # ratio of time which the GUI thread may spend to draw
+RATE_WINDOW_SEC = 1.0
+
+
+class MovingAverage:  # pylint: disable=too-few-public-methods
+    """
+    Exponential moving average.  'value' is None until the first update.
+    """
+
+    def __init__(self, alpha=DEFAULT_EMA_ALPHA):
+        self.alpha = alpha
+        self.value = None
+
+    def update(self, x):
+        if self.value is None:
+            self.value = x
+        else:
+            self.value += self.alpha * (x - self.value)
+        return self.value
+
+
+class RateMeter:  # pylint: disable=too-few-public-methods
+    """
+    Measure rate (per second) of a cumulative counter, which is updated
+    every RATE_WINDOW_SEC
+    """
+
+    def __init__(self, window=RATE_WINDOW_SEC):
+        self.window = window
+        self.rate = None
+        self.start_time = None
+        self.start_count = 0
+
+    def update(self, count, now):
+        """
+        Return True if 'rate' has been updated
+        """
+        if self.start_time is None or count < self.start_count:
+            self.start_time = now
+            self.start_count = count
+            return False
+
+        elapsed = now - self.start_time
+        if elapsed < self.window:
+            return False
+
+        self.rate = (count - self.start_count) / elapsed
+        self.start_time = now
+        self.start_count = count
+        return True
+
+
+class FrameRateGovernor:  # pylint: disable=too-many-instance-attributes
+    """
+    Decide the render interval from moving averages of acquisition, decode
+    and draw time
+
+    The renderer aims at target_fps, but it never renders faster than
+    frames arrive, and drawing may occupy the GUI thread only MAX_GUI_LOAD
+    of the time.  When drawing gets slower, the interval is stretched and
+    the frames acquired meanwhile are dropped (only the newest frame is
+    rendered), so that neither user input nor the acquisition thread
+    starves.
+    """
+
+    def __init__(self, target_fps=DEFAULT_TARGET_FPS, alpha=DEFAULT_EMA_ALPHA):
+        if target_fps <= 0:
+            raise ValueError("target_fps must be positive")
+
+        self.target_fps = target_fps
+        self.acq_time = MovingAverage(alpha)
+        self.decode_time = MovingAverage(alpha)
+        self.draw_time = MovingAverage(alpha)
+        self.acq_rate = RateMeter()
+        self.display_rate = RateMeter()
+        self.n_drawn = 0
+
+    def frame_acquired(self, frame, now):
+        """
+        Should be called when a new frame is taken from the ring.  Return
+        True if the rates have been updated.
+        """
+        self.acq_time.update(frame.acq_time)
+        self.decode_time.update(frame.decode_time)
+        return self.acq_rate.update(frame.seq, now)
+
+    def frame_drawn(self, draw_time, now):
+        """
+        Should be called when a frame has been drawn.  Return True if the
+        rates have been updated.
+        """
+        self.draw_time.update(draw_time)
+        self.n_drawn += 1
+        return self.display_rate.update(self.n_drawn, now)
+
+    def interval(self):
+        """
+        Return the render interval in milliseconds
+        """
+        period = 1 / self.target_fps
+
+        if self.draw_time.value is not None:
+            period = max(period, self.draw_time.value / MAX_GUI_LOAD)
+
+        # No need to render faster than frames arrive
+        if self.acq_time.value is not None:
+            period = max(period, self.acq_time.value)
+
+        return period * 1000
+
+    def status(self):
+        """
+        Return a string which shows effective rates and moving averages
+        """
+        items = []
+        if self.acq_rate.rate is not None:
+            items.append(f"Acquisition {self.acq_rate.rate:.1f} fps")
+        if self.display_rate.rate is not None:
+            items.append(f"Display {self.display_rate.rate:.1f} fps")
+        if self.decode_time.value is not None:
+            items.append(f"Decode {self.decode_time.value * 1e3:.2f} ms")
+        if self.draw_time.value is not None:
+            items.append(f"Draw {self.draw_time.value * 1e3:.1f} ms")
+        return " | ".join(items)
@@ -36,8 +36,11 @@ import numpy as np
 from ipywidgets import Layout
 from matplotlib.ticker import EngFormatter
 
-from oscillodsp import dsp
+from oscillodsp.asyncdsp import AsyncDSP
+from oscillodsp.dequantize import get_dequantizer
+from oscillodsp.export import save_csv_in_background
 from oscillodsp.oscillodsp_pb2 import TriggerMode, TriggerType
+from oscillodsp.recorder import frame_samples
 from oscillodsp.utils import Blinker, get_filename, modified_ylim
 
 # Various definitions
@@ -107,6 +110,7 @@ class Oscillo(widgets.HBox):
         super().__init__()
 
         self.quantize_bits = quantize_bits
+        self.dequantizer = None
 
         # Set-up logger for debugging
         logger = logging.getLogger("oscillo")
@@ -115,18 +119,9 @@ class Oscillo(widgets.HBox):
         logger.addHandler(loghandler)
         self.logger = logger
 
-        # Identify underling OS (Linux, Windows, etc.) and determine asyncio
-        # sleep length
-        if sys.platform == "win32":
-            self.sleep_len = 0.1
-            self.logger.info(
-                "Detected running on Windows, so using a special sleep length."
-            )
-        else:
-            self.sleep_len = 0.01
-
-        # Connecting to peer DSP
-        self.peer = dsp.DSP(dsp_tty, dsp_bitrate, loglevel=dsp_loglevel)
+        # Connecting to peer DSP.  Its replies are awaited, so that the
+        # kernel can handle GUI operations meanwhile.
+        self.peer = AsyncDSP(dsp_tty, dsp_bitrate, loglevel=dsp_loglevel)
 
         # Creating output object for Matplotlib figure
         output = widgets.Output()
@@ -252,8 +247,9 @@ class Oscillo(widgets.HBox):
         def _(change):
             self.tscale_new = 1 / change.new
 
-        # Once call DSP to obtain various information need to set-up variables
-        config_reply = self.peer.config(
+        # Once call DSP to obtain various information need to set-up variables.
+        # This can't be awaited, so the DSP object is called directly.
+        config_reply = self.peer.dsp.config(
             resolution=self.quantize_bits,
             trigmode=self.trigmode_new,
             trigtype=self.trigtype,
@@ -271,10 +267,29 @@ class Oscillo(widgets.HBox):
             width = ch.max - ch.min
             self.ypos.append(-2.0 * center / width)
 
-        # Create sub_ax (multiple ax on one subplot) of required numbers
+        # Create sub_ax (multiple ax on one subplot) of required numbers.
+        # Only the axis of the active channel is shown.
         self.sub_ax = []
         for i in range(len(config_reply.chconfig) - 1):
-            self.sub_ax.append(self.ax.twinx())
+            sub_ax = self.ax.twinx()
+            sub_ax.set_axis_off()
+            self.sub_ax.append(sub_ax)
+
+        # Lines are created once and only their data are updated for each
+        # frame.  The active channel is drawn on the main axis.
+        formatter = EngFormatter()
+        self.ax.xaxis.set_major_formatter(formatter)
+        self.ax.yaxis.set_major_formatter(formatter)
+        self.ax.set_xlabel("[sec]")
+        self.ax.grid(True)
+        self.lines = []  # one line per axis, the main axis comes first
+        for ax in [self.ax] + self.sub_ax:
+            (line,) = ax.plot([], [])
+            self.lines.append(line)
+        self.slots = []  # index in self.lines for each channel
+        self.legend = None
+        self.last_layout = None
+        self.xser = None
 
         # Configure Channel menu
         self.options = []
@@ -345,8 +360,6 @@ class Oscillo(widgets.HBox):
         blinker = Blinker()
         old_status = ""
         triggered = False
-        last_ylim = None
-        formatter = EngFormatter()
 
         while True:
             # When requested by UI, clear triggered flag synchronously
@@ -367,7 +380,7 @@ class Oscillo(widgets.HBox):
                 self.button_single.disabled = (
                     self.trigmode != TriggerMode.Single
                 )
-                config_reply = self.peer.config(
+                config_reply = await self.peer.config(
                     resolution=self.quantize_bits,
                     trigmode=self.trigmode,
                     trigtype=self.trigtype,
@@ -379,7 +392,7 @@ class Oscillo(widgets.HBox):
 
             # Once triggered for single-shot mode, re-use wave data
             if self.trigmode != TriggerMode.Single or not triggered:
-                waves = self.peer.get_waves()  # Trying update wave data
+                waves = await self.peer.get_waves()  # Trying update wave data
                 if len(waves.wave) > 0:
                     triggered = waves.triggered
 
@@ -418,137 +431,120 @@ class Oscillo(widgets.HBox):
             old_status = new_status
 
             if need_plot:
-                # Generate CSV file header if required
-                csv_samples = []
-                if self.req_save_csv:
-                    csv_printer = open(get_filename(".csv"), "w")
-                    csv_printer.write("time [sec]")
-                    for ch in self.last_reply.chconfig:
-                        csv_printer.write(
-                            ",{:s} [{:s}]".format(ch.name, ch.unit)
-                        )
-                    csv_printer.write("\n")
-
                 # Now we can determine samples in a wave
                 n_xsamples = len(waves.wave[0].samples)
-                xlim = (-self.tscale / 2, self.tscale / 2)
-
-                # ax.set_facecolor('#404040')
-                # ax.axhline(y=0, color='k')
-                # ax.axvline(x=0, color='k')
-
-                chconfig_active = self.last_reply.chconfig[self.ch_active]
+                self.update_layout(n_xsamples)
 
                 if blank_screen:
-                    self.ax.clear()
-                    for ax in self.sub_ax:
-                        ax.clear()
-                        ax.set_axis_off()
-
-                    self.ax.set_xlim(xlim)
-
-                    if last_ylim is not None:
-                        self.ax.set_ylim(last_ylim)
+                    for line in self.lines:
+                        line.set_data([], [])
+                    if self.legend:
+                        self.legend.set_visible(False)
                 else:
-                    lines = []
-                    # xser is common among multiple channels, so assign here
-                    xser = np.linspace(xlim[0], xlim[1], n_xsamples)
-
-                    ct_sub_ax = 0
-                    for idx, wave in enumerate(waves.wave):
-                        chconfig_idx = self.last_reply.chconfig[idx]
-
-                        if idx == self.ch_active:
-                            cur_ax = self.ax
-                        else:
-                            cur_ax = self.sub_ax[ct_sub_ax]
-                            ct_sub_ax += 1
-
-                        cur_ax.clear()
-
-                        # Show only active channel axis
-                        if idx != self.ch_active:
-                            cur_ax.set_axis_off()
-
-                        # Convert wave samples to original float values
-                        ylim = (chconfig_idx.min, chconfig_idx.max)
-                        yser = np.asarray(wave.samples, dtype=np.float32)
-                        yser /= (1 << self.quantize_bits) / (ylim[1] - ylim[0])
-                        yser += (ylim[0] + ylim[1]) / 2
-
-                        # Keep yser samples for CSV output
-                        if self.req_save_csv:
-                            csv_samples.append(yser)
-
-                        # Use a special ylim which taking account of mag and
-                        # ypos, and set_ylim()
-                        last_ylim = modified_ylim(
-                            ylim, self.mag[idx], self.ypos[idx]
-                        )  # save for blank_screen
-                        cur_ax.set_ylim(last_ylim)
-
-                        # Generating label for line plot
-                        label = chconfig_idx.name
-                        if idx == self.ch_active:
-                            label += " (active)"
-
-                        # Finally plot line of a channel
-                        if self.view_enabled_ch[idx]:
-                            (l,) = cur_ax.plot(
-                                xser, yser, DEFAULT_CH_COLOR[idx], label=label
-                            )
-
-                            # Append the line to lines[] to show legend on the
-                            # screen.
-                            # Note that this is required ONLY for legend
-                            # purpose.  Even without this "lines", plottings
-                            # themselves are accomplished.
-                            lines.append(l)
-
-                # xlim is common among channels, so process here
-                self.ax.set_xlim(xlim)
-                self.ax.xaxis.set_major_formatter(formatter)
-                self.ax.set_xlabel("[sec]")
-
-                # ylim is configured for currently active channel
-                self.ax.yaxis.set_major_formatter(formatter)
-                self.ax.set_ylabel(
-                    "{:s} [{:s}]".format(
-                        chconfig_active.name, chconfig_active.unit
-                    )
-                )
-
-                # Show legend here
-                if len(lines) > 0:
-                    self.ax.legend(
-                        lines,
-                        [_.get_label() for _ in lines],
-                        loc="upper left",
-                        # labelcolor='white',
-                        facecolor="lightgray",
-                        # edgecolor='white'
+                    # Convert samples of all channels to original float
+                    # values
+                    self.dequantizer = get_dequantizer(
+                        self.dequantizer,
+                        self.last_reply.chconfig,
+                        self.quantize_bits,
                     )
+                    ysers = self.dequantizer(frame_samples(waves)[1])
+                    for idx, yser in enumerate(ysers):
+                        self.lines[self.slots[idx]].set_data(self.xser, yser)
+                    if self.legend:
+                        self.legend.set_visible(True)
+
+                    # Save to CSV file by a worker thread if required
+                    if self.req_save_csv:
+                        save_csv_in_background(
+                            get_filename(".csv"),
+                            self.xser,
+                            ysers,
+                            self.last_reply.chconfig,
+                        )
+                        self.req_save_csv = False
 
-                # Show grid and finally draw everything
-                self.ax.grid(True)
-                self.fig.canvas.draw()
-
-                # Save to CSV file if required
-                if self.req_save_csv:
-                    for i in range(n_xsamples):
-                        csv_printer.write("{:e}".format(xser[i]))
-                        for ch_id in range(len(self.last_reply.chconfig)):
-                            csv_printer.write(
-                                ",{:e}".format(csv_samples[ch_id][i])
-                            )
-                        csv_printer.write("\n")
-                    csv_printer.close()
-                    self.req_save_csv = False
+                # Let the canvas draw when the front end is ready, instead
+                # of rendering and sending every frame
+                self.fig.canvas.draw_idle()
 
             if self.stopped:
                 break
 
-            await asyncio.sleep(self.sleep_len)
+            # Let GUI operations be handled even if the next frame has been
+            # received already
+            await asyncio.sleep(0)
+
+    def update_layout(self, n_xsamples):
+        """
+        Update limits, colors, labels and legend, only when anything which
+        affects them (channel config, mag, ypos, timescale, etc.) has
+        changed since the last call
+        """
+        chconfig = self.last_reply.chconfig
+        layout = (
+            self.ch_active,
+            self.tscale,
+            n_xsamples,
+            tuple(self.mag),
+            tuple(self.ypos),
+            tuple(self.view_enabled_ch),
+            tuple((ch.name, ch.unit, ch.min, ch.max) for ch in chconfig),
+        )
+        if layout == self.last_layout:
+            return
+        self.last_layout = layout
+
+        # xser is common among multiple channels
+        xlim = (-self.tscale / 2, self.tscale / 2)
+        self.xser = np.linspace(xlim[0], xlim[1], n_xsamples)
+        self.ax.set_xlim(xlim)
+
+        # The active channel is drawn on the main axis
+        order = [self.ch_active] + [
+            idx for idx in range(len(chconfig)) if idx != self.ch_active
+        ]
+        self.slots = [order.index(idx) for idx in range(len(chconfig))]
+
+        axes = [self.ax] + self.sub_ax
+        for idx, ch in enumerate(chconfig):
+            # Generating label for line plot
+            label = ch.name
+            if idx == self.ch_active:
+                label += " (active)"
+
+            # Use a special ylim which taking account of mag and ypos
+            slot = self.slots[idx]
+            axes[slot].set_ylim(
+                modified_ylim((ch.min, ch.max), self.mag[idx], self.ypos[idx])
+            )
+            line = self.lines[slot]
+            line.set_color(DEFAULT_CH_COLOR[idx])
+            line.set_label(label)
+            line.set_visible(self.view_enabled_ch[idx])
+
+        # ylabel is of currently active channel
+        chconfig_active = chconfig[self.ch_active]
+        self.ax.set_ylabel(
+            "{:s} [{:s}]".format(chconfig_active.name, chconfig_active.unit)
+        )
+
+        # Show legend of visible lines in the channel order
+        if self.legend:
+            self.legend.remove()
+            self.legend = None
+        lines = [
+            self.lines[self.slots[idx]]
+            for idx in range(len(chconfig))
+            if self.view_enabled_ch[idx]
+        ]
+        if len(lines) > 0:
+            self.legend = self.ax.legend(
+                lines,
+                [_.get_label() for _ in lines],
+                loc="upper left",
+                facecolor="lightgray",
+            )
 
     def start(self):
         """
@@ -564,4 +560,5 @@ class Oscillo(widgets.HBox):
             task.cancel()
         plt.close("all")
         self.peer.terminate()
+        self.peer.close()
         del self.peer
@@ -0,0 +1,239 @@
+"""
+Playback of Recordings
+
+Playback replays a recording (see recorder.py) in place of a DSP object.
+config() and get_waves() behave like those of DSP, so the viewer and the
+acquisition thread don't need to know where frames come from.  Frames
+are read from the memory-mapped recording one by one, so even a recording
+larger than RAM can be replayed.
+
+
+Copyright (c) 2020-2021, Chubu University and Firmlogics
+
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this
+   list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation
+   and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+import threading
+import time
+
+import numpy as np
+
+from . import recorder  # pylint: disable=no-name-in-module
+from . import wavedecode  # pylint: disable=no-name-in-module
+
+# get_waves() returns at least this often (by repeating the current frame)
+# so that the caller can apply configurations or stop
+POLL_INTERVAL_SEC = 0.05
+
+
+class Playback:  # pylint: disable=too-many-instance-attributes
+    """
+    DSP look-alike which replays a recording
+
+    Frames are returned at the recorded pace multiplied by 'speed'.  If
+    the caller can't keep up, overdue frames are skipped by the index
+    rather than read.  Each frame is returned once, and get_waves() returns
+    None while no frame is due (e.g. paused).  Position, speed and pausing
+    can be controlled by another thread while get_waves() is being called.
+
+    'config_reply' and 'timescale' tell the configuration of the frame
+    returned last, as the recorded configuration can't be changed.
+    """
+
+    def __init__(self, filename, speed=1.0, loop=True, logger=None):
+        """
+        @param speed is the playback speed relative to the recorded one
+        @param loop is if playback restarts from the first frame at the end
+        """
+        if speed <= 0:
+            raise ValueError("speed must be positive")
+
+        self.recording = recorder.Recording(filename)
+        if len(self.recording) == 0:
+            self.recording.close()
+            raise ValueError(f"{filename} has no frames")
+
+        self.timestamps = self.recording.timestamps()
+        self.speed = speed
+        self.loop = loop
+        self.logger = logger
+
+        self.lock = threading.Condition()
+        self.index = 0  # index of the current frame
+        self.shown = False  # if the current frame has been returned
+        self.paused = False
+        self.origin = (0.0, 0.0)  # (time.monotonic(), recorded timestamp)
+        self.resolution = None  # resolution requested by config()
+        self.cache = (None, None)  # (index, waves) returned last
+        self.decode_time = 0.0
+
+        frame = self.recording.frame(0)
+        self.config_reply = frame.config_reply
+        self.timescale = frame.timescale
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def get_logger(self):
+        return self.logger
+
+    def config(self, resolution=None, **kwargs):
+        """
+        Counterpart of DSP.config().  Only the resolution is applied (by
+        scaling samples).  The other settings are fixed in the recording.
+        """
+        _ = kwargs
+        with self.lock:
+            if resolution:
+                self.resolution = resolution
+                self.cache = (None, None)
+                self.shown = False  # returned again by the resolution
+        return self.config_reply
+
+    def get_waves(self):
+        """
+        Return WaveGroupArray of the next frame, or None if no frame is due
+        within POLL_INTERVAL_SEC
+        """
+        with self.lock:
+            if not self.advance():
+                self.lock.wait(self.delay())
+                if not self.advance():
+                    return None
+            return self.load(self.index)
+
+    def advance(self):
+        """
+        Move to the frame which should be shown now.  Return False if there
+        is no such frame yet.
+        """
+        if not self.shown:
+            self.shown = True
+            self.origin = (time.monotonic(), self.timestamps[self.index])
+            return True
+        if self.paused:
+            return False
+
+        if self.index + 1 >= len(self):
+            if not self.loop:
+                return False
+            self.index = 0
+            self.shown = False
+            return self.advance()
+
+        now = time.monotonic()
+        if now < self.due(self.index + 1):
+            return False
+
+        # Skip overdue frames
+        recorded_now = self.origin[1] + (now - self.origin[0]) * self.speed
+        latest = np.searchsorted(self.timestamps, recorded_now, "right") - 1
+        self.index = min(max(latest, self.index + 1), len(self) - 1)
+        return True
+
+    def due(self, index):
+        """
+        Return time.monotonic() at which the frame should be shown
+        """
+        return (
+            self.origin[0]
+            + (self.timestamps[index] - self.origin[1]) / self.speed
+        )
+
+    def delay(self):
+        """
+        Return seconds to wait for the next frame (up to POLL_INTERVAL_SEC)
+        """
+        if self.paused or self.index + 1 >= len(self):
+            return POLL_INTERVAL_SEC
+        delay = self.due(self.index + 1) - time.monotonic()
+        return min(max(delay, 0.0), POLL_INTERVAL_SEC)
+
+    def load(self, index):
+        """
+        Return WaveGroupArray of the frame.  The same object is returned
+        while the frame is the same.
+        """
+        if self.cache[0] == index:
+            return self.cache[1]
+
+        frame = self.recording.frame(index)
+        waves = frame.waves
+        if self.resolution and self.resolution != frame.resolution:
+            samples = waves.samples.astype(np.int32)
+            shift = self.resolution - frame.resolution
+            if shift > 0:
+                samples <<= shift
+            else:
+                samples >>= -shift
+            waves = wavedecode.WaveGroupArray(
+                waves.triggered, [wave.ch_id for wave in waves.wave], samples
+            )
+
+        self.config_reply = frame.config_reply
+        self.timescale = frame.timescale
+        self.cache = (index, waves)
+        return waves
+
+    def position(self):
+        """
+        Return the index of the current frame
+        """
+        return self.index
+
+    def seek(self, index):
+        """
+        Show the frame of the index and continue playback from there
+        """
+        with self.lock:
+            self.index = min(max(index, 0), len(self) - 1)
+            self.shown = False
+            self.lock.notify_all()
+
+    def step(self, n=1):
+        """
+        Pause and move by n frames (backward if negative)
+        """
+        with self.lock:
+            self.paused = True
+            self.seek(self.index + n)
+
+    def pause(self, paused=True):
+        with self.lock:
+            if self.paused and not paused:
+                self.origin = (time.monotonic(), self.timestamps[self.index])
+            self.paused = paused
+            self.lock.notify_all()
+
+    def set_speed(self, speed):
+        if speed <= 0:
+            raise ValueError("speed must be positive")
+        with self.lock:
+            self.origin = (time.monotonic(), self.timestamps[self.index])
+            self.speed = speed
+            self.lock.notify_all()
+
+    def close(self):
+        self.cache = (None, None)
+        self.recording.close()
@@ -0,0 +1,427 @@
+"""
+Capture-to-disk Recorder
+
+Frames are appended to a data file, and their offsets to an index file
+(<data file> + INDEX_SUFFIX).  All integers are little-endian.
+
+Data file:
+    FILE_HEADER (FILE_MAGIC, FORMAT_VERSION), followed by records.  Each
+    record is RECORD_HEADER (type, payload length) and a payload.
+
+    RECORD_CONFIG payload:
+        resolution (uint8) and a serialized ConfigReply.  Written before
+        the first frame and whenever the configuration changes.
+    RECORD_FRAME payload:
+        FRAME_HEADER (seq, host timestamp, timescale, triggered, bytes per
+        sample, channels, samples per channel, offset of the effective
+        RECORD_CONFIG record), channel IDs (uint16 each) and samples
+        (int16 if resolution <= 16, int32 otherwise) in channel order.
+
+Index file:
+    FILE_HEADER (INDEX_MAGIC, FORMAT_VERSION), followed by INDEX_ENTRY
+    (offset of RECORD_FRAME record, host timestamp) of each frame.
+
+Data are written by chunks, and the index entries of a chunk are written
+only after the chunk itself, so a crash loses at most one chunk.
+
+
+Copyright (c) 2020-2021, Chubu University and Firmlogics
+
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this
+   list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation
+   and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+import mmap
+import os
+import queue
+import struct
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from . import oscillodsp_pb2  # pylint: disable=no-name-in-module
+from . import wavedecode  # pylint: disable=no-name-in-module
+
+FILE_MAGIC = b"OSCDSPRC"
+INDEX_MAGIC = b"OSCDSPIX"
+INDEX_SUFFIX = ".idx"
+FORMAT_VERSION = 1
+
+FILE_HEADER = struct.Struct("<8sI4x")
+RECORD_HEADER = struct.Struct("<cI")
+FRAME_HEADER = struct.Struct("<QddBBHIQ")
+FrameHeader = namedtuple(
+    "FrameHeader",
+    "seq timestamp timescale triggered itemsize n_channels n_samples "
+    "config_offset",
+)
+INDEX_ENTRY = struct.Struct("<Qd")
+INDEX_DTYPE = np.dtype([("offset", "<u8"), ("timestamp", "<f8")])
+
+RECORD_CONFIG = b"C"
+RECORD_FRAME = b"F"
+
+DEFAULT_CHUNK_BYTES = 4 * 1024 * 1024
+DEFAULT_FLUSH_INTERVAL_SEC = 1.0
+DEFAULT_QUEUE_SIZE = 256
+
+
+def index_filename(filename):
+    return str(filename) + INDEX_SUFFIX
+
+
+def sample_dtype(resolution):
+    """
+    Return the dtype of samples stored for the resolution (quantization
+    bits)
+    """
+    if resolution <= 16:
+        return np.dtype("<i2")
+    return np.dtype("<i4")
+
+
+def frame_samples(waves):
+    """
+    Return (ch_ids, samples) arrays of WaveGroup or WaveGroupArray.
+    samples is (0, 0) if there is no wave.
+    """
+    ch_ids = np.array([wave.ch_id for wave in waves.wave], dtype="<u2")
+    if len(ch_ids) == 0:
+        # E.g. the normal trigger mode is waiting for a trigger
+        return ch_ids, np.empty((0, 0), np.int32)
+    samples = getattr(waves, "samples", None)
+    if samples is None:
+        samples = np.array([wave.samples for wave in waves.wave])
+    return ch_ids, samples.reshape(len(ch_ids), -1)
+
+
+class RecordEncoder:  # pylint: disable=too-few-public-methods
+    """
+    Serializer of records of the data file
+
+    A RECORD_CONFIG record is put before a frame whenever its configuration
+    differs from the previous frame's, and frame records refer to it by
+    the file offset.
+    """
+
+    def __init__(self, resolution):
+        self.resolution = resolution
+        self.dtype = sample_dtype(resolution)
+        self.last_config = None
+        self.config_offset = 0
+
+    def encode(self, frame, buf, offset):
+        """
+        Append records of a frame (and its configuration if changed) to buf.
+        Return the file offset of the frame record.
+        @param offset is the file offset where buf will be written
+        """
+        if frame.config_reply is not self.last_config:
+            payload = struct.pack("<B", self.resolution)
+            payload += frame.config_reply.SerializeToString()
+            self.config_offset = offset + len(buf)
+            buf += RECORD_HEADER.pack(RECORD_CONFIG, len(payload))
+            buf += payload
+            self.last_config = frame.config_reply
+
+        ch_ids, samples = frame_samples(frame.waves)
+        samples = samples.astype(self.dtype, copy=False)
+        header = FRAME_HEADER.pack(
+            frame.seq,
+            frame.timestamp,
+            frame.timescale,
+            bool(frame.waves.triggered),
+            self.dtype.itemsize,
+            samples.shape[0],
+            samples.shape[1],
+            self.config_offset,
+        )
+
+        record_offset = offset + len(buf)
+        buf += RECORD_HEADER.pack(
+            RECORD_FRAME, len(header) + ch_ids.nbytes + samples.nbytes
+        )
+        buf += header
+        buf += ch_ids.tobytes()
+        buf += samples.tobytes()
+        return record_offset
+
+
+class Recorder(  # pylint: disable=too-many-instance-attributes
+    threading.Thread
+):
+    """
+    Writer thread which appends frames to a recording
+
+    record() is called by the acquisition thread for each frame.  It never
+    blocks: if the writer can't keep up and the queue is full, the frame
+    is dropped and counted in 'dropped'.  If writing fails, the exception
+    is kept in 'error' and the writer exits.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments,
+        # pylint: disable=too-many-positional-arguments
+        self,
+        filename,
+        resolution,
+        chunk_bytes=DEFAULT_CHUNK_BYTES,
+        flush_interval=DEFAULT_FLUSH_INTERVAL_SEC,
+        queue_size=DEFAULT_QUEUE_SIZE,
+        logger=None,
+    ):
+        super().__init__(daemon=True)
+
+        self.filename = filename
+        self.resolution = resolution
+        self.encoder = RecordEncoder(resolution)
+        self.chunk_bytes = chunk_bytes
+        self.flush_interval = flush_interval
+        self.logger = logger
+
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.n_frames = 0
+        self.dropped = 0
+        self.error = None
+
+        # Open files here so that the caller gets errors immediately
+        # pylint: disable=consider-using-with
+        self.data_file = open(filename, "wb")
+        self.index_file = open(index_filename(filename), "wb")
+        # pylint: enable=consider-using-with
+        self.data_file.write(FILE_HEADER.pack(FILE_MAGIC, FORMAT_VERSION))
+        self.index_file.write(FILE_HEADER.pack(INDEX_MAGIC, FORMAT_VERSION))
+
+        self.offset = FILE_HEADER.size  # file offset of self.buf
+        self.buf = bytearray()
+        self.index_buf = bytearray()
+        self.last_flush = time.time()
+
+    def record(self, frame):
+        """
+        Queue an acquisition.Frame to be written.  Frames are ignored after
+        the writer has stopped by error.
+        """
+        if self.error is not None:
+            return
+        try:
+            self.queue.put_nowait(frame)
+        except queue.Full:
+            self.dropped += 1
+
+    def run(self):
+        try:
+            while True:
+                try:
+                    frame = self.queue.get(timeout=self.flush_interval)
+                    if frame is None:
+                        break
+                    self.append(frame)
+                except queue.Empty:
+                    pass
+
+                if (
+                    len(self.buf) >= self.chunk_bytes
+                    or time.time() - self.last_flush >= self.flush_interval
+                ):
+                    self.flush()
+
+            self.flush()
+        except Exception as err:  # pylint: disable=broad-exception-caught
+            # Not only OSError, so that no failure leaves 'error' unset
+            if self.logger:
+                self.logger.error(f"Recorder stopped by error: {err}")
+            self.error = err
+        finally:
+            self.data_file.close()
+            self.index_file.close()
+
+    def append(self, frame):
+        """
+        Serialize a frame (and its configuration if changed) into the buffer
+        """
+        record_offset = self.encoder.encode(frame, self.buf, self.offset)
+        self.index_buf += INDEX_ENTRY.pack(record_offset, frame.timestamp)
+        self.n_frames += 1
+
+    def flush(self):
+        """
+        Write the buffered chunk, and then its index entries
+        """
+        if self.buf:
+            self.data_file.write(self.buf)
+            self.data_file.flush()
+            os.fsync(self.data_file.fileno())
+            self.offset += len(self.buf)
+            self.buf.clear()
+
+        if self.index_buf:
+            self.index_file.write(self.index_buf)
+            self.index_file.flush()
+            self.index_buf.clear()
+
+        self.last_flush = time.time()
+
+    def stop(self):
+        """
+        Write all queued frames, close the files and wait for the writer
+        """
+        if self.is_alive():
+            self.queue.put(None)
+            self.join()
+
+
+class RecordedFrame:  # pylint: disable=too-few-public-methods
+    """
+    A frame read from a recording.  'waves' is a WaveGroupArray whose
+    samples refer to the recording directly (without copying).
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments,
+        # pylint: disable=too-many-positional-arguments
+        self,
+        seq,
+        timestamp,
+        timescale,
+        waves,
+        config_reply,
+        resolution,
+    ):
+        self.seq = seq
+        self.timestamp = timestamp
+        self.timescale = timescale
+        self.waves = waves
+        self.config_reply = config_reply
+        self.resolution = resolution
+
+
+class Recording:
+    """
+    Memory-mapped reader of a recording.  frame(i) is O(1) by the index.
+    Index entries which point beyond the data (e.g. after a crash) are
+    ignored.
+    """
+
+    def __init__(self, filename):
+        self.index = None
+        with open(filename, "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        with open(index_filename(filename), "rb") as f:
+            self.index_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        for buf, magic in [
+            (self.data, FILE_MAGIC),
+            (self.index_map, INDEX_MAGIC),
+        ]:
+            if FILE_HEADER.unpack_from(buf) != (magic, FORMAT_VERSION):
+                self.close()
+                raise ValueError(f"{filename} is not a recording")
+
+        n_entries = (
+            len(self.index_map) - FILE_HEADER.size
+        ) // INDEX_DTYPE.itemsize
+        index = np.frombuffer(
+            self.index_map,
+            dtype=INDEX_DTYPE,
+            count=n_entries,
+            offset=FILE_HEADER.size,
+        )
+        n_valid = np.searchsorted(index["offset"], len(self.data))
+        while n_valid > 0 and not self.complete(index["offset"][n_valid - 1]):
+            n_valid -= 1
+        self.index = index[:n_valid]
+        self.configs = {}  # cache of (resolution, ConfigReply) by offset
+
+    def complete(self, offset):
+        """
+        Return True if the record at the offset is completely written
+        """
+        if offset + RECORD_HEADER.size > len(self.data):
+            return False
+        length = RECORD_HEADER.unpack_from(self.data, offset)[1]
+        return offset + RECORD_HEADER.size + length <= len(self.data)
+
+    def __len__(self):
+        return len(self.index)
+
+    def timestamps(self):
+        return self.index["timestamp"]
+
+    def config(self, offset):
+        """
+        Return (resolution, ConfigReply) of the RECORD_CONFIG record at the
+        offset
+        """
+        if offset not in self.configs:
+            rtype, length = RECORD_HEADER.unpack_from(self.data, offset)
+            if rtype != RECORD_CONFIG:
+                raise ValueError(f"no config record at {offset:d}")
+            start = offset + RECORD_HEADER.size
+            reply = oscillodsp_pb2.ConfigReply()
+            reply.ParseFromString(self.data[start + 1 : start + length])
+            self.configs[offset] = (self.data[start], reply)
+        return self.configs[offset]
+
+    def frame(self, i):
+        """
+        Return the i-th RecordedFrame
+        """
+        offset = int(self.index["offset"][i])
+        rtype = RECORD_HEADER.unpack_from(self.data, offset)[0]
+        if rtype != RECORD_FRAME:
+            raise ValueError(f"no frame record at {offset:d}")
+
+        pos = offset + RECORD_HEADER.size
+        meta = FrameHeader._make(FRAME_HEADER.unpack_from(self.data, pos))
+        pos += FRAME_HEADER.size
+
+        ch_ids = np.frombuffer(self.data, "<u2", meta.n_channels, pos)
+        pos += ch_ids.nbytes
+        samples = np.frombuffer(
+            self.data,
+            f"<i{meta.itemsize:d}",
+            meta.n_channels * meta.n_samples,
+            pos,
+        ).reshape(meta.n_channels, meta.n_samples)
+
+        resolution, config_reply = self.config(meta.config_offset)
+        return RecordedFrame(
+            meta.seq,
+            meta.timestamp,
+            meta.timescale,
+            wavedecode.WaveGroupArray(
+                bool(meta.triggered), ch_ids.tolist(), samples
+            ),
+            config_reply,
+            resolution,
+        )
+
+    def close(self):
+        self.index = None
+        for buf in [self.data, self.index_map]:
+            try:
+                buf.close()
+            except BufferError:
+                # Still referred by frames.  Closed when they are freed.
+                pass
@@ -0,0 +1,257 @@
+"""
+Multi-target Session
+
+A Session services several DSP objects by a single worker thread, which
+waits for replies from all of them by a selector over their file
+descriptors.  It replaces one acquisition.Acquisition thread per target,
+so that many boards can be watched by one process.
+
+
+Copyright (c) 2020-2021, Chubu University and Firmlogics
+
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this
+   list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation
+   and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+import selectors
+import threading
+import time
+from collections import deque
+
+from . import oscillodsp_pb2  # pylint: disable=no-name-in-module
+from .acquisition import DEFAULT_RING_SIZE, Frame, FrameRing
+from .dsp import DEFAULT_TIMEOUT_SECONDS
+
+POLL_INTERVAL_SEC = 0.05  # how often requests and time-outs are checked
+
+
+class SessionTarget:  # pylint: disable=too-many-instance-attributes
+    """
+    A target serviced by Session
+
+    It provides the same interface to the renderer as Acquisition does
+    (latest(), request_config(), 'ring', 'error' and 'recorder'), so that
+    a view doesn't need to know which of them acquires its frames.  If
+    communication with the target fails, the exception is kept in 'error'
+    and only the target is dropped from the session.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments,
+        # pylint: disable=too-many-positional-arguments
+        self,
+        name,
+        target,
+        config_reply,
+        timescale,
+        ring_size=DEFAULT_RING_SIZE,
+    ):
+        self.name = name
+        self.target = target
+        self.fd = target.fileno()
+        self.config_reply = config_reply
+        self.timescale = timescale
+        self.ring = FrameRing(ring_size)
+
+        self.config_requests = deque(maxlen=1)  # only the last one matters
+        self.config_seq = 0
+        self.applied_config_seq = 0  # config_seq of frames acquired now
+        self.sent_config = None  # (config_seq, kwargs) waiting for reply
+        self.seq = 0
+        self.error = None
+        self.recorder = None
+        self.last_time = time.monotonic()  # when the last frame arrived
+        self.retried = False  # if requests have been sent again
+
+    def request_config(self, **kwargs):
+        """
+        Ask the worker to call DSP.config(**kwargs) before the next frame.
+        Return the configuration sequence number which frames acquired with
+        the new configuration will have.
+        """
+        self.config_seq += 1
+        self.config_requests.append((self.config_seq, kwargs))
+        return self.config_seq
+
+    def latest(self):
+        return self.ring.latest()
+
+    def configured(self, reply):
+        """
+        Apply the ConfigReply to the configuration sent last.  Following
+        frames are acquired with it.
+        """
+        if reply.err != oscillodsp_pb2.NoError:
+            raise RuntimeError("Configuration Error")
+        config_seq, kwargs = self.sent_config
+        self.sent_config = None
+        self.config_reply = reply
+        if kwargs.get("timescale"):
+            self.timescale = kwargs["timescale"]
+        self.applied_config_seq = config_seq
+
+    def push(self, waves, now):
+        """
+        Push a frame received now
+        """
+        frame = Frame(
+            self.seq,
+            waves,
+            self.applied_config_seq,
+            self.config_reply,
+            self.timescale,
+            now - self.last_time,
+            self.target.decode_time,
+        )
+        self.ring.push(frame)
+        self.seq += 1
+        self.last_time = now
+        self.retried = False
+
+        recorder = self.recorder
+        if recorder:
+            recorder.record(frame)
+
+
+class Session(threading.Thread):
+    """
+    Worker thread which owns DSP objects, and keeps GetWaveGroup requests
+    in flight to all of them (see DSP.poll_waves())
+
+    Targets are added by add() before start().  Each of them must have a
+    file descriptor which a selector can watch (e.g. a socket or a POSIX
+    serial port).  Configuration changes are sent by the worker without
+    waiting for the reply (see DSP.send_config()), so that a slow target
+    doesn't hold up the others.  A target which doesn't reply within
+    'timeout' is requested again once, and then fails by TimeoutError.
+    """
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT_SECONDS, logger=None):
+        super().__init__(daemon=True)
+
+        self.timeout = timeout
+        self.logger = logger
+        self.selector = selectors.DefaultSelector()
+        self.targets = []
+        self.stop_requested = False
+
+    def add(  # pylint: disable=too-many-arguments,
+        # pylint: disable=too-many-positional-arguments
+        self,
+        name,
+        target,
+        config_reply,
+        timescale,
+        ring_size=DEFAULT_RING_SIZE,
+    ):
+        """
+        Add a configured DSP object and return its SessionTarget
+        @param name is a name to show the target by (e.g. its URL)
+        """
+        if self.is_alive():
+            raise RuntimeError("targets must be added before start()")
+
+        entry = SessionTarget(name, target, config_reply, timescale, ring_size)
+        self.selector.register(entry.fd, selectors.EVENT_READ, entry)
+        self.targets.append(entry)
+        return entry
+
+    def run(self):
+        for entry in self.targets:
+            self.service(entry, entry.target.send_requests)
+
+        while not self.stop_requested and self.selector.get_map():
+            for key, _ in self.selector.select(POLL_INTERVAL_SEC):
+                self.service(key.data, self.poll, key.data)
+
+            now = time.monotonic()
+            for entry in self.targets:
+                if entry.error is None:
+                    self.service(entry, self.check, entry, now)
+
+        # Leave the DSP objects usable by the caller
+        for entry in self.targets:
+            if entry.error is None:
+                entry.target.drain()
+        self.selector.close()
+
+    def service(self, entry, func, *args):
+        """
+        Call func(*args) for the target, and drop the target from the
+        session if it raises an exception
+        """
+        try:
+            func(*args)
+        except Exception as err:  # pylint: disable=broad-exception-caught
+            if self.logger:
+                self.logger.debug(f"{entry.name}: stopped by error: {err}")
+            entry.error = err
+            entry.target.inflight.clear()  # replies won't be waited for
+            self.selector.unregister(entry.fd)
+
+    def poll(self, entry):
+        """
+        Take frames which the target has replied
+        """
+        now = time.monotonic()
+        for waves in entry.target.poll_waves():
+            if isinstance(waves, oscillodsp_pb2.ConfigReply):
+                entry.configured(waves)
+            else:
+                entry.push(waves, now)
+
+    def check(self, entry, now):
+        """
+        Send the configuration requested last, and check time-out
+        """
+        if entry.sent_config is None:
+            try:
+                entry.sent_config = entry.config_requests.pop()
+            except IndexError:
+                pass
+            else:
+                entry.target.send_config(**entry.sent_config[1])
+                entry.target.send_requests()
+                entry.last_time = now
+
+        if now - entry.last_time < self.timeout:
+            return
+        if entry.retried or entry.sent_config is not None:
+            # The framing is unknown without the reply to Configure
+            raise TimeoutError("Timeout.  No response from DSP.")
+
+        # The replies may have been lost by corruption.  Request again
+        # only once, as the DSP may have really stopped.
+        entry.target.logger.warning("Timeout.  Requesting waves again")
+        entry.target.discard()
+        entry.target.send_requests()
+        entry.last_time = now
+        entry.retried = True
+
+    def stop(self):
+        """
+        Stop the worker and wait for it.  DSP objects whose 'error' is None
+        can be used by the caller again after this returns.
+        """
+        self.stop_requested = True
+        if self.is_alive():
+            self.join()
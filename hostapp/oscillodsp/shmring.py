@@ -0,0 +1,472 @@
+"""
+Shared-memory Frame Ring
+
+A ring of frames in a multiprocessing.shared_memory block, by which frames
+are handed from an acquisition process (e.g. broker.py) to consumer
+processes (viewers, recorders, analysis) without pickling nor copying.
+Consumers map NumPy arrays directly onto the block.
+
+Layout (all integers are little-endian):
+    HEADER_DTYPE: magic, version, dimensions of slots, resolution, the
+        number of frames written and the configuration version written last
+    CONFIG_SLOTS config areas (config_dtype()): resolution and a serialized
+        ConfigReply.  A configuration is written to the area of its
+        version % CONFIG_SLOTS before the first frame of it.
+    n_slots slot headers (slot_dtype()): metadata of frames (sequence
+        number, timestamp, timescale, trigger flag, configuration version,
+        channel IDs and the numbers of channels and samples)
+    n_slots slots of samples: (n_channels, n_samples) each
+
+There is only one writer.  Slot headers and config areas are guarded by
+seqlocks: 'lock' is 2 * seq + 1 while the writer is writing the frame of
+seq (or the configuration of the version) and 2 * seq + 2 after that.  A
+reader reads the lock before and after taking the contents, and discards
+them if the lock wasn't the expected even value both times.  This relies
+on 8-byte aligned stores being atomic and not reordered, as on x86-64.
+
+Copyright (c) 2020-2021, Chubu University and Firmlogics
+
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this
+   list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation
+   and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from . import oscillodsp_pb2  # pylint: disable=no-name-in-module
+from . import wavedecode  # pylint: disable=no-name-in-module
+from .recorder import RecordedFrame, frame_samples, sample_dtype
+
+MAGIC = b"OSCDSPSM"
+FORMAT_VERSION = 1
+
+DEFAULT_SLOTS = 64
+DEFAULT_SAMPLES = 500  # Wave.samples max_count in oscillodsp.options
+CONFIG_SLOTS = 4
+CONFIG_BYTES = 4096  # longest serialized ConfigReply
+ALIGNMENT = 64
+
+created_names = set()  # names of blocks created by this process
+
+HEADER_DTYPE = np.dtype(
+    [
+        ("magic", "S8"),
+        ("version", "<u4"),
+        ("n_slots", "<u4"),
+        ("n_channels", "<u4"),
+        ("n_samples", "<u4"),
+        ("itemsize", "<u4"),
+        ("resolution", "<u4"),  # initial one
+        ("n_written", "<u8"),  # number of frames written
+        ("config_version", "<u8"),  # version of the configuration written last
+    ]
+)
+
+
+def config_dtype():
+    return np.dtype(
+        [
+            ("lock", "<u8"),
+            ("length", "<u4"),
+            ("resolution", "<u4"),
+            ("payload", "u1", (CONFIG_BYTES,)),
+        ]
+    )
+
+
+def slot_dtype(n_channels):
+    return np.dtype(
+        [
+            ("lock", "<u8"),
+            ("seq", "<u8"),
+            ("timestamp", "<f8"),
+            ("timescale", "<f8"),
+            ("config_version", "<u8"),
+            ("n_samples", "<u4"),
+            ("n_channels", "<u2"),
+            ("triggered", "u1"),
+            ("ch_id", "<u2", (n_channels,)),
+        ],
+        align=True,
+    )
+
+
+def aligned(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def attach_shared_memory(name):
+    """
+    Attach an existing shared memory block, which is removed only by its
+    creator
+    """
+    try:
+        return shared_memory.SharedMemory(  # pylint: disable=unexpected-keyword-arg
+            name, track=False
+        )
+    except TypeError:
+        # Before Python 3.13, the resource tracker of this process would
+        # remove the block at exit (unless this process has created it)
+        shm = shared_memory.SharedMemory(name)
+        if shm.name not in created_names:
+            # pylint: disable=protected-access
+            resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+class SharedFrameRing:  # pylint: disable=too-many-instance-attributes
+    """
+    Frame ring in shared memory
+
+    The writer creates the ring by create(), and writes frames by write()
+    (or record(), so that the ring can be set to 'recorder' of Acquisition
+    or SessionTarget).  Readers attach it by attach(), and read frames by
+    read() or by SharedRingReader.
+    """
+
+    def __init__(self, shm, owner):
+        self.shm = shm
+        self.owner = owner  # if this process has created the block
+        self.header = np.ndarray((), HEADER_DTYPE, shm.buf)
+        if self.header["magic"] != MAGIC:
+            raise ValueError(f"{shm.name} is not a frame ring")
+        if self.header["version"] != FORMAT_VERSION:
+            raise ValueError(f"{shm.name} has an unsupported version")
+
+        self.n_slots = int(self.header["n_slots"])
+        self.n_channels = int(self.header["n_channels"])
+        self.n_samples = int(self.header["n_samples"])
+        self.dtype = np.dtype(f"<i{int(self.header['itemsize']):d}")
+        # Resolution of frames to be written.  The writer may change it
+        # if the DSP is configured with another one.
+        self.resolution = int(self.header["resolution"])
+
+        offset = aligned(HEADER_DTYPE.itemsize)
+        self.configs = np.ndarray(
+            (CONFIG_SLOTS,), config_dtype(), shm.buf, offset
+        )
+        offset = aligned(offset + self.configs.nbytes)
+        self.slots = np.ndarray(
+            (self.n_slots,), slot_dtype(self.n_channels), shm.buf, offset
+        )
+        offset = aligned(offset + self.slots.nbytes)
+        self.samples = np.ndarray(
+            (self.n_slots, self.n_channels, self.n_samples),
+            self.dtype,
+            shm.buf,
+            offset,
+        )
+
+        self.locks = self.slots["lock"]
+        self.config_locks = self.configs["lock"]
+        # ConfigReply and resolution written last by this writer
+        self.last_config = None
+        self.last_resolution = None
+        self.dropped = 0  # frames which didn't fit in a slot
+
+    @staticmethod
+    def size(n_slots, n_channels, n_samples, itemsize):
+        """
+        Return bytes of the shared memory block
+        """
+        offset = aligned(HEADER_DTYPE.itemsize)
+        offset = aligned(offset + CONFIG_SLOTS * config_dtype().itemsize)
+        offset = aligned(offset + n_slots * slot_dtype(n_channels).itemsize)
+        return offset + n_slots * n_channels * n_samples * itemsize
+
+    @classmethod
+    def create(  # pylint: disable=too-many-arguments,
+        # pylint: disable=too-many-positional-arguments
+        cls,
+        n_channels,
+        resolution,
+        n_samples=DEFAULT_SAMPLES,
+        n_slots=DEFAULT_SLOTS,
+        name=None,
+    ):
+        """
+        Create a ring and return it as the writer
+        @param resolution is the resolution (quantization bits) of frames,
+               which decides the size of samples.  Frames of a higher
+               resolution which needs larger samples can't be written.
+        @param name is the name of the shared memory block, or None for a
+               unique one ('shm.name' tells it)
+        """
+        itemsize = sample_dtype(resolution).itemsize
+        shm = shared_memory.SharedMemory(
+            name,
+            create=True,
+            size=cls.size(n_slots, n_channels, n_samples, itemsize),
+        )
+        created_names.add(shm.name)
+        header = np.ndarray((), HEADER_DTYPE, shm.buf)
+        header[()] = (
+            MAGIC,
+            FORMAT_VERSION,
+            n_slots,
+            n_channels,
+            n_samples,
+            itemsize,
+            resolution,
+            0,
+            0,
+        )
+        del header  # the block can't be closed while referred
+        return cls(shm, True)
+
+    @classmethod
+    def attach(cls, name):
+        """
+        Attach the ring of the name as a reader
+        """
+        shm = attach_shared_memory(name)
+        try:
+            return cls(shm, False)
+        except ValueError:
+            shm.close()
+            raise
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def record(self, frame):
+        """
+        Write an acquisition.Frame.  Unlike write(), frames which don't fit
+        in a slot are dropped and counted in 'dropped'.
+        """
+        try:
+            self.write(frame)
+        except ValueError:
+            self.dropped += 1
+
+    def write(self, frame):
+        """
+        Write an acquisition.Frame (and its configuration if changed) to the
+        next slot, overwriting the oldest frame
+        """
+        ch_ids, samples = frame_samples(frame.waves)
+        n_channels, n_samples = samples.shape
+        if sample_dtype(self.resolution).itemsize > self.dtype.itemsize:
+            raise ValueError(
+                f"{self.resolution:d}-bit samples don't fit in the ring"
+            )
+        if n_channels > self.n_channels or n_samples > self.n_samples:
+            raise ValueError(
+                f"frame of {n_channels:d} x {n_samples:d} samples doesn't"
+                " fit in the ring"
+            )
+
+        if (
+            frame.config_reply is not self.last_config
+            or self.resolution != self.last_resolution
+        ):
+            self.write_config(frame.config_reply)
+
+        seq = int(self.header["n_written"])
+        idx = seq % self.n_slots
+        slot = self.slots[idx : idx + 1]
+        self.locks[idx] = 2 * seq + 1
+        slot["seq"] = seq
+        slot["timestamp"] = frame.timestamp
+        slot["timescale"] = frame.timescale
+        slot["config_version"] = self.header["config_version"]
+        slot["n_samples"] = n_samples
+        slot["n_channels"] = n_channels
+        slot["triggered"] = bool(frame.waves.triggered)
+        slot["ch_id"][0, :n_channels] = ch_ids
+        self.samples[idx, :n_channels, :n_samples] = samples
+        self.locks[idx] = 2 * seq + 2
+        self.header["n_written"] = seq + 1
+
+    def write_config(self, config_reply):
+        payload = config_reply.SerializeToString()
+        if len(payload) > CONFIG_BYTES:
+            raise ValueError("ConfigReply is too long")
+
+        version = int(self.header["config_version"]) + 1
+        idx = version % CONFIG_SLOTS
+        area = self.configs[idx : idx + 1]
+        self.config_locks[idx] = 2 * version + 1
+        area["length"] = len(payload)
+        area["resolution"] = self.resolution
+        area["payload"][0, : len(payload)] = np.frombuffer(payload, "u1")
+        self.config_locks[idx] = 2 * version + 2
+        self.header["config_version"] = version
+        self.last_config = config_reply
+        self.last_resolution = self.resolution
+
+    def last_seq(self):
+        """
+        Return the sequence number of the frame written last, or -1
+        """
+        return int(self.header["n_written"]) - 1
+
+    def oldest_seq(self):
+        """
+        Return the sequence number of the oldest frame which may be read
+        """
+        return max(int(self.header["n_written"]) - self.n_slots, 0)
+
+    def valid(self, seq):
+        """
+        Return True if the frame of seq is still in the ring.  A reader of
+        views should check this after using them.
+        """
+        return int(self.locks[seq % self.n_slots]) == 2 * seq + 2
+
+    def config(self, version):
+        """
+        Return (resolution, ConfigReply) of the configuration version, or
+        None if it has been overwritten
+        """
+        idx = version % CONFIG_SLOTS
+        lock = 2 * version + 2
+        if int(self.config_locks[idx]) != lock:
+            return None
+        area = self.configs[idx]
+        resolution = int(area["resolution"])
+        payload = area["payload"][: int(area["length"])].tobytes()
+        if int(self.config_locks[idx]) != lock:
+            return None
+
+        reply = oscillodsp_pb2.ConfigReply()
+        reply.ParseFromString(payload)
+        return resolution, reply
+
+    def read(self, seq, copy=True, configs=None):
+        """
+        Return the frame of seq as a RecordedFrame, or None if it isn't in
+        the ring (not written yet, being written or overwritten) or its
+        configuration has been overwritten by CONFIG_SLOTS newer ones
+        @param copy is if samples should be copied.  Otherwise they are a
+               view of the ring, and valid(seq) should be checked after
+               using them.
+        @param configs is a dict to cache configurations by version
+        """
+        idx = seq % self.n_slots
+        lock = 2 * seq + 2
+        if int(self.locks[idx]) != lock:
+            return None
+
+        meta = self.slots[idx].copy()
+        n_channels = int(meta["n_channels"])
+        samples = self.samples[idx, :n_channels, : int(meta["n_samples"])]
+        if copy:
+            samples = samples.copy()
+        if int(self.locks[idx]) != lock:
+            return None
+
+        version = int(meta["config_version"])
+        config = configs.get(version) if configs is not None else None
+        if config is None:
+            config = self.config(version)
+            if config is None:
+                return None
+            if configs is not None:
+                configs[version] = config
+
+        return RecordedFrame(
+            seq,
+            float(meta["timestamp"]),
+            float(meta["timescale"]),
+            wavedecode.WaveGroupArray(
+                bool(meta["triggered"]),
+                meta["ch_id"][:n_channels].tolist(),
+                samples,
+            ),
+            config[1],
+            config[0],
+        )
+
+    def close(self):
+        """
+        Detach the ring.  The block is removed if this process has created
+        it.  Views of frames must have been freed.
+        """
+        self.header = self.configs = self.slots = self.samples = None
+        self.locks = self.config_locks = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+            created_names.discard(self.shm.name)
+
+
+class SharedRingReader:
+    """
+    Cursor of a reader of SharedFrameRing
+
+    latest() takes the newest frame like FrameRing.latest() does, and
+    next() takes frames in order.  Frames which have been skipped or
+    overwritten before being taken, or whose configuration has been
+    overwritten, are counted in 'dropped'.
+    """
+
+    def __init__(self, ring, copy=True):
+        """
+        @param copy is if samples should be copied (see
+               SharedFrameRing.read())
+        """
+        self.ring = ring
+        self.copy = copy
+        self.last_seq = -1  # sequence number of the frame taken last
+        self.dropped = 0
+        self.configs = {}  # (resolution, ConfigReply) by version
+
+    def take(self, seq):
+        frame = self.ring.read(seq, self.copy, self.configs)
+        if frame is None:
+            return None
+        self.dropped += seq - self.last_seq - 1
+        self.last_seq = seq
+        return frame
+
+    def latest(self):
+        """
+        Return the newest frame which hasn't been taken yet, or None
+        """
+        seq = self.ring.last_seq()
+        if seq <= self.last_seq:
+            return None
+        return self.take(seq)
+
+    def next(self):
+        """
+        Return the frame next to the one taken last (or the oldest one in
+        the ring if it has been overwritten), or None if no frame is new
+        """
+        while True:
+            seq = max(self.last_seq + 1, self.ring.oldest_seq())
+            if seq > self.ring.last_seq():
+                return None
+            frame = self.take(seq)
+            if frame is not None:
+                return frame
+            if self.ring.valid(seq):
+                # The frame is there, but its configuration isn't any more
+                # and never comes back.  Skip it.
+                self.dropped += seq - self.last_seq
+                self.last_seq = seq
+            # Otherwise overwritten while being read.  Try the oldest one
+            # again.
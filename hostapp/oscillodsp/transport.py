@@ -0,0 +1,504 @@
+"""
+Transports between Host and DSP
+
+A transport carries messages between the host and the DSP.  Each message
+is framed by a 2-byte big-endian length prefix, whatever the transport is.
+If requested by Configure, the DSP also puts a sync word before the length
+and a CRC-16/CCITT-FALSE (of the length and the message) after the message
+so that the host can find the start of a message again after lost or
+corrupted bytes.
+Transports are selected by the name of the interface:
+
+    tcp://host:port     TCP socket (e.g. Ethernet-to-UART bridges)
+    unix:///path        Unix-domain socket (e.g. local simulators)
+    ftdi://...          FTDI device by pyftdi
+    anything else       serial port by pyserial
+
+
+Copyright (c) 2020-2021, Chubu University and Firmlogics
+
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this
+   list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation
+   and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+import binascii
+import io
+import select
+import socket
+import struct
+import time
+from urllib.parse import urlsplit
+
+FTDI_PRODUCT_IDS = {0xA6D0}
+SOCKET_SCHEMES = ["tcp", "unix"]
+SOCKET_BUFFER_BYTES = 4 * 1024 * 1024
+RECV_CHUNK_BYTES = 64 * 1024
+RECV_BUFFER_BYTES = 256 * 1024
+LENGTH_PREFIX = struct.Struct("!H")
+MAX_MESSAGE_BYTES = 0xFFFF
+# Longest messages by the nanopb options (MessageToHost_size and
+# MessageToDSP_size in oscillodsp.pb.h).  Change them together with
+# protobuf/oscillodsp.options.
+MAX_MESSAGE_TO_HOST_BYTES = 8043
+MAX_MESSAGE_TO_DSP_BYTES = 49
+SYNC_WORD = b"\xa5\x5a"
+CRC = struct.Struct("!H")
+CRC_INIT = 0xFFFF
+MAX_FRAME_BYTES = (
+    len(SYNC_WORD) + LENGTH_PREFIX.size + MAX_MESSAGE_BYTES + CRC.size
+)
+
+
+def is_socket_url(url):
+    """
+    Return True if the interface name is a URL of a socket transport
+    """
+    return urlsplit(url).scheme in SOCKET_SCHEMES
+
+
+def frame_message(payload, crc=False):
+    """
+    Return a message framed as the DSP sends it, i.e. with the length
+    prefix, and also with the sync word and CRC if 'crc' is set
+    """
+    frame = LENGTH_PREFIX.pack(len(payload)) + payload
+    if crc:
+        frame = SYNC_WORD + frame + CRC.pack(binascii.crc_hqx(frame, CRC_INIT))
+    return frame
+
+
+class FrameReader:  # pylint: disable=too-many-instance-attributes
+    """
+    Receive-side framer which reassembles length-prefixed messages from
+    bulk reads
+
+    Bytes are read by large chunks into a reusable buffer, and complete
+    messages are sliced out of it as memoryviews without copying.  A
+    message may span several reads.  A memoryview returned by
+    next_frame() is valid only until the next call.
+
+    A frame which can't be a message (a bad sync word, length or CRC) is
+    dropped by skipping bytes until the next plausible frame.  Without
+    'crc', a broken frame may look plausible, so the receiver should call
+    resync() if the message can't be decoded.
+    """
+
+    def __init__(self, fill, size=RECV_BUFFER_BYTES, max_length=None):
+        """
+        @param fill is a function which stores available bytes into a given
+               memoryview and returns the number of them.  It should wait
+               for at least one byte and return 0 on time-out.
+        @param size is size of the buffer, which must be able to hold the
+               longest message
+        @param max_length is the length of the longest valid message.
+               Longer lengths are treated as corrupted ones.
+        """
+        if size < MAX_FRAME_BYTES:
+            raise ValueError(f"size must be {MAX_FRAME_BYTES:d} or larger")
+        self.fill = fill
+        self.buf = bytearray(size)
+        self.view = memoryview(self.buf)
+        self.start = 0  # beginning of bytes not taken yet
+        self.end = 0  # end of bytes received
+        self.last_start = None  # beginning of the frame taken last
+        self.n_reads = 0
+        self.max_length = max_length or MAX_MESSAGE_BYTES
+        self.crc = False  # if frames have the sync word and CRC
+        self.resyncing = False
+        self.dropped_bytes = 0
+        self.dropped_frames = 0
+
+    def buffered(self):
+        return self.end - self.start
+
+    def clear(self):
+        self.start = self.end = 0
+        self.last_start = None
+        self.resyncing = False
+
+    def next_frame(self):
+        """
+        Return the next message (without the framing bytes)
+        """
+        while True:
+            frame = self.parse()
+            if frame is not None:
+                return frame
+            if self.feed() == 0:
+                break
+
+        # The rest of a partial message never comes, so it must have been
+        # a corrupted one.  Look for a message after it.
+        while self.buffered() > 0:
+            self.skip()
+            frame = self.parse()
+            if frame is not None:
+                return frame
+        raise TimeoutError("Timeout.  No response from DSP.")
+
+    def feed(self):
+        """
+        Read bytes once by fill() and return the number of them.  A
+        selector loop should call this only when bytes are available, and
+        then take messages by parse().
+        """
+        # Drop bytes taken already by moving the rest to the head, so that
+        # the buffer has room for the longest message.  Not only when the
+        # room is short, as a caller may leave many messages buffered.
+        if self.start >= MAX_FRAME_BYTES or (
+            self.start > 0 and len(self.buf) - self.end < MAX_FRAME_BYTES
+        ):
+            n = self.buffered()
+            self.buf[:n] = self.view[self.start : self.end]
+            self.start, self.end = 0, n
+            self.last_start = None
+
+        n = self.fill(self.view[self.end :])
+        self.end += n
+        if n > 0:
+            self.n_reads += 1
+        return n
+
+    def parse(self):
+        """
+        Take a frame from the buffer and return its message, or None if no
+        complete frame is available.  Implausible frames are skipped.
+        """
+        header = LENGTH_PREFIX.size
+        trailer = 0
+        if self.crc:
+            header += len(SYNC_WORD)
+            trailer = CRC.size
+
+        while self.buffered() >= header:
+            if self.crc and self.buf[self.start : self.start + 2] != SYNC_WORD:
+                self.skip()
+                continue
+
+            pos = self.start + header
+            length = LENGTH_PREFIX.unpack_from(self.buf, pos - 2)[0]
+            if length > self.max_length:
+                self.skip()
+                continue
+
+            end = pos + length + trailer
+            if self.end < end:
+                return None
+
+            if self.crc:
+                crc = CRC.unpack_from(self.buf, pos + length)[0]
+                # CRC covers the length and the message
+                data = self.view[pos - 2 : pos + length]
+                if binascii.crc_hqx(data, CRC_INIT) != crc:
+                    self.skip()
+                    continue
+
+            self.last_start, self.start = self.start, end
+            self.resyncing = False
+            return self.view[pos : pos + length]
+
+        return None
+
+    def skip(self):
+        """
+        Drop bytes at the beginning of the buffer, up to the next sync word
+        if any, or one byte
+        """
+        if not self.resyncing:
+            self.resyncing = True
+            self.dropped_frames += 1
+
+        start = self.start + 1
+        if self.crc:
+            start = self.buf.find(SYNC_WORD, start, self.end)
+            if start < 0:
+                # The last byte may be the first one of a sync word
+                start = max(self.end - 1, self.start + 1)
+        self.dropped_bytes += start - self.start
+        self.start = start
+
+    def resync(self):
+        """
+        Drop the frame returned last (which turned out to be broken), and
+        look for the next frame from its second byte
+        """
+        if self.last_start is None:
+            return
+        self.start, self.last_start = self.last_start, None
+        self.skip()
+
+
+class Transport:
+    """
+    Base class of transports
+
+    Subclasses provide read_into() (see FrameReader), write(), and the
+    subset of the pyserial API which is used by DSP (flush(), in_waiting,
+    out_waiting, reset_input_buffer(), reset_output_buffer() and close()).
+    Bytes held by the reader are included in in_waiting and discarded by
+    reset_input_buffer().  Transports which can be watched by a selector
+    provide fileno() too.
+    """
+
+    def __init__(self):
+        # A length longer than any reply is taken as corruption at once,
+        # instead of waiting for bytes which never come
+        self.reader = FrameReader(
+            self.read_into, max_length=MAX_MESSAGE_TO_HOST_BYTES
+        )
+
+    def send_frame(self, payload):
+        """
+        Send a message with the length prefix.  Messages to the DSP never
+        have the sync word nor CRC.
+        """
+        self.write(LENGTH_PREFIX.pack(len(payload)) + payload)
+        self.flush()
+
+    def recv_frame(self):
+        """
+        Receive a message and return it without the length prefix.  The
+        returned memoryview is valid until the next call.
+        """
+        return self.reader.next_frame()
+
+    def read_into(self, view):
+        raise NotImplementedError
+
+    def write(self, s):
+        raise NotImplementedError
+
+    def flush(self):
+        pass
+
+    def fileno(self):
+        raise io.UnsupportedOperation(
+            f"{type(self).__name__} can't be watched by a selector"
+        )
+
+
+class SerialTransport(Transport):
+    """
+    Transport by a pyserial object
+    """
+
+    def __init__(self, ser):
+        super().__init__()
+        self.ser = ser
+
+    def read_into(self, view):
+        # Take all bytes already received, or wait for one
+        n = min(max(self.ser.in_waiting, 1), len(view))
+        s = self.ser.read(n)
+        view[: len(s)] = s
+        return len(s)
+
+    def write(self, s):
+        self.ser.write(s)
+
+    def flush(self):
+        self.ser.flush()
+
+    def fileno(self):
+        # POSIX serial ports only
+        if not hasattr(self.ser, "fileno"):
+            return super().fileno()
+        return self.ser.fileno()
+
+    @property
+    def in_waiting(self):
+        return self.reader.buffered() + self.ser.in_waiting
+
+    @property
+    def out_waiting(self):
+        return self.ser.out_waiting
+
+    def reset_input_buffer(self):
+        self.reader.clear()
+        self.ser.reset_input_buffer()
+
+    def reset_output_buffer(self):
+        self.ser.reset_output_buffer()
+
+    def close(self):
+        self.ser.close()
+
+
+class FtdiTransport(SerialTransport):
+    """
+    Transport by a pyftdi serialext object
+
+    pyftdi doesn't tell in_waiting, so bytes are taken directly from the
+    USB read buffer of pyftdi, which are fetched by bulk transfers.
+    """
+
+    def __init__(self, ser, timeout):
+        super().__init__(ser)
+        self.timeout = timeout
+
+    def fileno(self):
+        # Reads are polling USB transfers, which a selector can't watch
+        return Transport.fileno(self)
+
+    def read_into(self, view):
+        deadline = None
+        if self.timeout is not None:
+            deadline = time.monotonic() + self.timeout
+
+        while True:
+            s = self.ser.udev.read_data(len(view))
+            if s or (deadline is not None and time.monotonic() > deadline):
+                break
+        view[: len(s)] = s
+        return len(s)
+
+
+class SocketTransport(Transport):
+    """
+    Transport by a connected stream socket
+
+    Bytes are received directly into the buffer of the reader.  Writes are
+    never queued (sendall() blocks), so out_waiting is always 0.
+    """
+
+    def __init__(self, sock, timeout):
+        """
+        @param timeout is seconds which a read waits for, or None to wait
+               forever
+        """
+        super().__init__()
+        for opt in [socket.SO_RCVBUF, socket.SO_SNDBUF]:
+            sock.setsockopt(socket.SOL_SOCKET, opt, SOCKET_BUFFER_BYTES)
+        if sock.family in [socket.AF_INET, socket.AF_INET6]:
+            # A message is sent by a single write, so don't delay it
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.settimeout(timeout)
+
+        self.sock = sock
+
+    def read_into(self, view):
+        try:
+            n = self.sock.recv_into(view)
+        except socket.timeout:
+            return 0
+        if n == 0:
+            raise ConnectionError("Connection closed by DSP")
+        return n
+
+    def write(self, s):
+        self.sock.sendall(s)
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def readable(self):
+        return bool(select.select([self.sock], [], [], 0)[0])
+
+    @property
+    def in_waiting(self):
+        # Bytes not received yet are counted as one
+        return self.reader.buffered() + int(self.readable())
+
+    @property
+    def out_waiting(self):
+        return 0
+
+    def reset_input_buffer(self):
+        self.reader.clear()
+        scratch = bytearray(RECV_CHUNK_BYTES)
+        while self.readable() and self.sock.recv_into(scratch) > 0:
+            pass
+
+    def reset_output_buffer(self):
+        pass
+
+    def close(self):
+        self.sock.close()
+
+
+def open_socket(url, timeout):
+    """
+    Connect to the socket of the URL and return the socket
+    """
+    parts = urlsplit(url)
+    if parts.scheme == "tcp":
+        return socket.create_connection(
+            (parts.hostname, parts.port), timeout=timeout
+        )
+
+    if not hasattr(socket, "AF_UNIX"):
+        raise ValueError("Unix-domain sockets aren't available")
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(parts.path)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def open_transport(tty, bitrate, timeout, logger=None):
+    """
+    Open the interface and return a Transport
+    @param tty is the name of the interface (see the top of this module)
+    @param bitrate is ignored by socket transports
+    @param timeout is seconds which a read waits for
+    """
+    if logger:
+        logger.debug(f"open_transport: {tty} {bitrate}")
+
+    if is_socket_url(tty):
+        if logger:
+            logger.info("Using socket")
+        return SocketTransport(open_socket(tty, timeout), timeout)
+
+    # Different procedures are required for PyFTDI and PySerial
+    if len(tty) > 4 and tty[:4] == "ftdi":
+        # The reason for importing here is that it may be required for
+        # PyInstaller. This needs to be re-checked.
+        import pyftdi.serialext  # pylint: disable=import-outside-toplevel
+        from pyftdi.ftdi import Ftdi  # pylint: disable=import-outside-toplevel
+
+        for pid in FTDI_PRODUCT_IDS:
+            try:
+                Ftdi.add_custom_product(Ftdi.DEFAULT_VENDOR, pid)
+            except ValueError:
+                pass
+
+        if logger:
+            logger.info("Using pyftdi")
+
+        Ftdi.show_devices()
+        ser = pyftdi.serialext.serial_for_url(
+            tty, baudrate=bitrate, timeout=timeout
+        )
+        # XXX should raise exception for illegal caudrate
+        return FtdiTransport(ser, timeout)
+
+    import serial  # pylint: disable=import-outside-toplevel
+
+    if logger:
+        logger.debug("Using pyserial")
+    # This may raise serial.SerialException:
+    return SerialTransport(serial.Serial(tty, bitrate, timeout=timeout))
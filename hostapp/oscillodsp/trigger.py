@@ -0,0 +1,200 @@
+"""
+Software Trigger
+
+The peer DSP triggers by itself (get_pos() in oscillo.c), checking at
+most N_WAVE_SAMPLES points of one channel in strides of the time scale.
+TriggerEngine triggers on the host instead, over a continuous stream of
+samples given by blocks, and checks every sample.
+
+An edge is detected with hysteresis as the DSP does with HIST_MARGIN_Y.
+For a rising edge, the engine is armed when a sample goes below
+(level - margin), and triggers at the first sample which reaches the
+level after that.  A falling edge is the opposite.  The state is carried
+across blocks, so edges at block boundaries are neither missed nor
+doubled.
+
+
+
+Copyright (c) 2020-2021, Chubu University and Firmlogics
+
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this
+   list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation
+   and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+from collections import deque
+
+import numpy as np
+
+from . import oscillodsp_pb2  # pylint: disable=no-name-in-module
+
+HIST_MARGIN_Y = 0.015  # of full scale, as in config.h of the DSP
+
+
+def hysteresis(resolution):
+    """
+    Return the margin (in units of samples) which the DSP uses for the
+    resolution
+    """
+    return int(HIST_MARGIN_Y * (1 << resolution))
+
+
+def find_edges(samples, level, margin, trigtype, armed=False):
+    """
+    Return (indices, armed) of edges in a 1-D array of samples
+
+    @param level is the trigger level in units of samples
+    @param margin is the hysteresis in units of samples (> 0)
+    @param trigtype is oscillodsp_pb2.RisingEdge or FallingEdge
+    @param armed is if the engine was armed before samples[0]
+    @return indices of samples at the edges, and if the engine is armed
+            after the last sample
+    """
+    samples = np.asarray(samples)
+    if trigtype == oscillodsp_pb2.RisingEdge:
+        fired = samples >= level
+        arming = samples < level - margin
+    elif trigtype == oscillodsp_pb2.FallingEdge:
+        fired = samples <= level
+        arming = samples > level + margin
+    else:
+        raise ValueError(f"trigger type {trigtype} isn't an edge")
+
+    # Carry the last of fired or arming samples forward.  Indices are
+    # shifted by one, so that 0 stands for none of them.  state[i] is if
+    # the engine is armed before samples[i].
+    positions = np.where(fired | arming, np.arange(1, len(samples) + 1), 0)
+    np.maximum.accumulate(positions, out=positions)
+    state = np.concatenate(([armed], arming))[np.concatenate(([0], positions))]
+
+    # Edges are fired samples while armed
+    return np.flatnonzero(state[:-1] & fired), bool(state[-1])
+
+
+class Trigger:  # pylint: disable=too-few-public-methods
+    """
+    A triggered window.  'position' is the index of the trigger sample in
+    the whole stream, and 'samples' are (channels, pre + post) samples
+    from position - pre.
+    """
+
+    def __init__(self, position, samples):
+        self.position = position
+        self.samples = samples
+
+
+class TriggerEngine:  # pylint: disable=too-few-public-methods,
+    # pylint: disable=too-many-instance-attributes
+    """
+    Edge trigger over a continuous stream of (channels, samples) blocks
+
+    feed() takes blocks in order and returns triggers whose windows have
+    been completed.  Samples which may belong to windows of later triggers
+    are kept between calls.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments,
+        # pylint: disable=too-many-positional-arguments
+        self,
+        level,
+        trigtype=oscillodsp_pb2.RisingEdge,
+        ch_trig=0,
+        margin=hysteresis(16),
+        pre=250,
+        post=250,
+        holdoff=None,
+    ):
+        """
+        @param level is the trigger level in units of samples
+        @param margin is the hysteresis in units of samples (see
+               hysteresis())
+        @param pre, post are the numbers of samples in a window before and
+               after (including) the trigger sample
+        @param holdoff is the minimum number of samples between triggers,
+               or None for pre + post so that windows don't overlap
+        """
+        if margin <= 0 or pre < 0 or post <= 0:
+            raise ValueError("invalid margin or window")
+        self.level = level
+        self.trigtype = trigtype
+        self.ch_trig = ch_trig
+        self.margin = margin
+        self.pre = pre
+        self.post = post
+        self.holdoff = pre + post if holdoff is None else holdoff
+
+        self.armed = False
+        self.position = 0  # index of the next sample in the stream
+        self.kept = None  # samples kept from previous blocks
+        self.pending = deque()  # positions of triggers waiting for samples
+        self.last_trigger = None
+        self.dropped = 0  # triggers without enough samples before them
+
+    def feed(self, block):
+        """
+        Process a (channels, samples) block, and return a list of Trigger
+        whose windows have been completed
+        """
+        block = np.asarray(block)
+        edges, self.armed = find_edges(
+            block[self.ch_trig],
+            self.level,
+            self.margin,
+            self.trigtype,
+            self.armed,
+        )
+        for edge in (edges + self.position).tolist():
+            if (
+                self.last_trigger is not None
+                and edge - self.last_trigger < self.holdoff
+            ):
+                continue
+            self.last_trigger = edge
+            if edge < self.pre:
+                # The stream started in the middle of the window
+                self.dropped += 1
+            else:
+                self.pending.append(edge)
+
+        end = self.position + block.shape[1]
+        self.position = end
+        if self.kept is not None:
+            block = np.concatenate((self.kept, block), axis=1)
+        start = end - block.shape[1]  # position of block[:, 0]
+
+        triggers = []
+        while self.pending and self.pending[0] + self.post <= end:
+            edge = self.pending.popleft()
+            offset = edge - self.pre - start
+            triggers.append(
+                Trigger(
+                    edge,
+                    block[:, offset : offset + self.pre + self.post].copy(),
+                )
+            )
+
+        # Keep samples for pending triggers and windows of later ones
+        keep_from = end - self.pre
+        if self.pending:
+            keep_from = min(keep_from, self.pending[0] - self.pre)
+        self.kept = block[:, max(keep_from - start, 0) :].copy()
+        return triggers
@@ -0,0 +1,455 @@
+"""
+Fast WaveGroup Decoder
+
+Decodes MessageToHost messages which carry a WaveGroup directly from the
+protobuf wire format into NumPy arrays, without creating a Python int for
+each sample.  Other messages should be parsed by the generated classes.
+Samples are either packed sint32 varints (Wave.samples) or raw bytes
+(Wave.packed_samples) if negotiated by Configure.compact.  Varints may be
+differences (see Encoding in oscillodsp.proto), which DeltaDecoder
+reconstructs.
+
+
+Copyright (c) 2020-2021, Chubu University and Firmlogics
+
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this
+   list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation
+   and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+import numpy as np
+
+# Protobuf wire types
+WIRETYPE_VARINT = 0
+WIRETYPE_FIXED64 = 1
+WIRETYPE_LEN = 2
+WIRETYPE_FIXED32 = 5
+
+# Field numbers (refer oscillodsp.proto)
+MESSAGETOHOST_ID = 1
+MESSAGETOHOST_WAVEGROUP = 4
+WAVEGROUP_TRIGGERED = 1
+WAVEGROUP_WAVE = 2
+WAVEGROUP_FRAME_SEQ = 3
+WAVEGROUP_DELTA = 4
+WAVE_CH_ID = 1
+WAVE_SAMPLES = 2
+WAVE_PACKED_SAMPLES = 3
+
+SAMPLE_BITS = [8, 12, 16]  # supported bits of Wave.packed_samples
+
+# Encodings of Wave.samples (refer oscillodsp.proto)
+ENCODING_PLAIN = 0
+ENCODING_SAMPLE_DELTA = 1
+ENCODING_FRAME_DELTA = 2
+
+
+class NotWaveGroupError(ValueError):
+    """
+    Raised when a message can't be decoded by the fast path.  The caller
+    should parse the message by the generated classes instead.
+    """
+
+
+class WaveArray:  # pylint: disable=too-few-public-methods
+    """
+    Counterpart of the Wave message.  'samples' is a row of the samples
+    array of the WaveGroupArray it belongs to.
+    """
+
+    def __init__(self, ch_id, samples):
+        self.ch_id = ch_id
+        self.samples = samples
+
+
+class WaveGroupArray:  # pylint: disable=too-few-public-methods
+    """
+    Counterpart of the WaveGroup message which holds all samples in one
+    (channels, samples) int32 array.  It can be used in place of WaveGroup
+    as 'triggered' and 'wave[i].samples' are available as well.
+
+    'payload_bytes' is the number of bytes which carried the samples.
+    """
+
+    def __init__(self, triggered, ch_ids, samples):
+        self.triggered = triggered
+        self.samples = samples
+        self.wave = [
+            WaveArray(ch_id, samples[idx]) for idx, ch_id in enumerate(ch_ids)
+        ]
+        self.frame_seq = 0
+        self.delta = False
+        self.payload_bytes = 0
+
+
+class DeltaDecoder:
+    """
+    Reconstructor of samples encoded as differences, which also measures
+    the compression ratio against plain varints
+
+    The last frame is kept for FrameDelta.  If the frame which a delta
+    frame refers to has been lost, the delta frame can't be reconstructed
+    and a key frame is required.
+    """
+
+    def __init__(self):
+        self.prev = None  # samples of the last frame for FrameDelta
+        self.frame_seq = 0
+        self.plain_bytes = 0
+        self.coded_bytes = 0
+
+    def reset(self):
+        self.prev = None
+
+    def decode(self, waves, encoding):
+        """
+        Reconstruct samples of WaveGroupArray in place.  Return False if
+        they can't be reconstructed.
+        """
+        samples = waves.samples
+        if encoding == ENCODING_SAMPLE_DELTA:
+            np.cumsum(samples, axis=1, dtype=np.int32, out=samples)
+        elif encoding == ENCODING_FRAME_DELTA and samples.size > 0:
+            if waves.delta:
+                if (
+                    self.prev is None
+                    or self.prev.shape != samples.shape
+                    or self.frame_seq + 1 != waves.frame_seq
+                ):
+                    self.prev = None
+                    return False
+                samples += self.prev
+            self.prev = samples.copy()
+            self.frame_seq = waves.frame_seq
+
+        self.plain_bytes += varint_bytes(samples)
+        self.coded_bytes += waves.payload_bytes
+        return True
+
+    def ratio(self):
+        """
+        Return the compression ratio so far (bytes of plain varints divided
+        by bytes received)
+        """
+        if self.coded_bytes == 0:
+            return 1.0
+        return self.plain_bytes / self.coded_bytes
+
+
+def varint_bytes(samples):
+    """
+    Return the number of bytes which samples take as packed sint32
+    """
+    v = samples.astype(np.int64)
+    v = (v << 1) ^ (v >> 63)  # zigzag encoding
+    return int(
+        v.size
+        + np.count_nonzero(v >= 1 << 7)
+        + np.count_nonzero(v >= 1 << 14)
+        + np.count_nonzero(v >= 1 << 21)
+        + np.count_nonzero(v >= 1 << 28)
+    )
+
+
+def read_varint(buf, pos):
+    """
+    Read a varint at buf[pos] and return the value and the next position
+    """
+    try:
+        b = buf[pos]
+        if b < 0x80:  # shortcut for the most common case
+            return b, pos + 1
+
+        value = b & 0x7F
+        shift = 7
+        while True:
+            pos += 1
+            b = buf[pos]
+            value |= (b & 0x7F) << shift
+            if b < 0x80:
+                return value, pos + 1
+            shift += 7
+            if shift >= 64:
+                raise NotWaveGroupError("varint too long")
+    except IndexError as err:
+        raise NotWaveGroupError("truncated varint") from err
+
+
+def skip_field(buf, pos, wiretype):
+    """
+    Skip a field value of the wiretype at buf[pos] and return the next
+    position
+    """
+    if wiretype == WIRETYPE_VARINT:
+        _, pos = read_varint(buf, pos)
+    elif wiretype == WIRETYPE_FIXED64:
+        pos += 8
+    elif wiretype == WIRETYPE_LEN:
+        length, pos = read_varint(buf, pos)
+        pos += length
+    elif wiretype == WIRETYPE_FIXED32:
+        pos += 4
+    else:
+        raise NotWaveGroupError(f"unsupported wire type {wiretype:d}")
+
+    if pos > len(buf):
+        raise NotWaveGroupError("truncated field")
+    return pos
+
+
+def iter_fields(buf, start, end):
+    """
+    Iterate over fields in buf[start:end] and yield (field_number, wiretype,
+    position of the value)
+    """
+    pos = start
+    while pos < end:
+        key, pos = read_varint(buf, pos)
+        field, wiretype = key >> 3, key & 0x07
+        yield field, wiretype, pos
+        pos = skip_field(buf, pos, wiretype)
+
+    if pos != end:
+        raise NotWaveGroupError("field overruns its message")
+
+
+def decode_packed_sint32(data, out=None):
+    """
+    Decode packed sint32 (zigzag encoded varints) in data to an int32 array.
+    Decoding is vectorized by NumPy.
+
+    @param data is bytes-like object or uint8 array holding the packed
+           varints only
+    @param out is optional int32 array to store the result.  Its size must
+           be equal to the number of varints, but its shape may differ.
+    """
+    b = np.frombuffer(data, dtype=np.uint8)
+    ends = np.flatnonzero(b < 0x80)  # last byte of each varint
+    n = len(ends)
+
+    if len(b) > 0 and (n == 0 or ends[-1] != len(b) - 1):
+        raise NotWaveGroupError("truncated varint")
+
+    if out is None:
+        out = np.empty(n, dtype=np.int32)
+    elif out.size != n:
+        raise ValueError("size of out doesn't match")
+
+    if n == len(b):
+        # Every varint is a single byte (typical for 8-bit resolution)
+        v = b.astype(np.int64)
+    else:
+        starts = np.empty(n, dtype=np.intp)
+        starts[0] = 0
+        starts[1:] = ends[:-1] + 1
+        shifts = np.arange(len(b)) - np.repeat(starts, ends - starts + 1)
+        if shifts.max() > 4:
+            raise NotWaveGroupError("varint too long for sint32")
+        v = np.add.reduceat(
+            (b & 0x7F).astype(np.int64) << (7 * shifts), starts
+        )
+        v &= 0xFFFFFFFF
+
+    # Zigzag decoding
+    out.reshape(-1)[:] = (v >> 1) ^ -(v & 1)
+    return out
+
+
+def decode_raw_samples(data, sample_bits, out=None):
+    """
+    Decode raw samples (Wave.packed_samples) in data to an int32 array.
+    The samples are copied, so data may be reused after this.
+
+    @param data is bytes-like object holding the samples only
+    @param sample_bits is number of bits of a sample (8, 12 or 16)
+    @param out is optional int32 array to store the result.  Its size must
+           be equal to the number of samples, but its shape may differ.
+    """
+    if sample_bits not in SAMPLE_BITS:
+        raise NotWaveGroupError(f"unsupported sample bits {sample_bits}")
+
+    b = np.frombuffer(data, dtype=np.uint8)
+    n = len(b) * 8 // sample_bits
+    if (sample_bits == 16 and len(b) % 2) or (
+        sample_bits == 12 and len(b) % 3 == 1
+    ):
+        raise NotWaveGroupError("truncated sample")
+
+    if out is None:
+        out = np.empty(n, dtype=np.int32)
+    elif out.size != n:
+        raise ValueError("size of out doesn't match")
+    flat = out.reshape(-1)
+
+    if sample_bits == 8:
+        flat[:] = b.view(np.int8)
+    elif sample_bits == 16:
+        flat[:] = b.view("<i2")
+    else:
+        # Two samples in three bytes (an odd sample at the end takes two)
+        t = np.zeros(-(-len(b) // 3) * 3, dtype=np.int32)
+        t[: len(b)] = b
+        t = t.reshape(-1, 3)
+        v = np.empty(len(t) * 2, dtype=np.int32)
+        v[0::2] = t[:, 0] | (t[:, 1] & 0x0F) << 8
+        v[1::2] = t[:, 1] >> 4 | t[:, 2] << 4
+        flat[:] = (v[:n] ^ 0x800) - 0x800  # sign extension
+    return out
+
+
+def find_samples(buf, start, end):
+    """
+    Find ch_id and samples of a Wave message in buf[start:end].  Return
+    ch_id, (start, end) of the samples, and if they are raw samples
+    (packed_samples) rather than varints.
+    """
+    ch_id = 0
+    span = (0, 0)
+    raw = False
+
+    for field, wiretype, pos in iter_fields(buf, start, end):
+        if field == WAVE_CH_ID and wiretype == WIRETYPE_VARINT:
+            ch_id = read_varint(buf, pos)[0]
+        elif field == WAVE_SAMPLES and wiretype == WIRETYPE_LEN:
+            length, pos = read_varint(buf, pos)
+            span = (pos, pos + length)
+        elif field == WAVE_SAMPLES:
+            raise NotWaveGroupError("samples are not packed")
+        elif field == WAVE_PACKED_SAMPLES and wiretype == WIRETYPE_LEN:
+            length, pos = read_varint(buf, pos)
+            span = (pos, pos + length)
+            raw = True
+
+    return ch_id, span, raw
+
+
+def gather_samples(buf, spans):
+    """
+    Gather packed samples of all waves at spans in buf into one uint8 array,
+    so that they are decoded in one pass.  Return the number of samples in
+    each wave and the gathered array.
+    """
+    # Each varint ends with a byte less than 0x80, so the number of samples
+    # in a wave is known by counting them
+    b = np.frombuffer(buf, dtype=np.uint8)
+    counts = set()
+    for start, end in spans:
+        if end > start and b[end - 1] >= 0x80:
+            raise NotWaveGroupError("truncated varint")
+        counts.add(int(np.count_nonzero(b[start:end] < 0x80)))
+    if len(counts) > 1:
+        raise NotWaveGroupError("waves have different number of samples")
+    n_samples = counts.pop() if counts else 0
+
+    if len(spans) == 1:
+        return n_samples, b[spans[0][0] : spans[0][1]]
+    return n_samples, np.concatenate([b[s:e] for s, e in spans] + [b[:0]])
+
+
+def alloc_samples(out, shape):
+    """
+    Return out if it can hold samples of the shape, otherwise a new array
+    """
+    if out is None or out.shape != shape or out.dtype != np.int32:
+        out = np.empty(shape, dtype=np.int32)
+    return out
+
+
+def decode_waves(  # pylint: disable=too-many-locals
+    buf, start, end, out=None, sample_bits=0
+):
+    """
+    Decode a WaveGroup message in buf[start:end] and return WaveGroupArray
+    """
+    triggered = False
+    frame_seq = 0
+    delta = False
+    ch_ids = []
+    spans = []  # (start, end) of samples of each wave
+    raws = set()
+
+    for field, wiretype, pos in iter_fields(buf, start, end):
+        if field == WAVEGROUP_TRIGGERED and wiretype == WIRETYPE_VARINT:
+            triggered = bool(read_varint(buf, pos)[0])
+        elif field == WAVEGROUP_FRAME_SEQ and wiretype == WIRETYPE_VARINT:
+            frame_seq = read_varint(buf, pos)[0]
+        elif field == WAVEGROUP_DELTA and wiretype == WIRETYPE_VARINT:
+            delta = bool(read_varint(buf, pos)[0])
+        elif field == WAVEGROUP_WAVE and wiretype == WIRETYPE_LEN:
+            length, pos = read_varint(buf, pos)
+            ch_id, span, raw = find_samples(buf, pos, pos + length)
+            ch_ids.append(ch_id)
+            spans.append(span)
+            raws.add(raw)
+
+    if raws == {True}:
+        if not sample_bits:
+            raise NotWaveGroupError("sample bits are not negotiated")
+        counts = {(e - s) * 8 // sample_bits for s, e in spans}
+        if len(counts) > 1:
+            raise NotWaveGroupError("waves have different number of samples")
+        out = alloc_samples(out, (len(spans), counts.pop()))
+        for row, (s, e) in zip(out, spans):
+            decode_raw_samples(buf[s:e], sample_bits, row)
+    elif raws == {True, False}:
+        raise NotWaveGroupError("waves have different kinds of samples")
+    else:
+        n_samples, samples = gather_samples(buf, spans)
+        out = alloc_samples(out, (len(spans), n_samples))
+        decode_packed_sint32(samples, out)
+
+    waves = WaveGroupArray(triggered, ch_ids, out)
+    waves.frame_seq = frame_seq
+    waves.delta = delta
+    waves.payload_bytes = sum(e - s for s, e in spans)
+    return waves
+
+
+def decode_message(data, out=None, sample_bits=0):
+    """
+    Decode a MessageToHost message which carries a WaveGroup.
+    Return (id, WaveGroupArray).  NotWaveGroupError is raised if the message
+    carries anything other than a WaveGroup.
+
+    @param data is bytes-like object holding the serialized message
+    @param out is optional (channels, samples) int32 array to store samples.
+           If its shape doesn't match, a new array is allocated.
+    @param sample_bits is ConfigReply.sample_bits, which is required to
+           decode raw samples (Wave.packed_samples)
+    """
+    buf = memoryview(data).cast("B")
+    msg_id = 0
+    waves = None
+
+    for field, wiretype, pos in iter_fields(buf, 0, len(buf)):
+        if field == MESSAGETOHOST_ID and wiretype == WIRETYPE_VARINT:
+            msg_id = read_varint(buf, pos)[0]
+        elif field == MESSAGETOHOST_WAVEGROUP and wiretype == WIRETYPE_LEN:
+            length, start = read_varint(buf, pos)
+            waves = decode_waves(buf, start, start + length, out, sample_bits)
+        elif field != MESSAGETOHOST_ID:
+            raise NotWaveGroupError(f"unexpected field {field:d}")
+
+    if waves is None:
+        raise NotWaveGroupError("no WaveGroup in the message")
+
+    return msg_id, waves
@@ -16,3 +16,36 @@ _.children  # unused attribute (/Users/yokoyama/git_repo/oscillodsp/hostapp/osci
 _.description  # unused attribute (/Users/yokoyama/git_repo/oscillodsp/hostapp/oscillodsp/oscillo.py:386)
 _.button_style  # unused attribute (/Users/yokoyama/git_repo/oscillodsp/hostapp/oscillodsp/oscillo.py:387)
 _.disabled  # unused attribute (/Users/yokoyama/git_repo/oscillodsp/hostapp/oscillodsp/oscillo.py:409)
+_.timestamp  # unused attribute (acquisition.py:60)
+_.dropped  # unused attribute (acquisition.py:76)
+_.dropped  # unused attribute (acquisition.py:94)
+Acquisition  # unused class (acquisition.py:99)
+_.request_config  # unused method (acquisition.py:135)
+_.stop  # unused method (acquisition.py:179)
+minmax_decimate  # unused function (decimate.py:41)
+FrameRateGovernor  # unused class (governor.py:85)
+_.frame_acquired  # unused method (governor.py:110)
+_.frame_drawn  # unused method (governor.py:119)
+_.interval  # unused method (governor.py:128)
+_.status  # unused method (governor.py:143)
+save_csv  # unused function (export.py:62)
+Recorder  # unused class (recorder.py:116)
+_.n_frames  # unused attribute (recorder.py:148)
+_.n_frames  # unused attribute (recorder.py:236)
+Recording  # unused class (recorder.py:289)
+_.timestamps  # unused method (recorder.py:338)
+Playback  # unused class (playback.py:50)
+_.position  # unused method (playback.py:192)
+_.step  # unused method (playback.py:207)
+_.pause  # unused method (playback.py:215)
+_.set_speed  # unused method (playback.py:222)
+_.n_reads  # unused attribute (transport.py:88)
+_.stream_waves  # unused method (dsp.py:444)
+_.keyframe  # unused attribute (dsp.py:451)
+ENCODING_PLAIN  # unused variable (wavedecode.py:61)
+Session  # unused class (session.py:119)
+_.packed_samples  # unused attribute (broker.py:454)
+_.attach  # unused method (shmring.py:236)
+_.valid  # unused method (shmring.py:330)
+SharedRingReader  # unused class (shmring.py:413)
+TriggerEngine  # unused class (trigger.py:105)
@@ -0,0 +1,198 @@
+"""
+pyqtgraph Plotting Canvas
+
+Waves are drawn by QPainter through pyqtgraph PlotCurveItem, which is much
+lighter than Matplotlib's Agg rendering for live traces.  This module is
+imported only if the 'pyqtgraph' canvas backend is selected.
+
+
+Copyright (c) 2020-2021, Chubu University and Firmlogics
+
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this
+   list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation
+   and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+import time
+
+import pyqtgraph as pg
+from pyqtgraph.exporters import ImageExporter
+from PySide6.QtCore import QTimer
+from PySide6.QtGui import QColor, QTransform
+
+
+class PgPlotCanvas(pg.PlotWidget):
+    """
+    Create a plotting canvas for pyqtgraph
+
+    This provides the same methods as plotcanvas.PlotCanvas.  All channels
+    share a single view, whose y-axis shows the active channel.  Other
+    channels are mapped to the active channel's y-range by transforms of
+    the curves, so line data are never modified.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent, background="w")
+
+        self.plot_item = self.getPlotItem()
+        self.plot_item.setMouseEnabled(x=False, y=False)
+        self.plot_item.setMenuEnabled(False)
+        self.plot_item.hideButtons()
+        self.plot_item.showGrid(x=True, y=True)
+        self.plot_item.setLabel("bottom", units="s")
+        for name in ["left", "bottom"]:
+            axis = self.plot_item.getAxis(name)
+            axis.setPen("k")
+            axis.setTextPen("k")
+
+        self.legend = self.plot_item.addLegend(
+            offset=(10, 10),
+            brush=QColor("lightgray"),
+            labelTextColor="k",
+        )
+
+        self.curves = []  # one curve per channel
+        self.timer = None
+        self.draw_time = 0.0
+        self.set_visible(False)
+
+    def paintEvent(self, ev):
+        start = time.perf_counter()
+        super().paintEvent(ev)
+        self.draw_time = time.perf_counter() - start
+
+    def set_visible(self, b):
+        self.plot_item.showAxis("left", b)
+        self.plot_item.showAxis("bottom", b)
+
+    def create_channels(self, n):
+        """
+        Create curves for n channels
+        """
+        for curve in self.curves:
+            self.plot_item.removeItem(curve)
+        self.legend.clear()
+
+        self.curves = []
+        for _ in range(n):
+            curve = pg.PlotCurveItem(antialias=False, skipFiniteCheck=True)
+            self.plot_item.addItem(curve)
+            self.curves.append(curve)
+
+    def set_layout(self, xlim, channels, ch_active):
+        """
+        Set limits, colors, labels and legend
+
+        @param xlim is common x-axis limits among channels
+        @param channels is a list of dictionaries which have 'ylim',
+               'color', 'label', 'visible', 'name' and 'unit' of each
+               channel
+        @param ch_active is the channel whose y-axis is shown
+        """
+        ylim_active = channels[ch_active]["ylim"]
+        span_active = ylim_active[1] - ylim_active[0]
+
+        self.legend.clear()
+        for idx, ch in enumerate(channels):
+            # Map ch['ylim'] onto ylim_active
+            scale = span_active / (ch["ylim"][1] - ch["ylim"][0])
+            offset = ylim_active[0] - ch["ylim"][0] * scale
+
+            curve = self.curves[idx]
+            curve.setTransform(QTransform(1, 0, 0, scale, 0, offset))
+            curve.setPen(pg.mkPen(QColor(ch["color"])))
+            curve.setVisible(ch["visible"])
+
+            # Same stacking order as Matplotlib twinx axes
+            curve.setZValue(0 if idx == ch_active else idx + 1)
+
+            if ch["visible"]:
+                self.legend.addItem(curve, ch["label"])
+
+        self.plot_item.setXRange(*xlim, padding=0)
+        self.plot_item.setYRange(*ylim_active, padding=0)
+        chconfig_active = channels[ch_active]
+        self.plot_item.setLabel(
+            "left", f"{chconfig_active['name']} [{chconfig_active['unit']}]"
+        )
+
+        self.set_visible(True)
+
+    def set_waves(self, xser, ysers):
+        """
+        Update line data of channels.  If ysers is None, lines are blanked.
+        """
+        if ysers is None:
+            for curve in self.curves:
+                curve.setData([], [])
+            self.legend.setVisible(False)
+            return
+
+        for idx, yser in enumerate(ysers):
+            self.curves[idx].setData(xser, yser)
+        self.legend.setVisible(True)
+
+    def request_draw(self):
+        """
+        Nothing to do because Qt repaints what changed
+        """
+
+    def artists(self):
+        """
+        No artists need to be returned because Qt repaints what changed
+        """
+        return []
+
+    def start_animation(self, func, interval, blit=False):
+        """
+        Start a timer which calls func() periodically
+
+        @param func is called with a dummy frame number
+        @param interval is the initial interval in milliseconds
+        @param blit is ignored
+        """
+        _ = blit  # Qt only repaints updated areas anyway
+        self.stop_animation()
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(lambda: func(None))
+        self.timer.start(int(interval))
+
+    def stop_animation(self):
+        """
+        Stop the timer if running
+        """
+        if self.timer:
+            self.timer.stop()
+            self.timer = None
+
+    def set_interval(self, interval):
+        """
+        Change the animation interval in milliseconds
+        """
+        if self.timer:
+            self.timer.setInterval(int(interval))
+
+    def save_image(self, filename):
+        """
+        Save the plot as an image file
+        """
+        ImageExporter(self.plot_item).export(filename)
@@ -0,0 +1,322 @@
+"""
+Plotting Canvases
+
+A canvas is a Qt widget which draws waves of channels.  The Matplotlib
+canvas (PlotCanvas) is always available.  The pyqtgraph canvas
+(PgPlotCanvas in pgcanvas.py) is optional, and selected by the
+'canvas_backend' setting.  Every canvas provides the following methods,
+which are called by OscilloWidget:
+
+- create_channels(n)
+- set_layout(xlim, channels, ch_active)
+- set_waves(xser, ysers)
+- artists()
+- start_animation(func, interval, blit=False)
+- stop_animation()
+- set_interval(interval)
+- save_image(filename)
+
+TargetView (qtmulti.py) calls request_draw() instead of the animation
+methods, as views are updated by a timer shared among them.  Every canvas
+also has the attribute 'draw_time', which is the time (in seconds) spent
+by the last drawing.
+
+
+Copyright (c) 2020-2021, Chubu University and Firmlogics
+
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this
+   list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation
+   and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+import time
+
+from matplotlib.animation import FuncAnimation
+from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg
+from matplotlib.figure import Figure
+from matplotlib.ticker import EngFormatter
+
+CANVAS_BACKENDS = ["matplotlib", "pyqtgraph"]
+DEFAULT_CANVAS_BACKEND = "matplotlib"
+
+
+def create_canvas(backend=None, parent=None, logger=None):
+    """
+    Create a canvas of the backend and return it.  If the backend isn't
+    available, fall back to the Matplotlib canvas.
+    """
+    if backend == "pyqtgraph":
+        try:
+            from pgcanvas import (  # pylint: disable=import-outside-toplevel
+                PgPlotCanvas,
+            )
+
+            return PgPlotCanvas(parent)
+        except ImportError as err:
+            if logger:
+                logger.warning(f"pyqtgraph backend is not available: {err}")
+
+    return PlotCanvas(parent)
+
+
+class PlotCanvas(  # pylint: disable=too-many-instance-attributes
+    FigureCanvasQTAgg
+):
+    """
+    Create a plotting canvas for Matplotlib
+
+    Axes and lines are created once by create_channels() and kept.  The
+    active channel is drawn on the main axis, and other channels on twinx
+    sub-axes.  set_layout() updates limits, labels and legend, and should
+    be called only when they change.  set_waves() updates line data only.
+
+    The canvas also owns the FuncAnimation.  In the blit mode, only lines
+    and legend are redrawn for each frame over a cached background.  The
+    background is re-captured when the layout changes, and FuncAnimation
+    itself re-captures it when the canvas is resized.
+    """
+
+    def __init__(self, parent=None, width=8, height=4.5, dpi=100):
+        self.fig = Figure(figsize=(width, height), dpi=dpi)
+        self.fig.set_tight_layout(True)
+
+        self.ax = self.fig.add_subplot(111)
+        self.ax.get_xaxis().set_visible(False)
+        self.ax.get_yaxis().set_visible(False)
+        self.ax.xaxis.set_major_formatter(EngFormatter())
+        self.ax.yaxis.set_major_formatter(EngFormatter())
+        self.ax.set_xlabel("[sec]")
+        self.ax.grid(True)
+
+        self.sub_ax = []
+        self.lines = []  # one line per axis, the main axis comes first
+        self.slots = []  # index in self.lines for each channel
+        self.legend = None
+        self.ani = None
+        self.blit_mode = False
+        self.blit_start = None
+        self.draw_time = 0.0
+
+        super().__init__(self.fig)
+        self.setParent(parent)
+
+    def set_visible(self, b):
+        self.ax.get_xaxis().set_visible(b)
+        self.ax.get_yaxis().set_visible(b)
+
+    def create_channels(self, n):
+        """
+        Create axes and lines for n channels
+        """
+        # First need to remove all sub_ax entities from the Figure
+        for ax in self.sub_ax:
+            ax.remove()
+        for line in self.lines:
+            line.remove()
+        if self.legend:
+            self.legend.remove()
+            self.legend = None
+
+        self.sub_ax = []
+        for _ in range(n - 1):
+            new_sub_ax = self.ax.twinx()
+            new_sub_ax.get_xaxis().set_visible(False)
+            new_sub_ax.get_yaxis().set_visible(False)
+            self.sub_ax.append(new_sub_ax)
+
+        self.lines = []
+        for ax in [self.ax] + self.sub_ax:
+            (line,) = ax.plot([], [])
+            self.lines.append(line)
+
+        self.slots = list(range(n))
+
+    def set_layout(self, xlim, channels, ch_active):
+        """
+        Set limits, colors, labels and legend
+
+        @param xlim is common x-axis limits among channels
+        @param channels is a list of dictionaries which have 'ylim',
+               'color', 'label', 'visible', 'name' and 'unit' of each
+               channel
+        @param ch_active is the channel whose y-axis is shown
+        """
+        # The active channel is drawn on the main axis
+        self.slots = [ch_active] + [
+            idx for idx in range(len(channels)) if idx != ch_active
+        ]
+        self.slots = [self.slots.index(idx) for idx in range(len(channels))]
+
+        axes = [self.ax] + self.sub_ax
+        for idx, ch in enumerate(channels):
+            slot = self.slots[idx]
+            axes[slot].set_ylim(ch["ylim"])
+            line = self.lines[slot]
+            line.set_color(ch["color"])
+            line.set_label(ch["label"])
+            line.set_visible(ch["visible"])
+
+        self.ax.set_xlim(xlim)
+        chconfig_active = channels[ch_active]
+        self.ax.set_ylabel(
+            f"{chconfig_active['name']} [{chconfig_active['unit']}]"
+        )
+
+        # Show legend of visible lines in the channel order
+        if self.legend:
+            self.legend.remove()
+            self.legend = None
+        lines = [
+            self.lines[self.slots[idx]]
+            for idx, ch in enumerate(channels)
+            if ch["visible"]
+        ]
+        if len(lines) > 0:
+            self.legend = self.ax.legend(
+                lines,
+                [_.get_label() for _ in lines],
+                loc="upper left",
+                # labelcolor='white',
+                facecolor="lightgray",
+                # edgecolor='white'
+            )
+            self.legend.set_animated(self.blit_mode)
+
+        self.set_visible(True)
+        self.invalidate()
+
+    def set_waves(self, xser, ysers):
+        """
+        Update line data of channels.  If ysers is None, lines are blanked.
+        """
+        if ysers is None:
+            for line in self.lines:
+                line.set_data([], [])
+            if self.legend:
+                self.legend.set_visible(False)
+            return
+
+        for idx, yser in enumerate(ysers):
+            self.lines[self.slots[idx]].set_data(xser, yser)
+        if self.legend:
+            self.legend.set_visible(True)
+
+    def request_draw(self):
+        """
+        Draw updated lines later by the Qt event loop.  This is for callers
+        which update the canvas by their own timer instead of the
+        animation.
+        """
+        self.draw_idle()
+
+    def save_image(self, filename):
+        """
+        Save the figure as an image file.  Animated artists are not drawn by
+        savefig(), so they are temporarily made non-animated.
+        """
+        for artist in self.artists():
+            artist.set_animated(False)
+        try:
+            self.fig.savefig(filename)
+        finally:
+            for artist in self.artists():
+                artist.set_animated(self.blit_mode)
+
+    def draw(self):
+        start = time.perf_counter()
+        super().draw()
+        self.draw_time = time.perf_counter() - start
+
+    def blit(self, bbox=None):
+        super().blit(bbox)
+
+        # Artists have been drawn by FuncAnimation after step() returned
+        if self.blit_start is not None:
+            self.draw_time = time.perf_counter() - self.blit_start
+
+    def artists(self):
+        """
+        Return artists which are updated for each frame
+        """
+        if self.legend:
+            return self.lines + [self.legend]
+        return list(self.lines)
+
+    def start_animation(self, func, interval, blit=False):
+        """
+        Start FuncAnimation which calls func() periodically
+
+        @param func should return the list of updated artists, i.e.
+               artists()
+        @param interval is the initial interval in milliseconds
+        @param blit selects the blit mode
+        """
+        self.stop_animation()
+
+        # Animated artists are skipped by the normal (full) drawing, so the
+        # flags must follow the mode
+        self.blit_mode = blit
+        for artist in self.artists():
+            artist.set_animated(blit)
+
+        def step(framedata):
+            artists = func(framedata)
+            self.blit_start = time.perf_counter()
+            return artists
+
+        self.ani = FuncAnimation(
+            self.fig,
+            step,
+            init_func=self.artists,
+            blit=blit,
+            cache_frame_data=False,
+            interval=interval,
+        )
+        self.draw()  # In the blit=False case, this is required
+
+    def stop_animation(self):
+        """
+        Stop FuncAnimation if running
+        """
+        if self.ani:
+            self.ani._stop()  # pylint: disable=protected-access
+            self.ani = None
+
+    def set_interval(self, interval):
+        """
+        Change the animation interval in milliseconds
+        """
+        if self.ani:
+            self.ani.event_source.interval = interval
+
+    def invalidate(self):
+        """
+        Re-capture the blit background.  Should be called when anything
+        other than animated artists (limits, labels, etc.) has changed.
+        """
+        if not self.blit_mode or self.ani is None:
+            return
+
+        # Render the figure without animated artists, and let FuncAnimation
+        # copy the new background at the next blit
+        self.draw()
+        self.ani._blit_cache.clear()  # pylint: disable=protected-access
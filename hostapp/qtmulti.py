@@ -0,0 +1,382 @@
+"""
+QtOscillo for Multiple Targets
+
+This shows several DSP targets in one window, as tabs or tiles.  All
+targets are serviced by one session.Session thread, which waits for all
+of them by a selector, and all views are rendered by one RenderScheduler.
+So watching many boards doesn't need an application instance for each.
+
+Usage: python qtmulti.py [--tiles] [--backend BACKEND] INTERFACE...
+
+INTERFACE is a serial port (POSIX only) or a socket URL, e.g.
+tcp://127.0.0.1:5555.  Targets are triggered in the auto mode.  Channel
+colors, the target frame rate and the canvas backend are taken from the
+QtOscillo settings.
+
+
+Copyright (c) 2020-2021, Chubu University and Firmlogics
+
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice, this
+   list of conditions and the following disclaimer.
+
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation
+   and/or other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE
+FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR
+SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY,
+OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+import argparse
+import logging
+import math
+import sys
+import time
+
+import numpy as np
+from PySide6 import QtWidgets
+from PySide6.QtCore import QTimer
+
+from colorman import ColorManager
+from confman import ConfigManager
+from oscillodsp import dsp
+from oscillodsp.decimate import minmax_decimate
+from oscillodsp.dequantize import get_dequantizer
+from oscillodsp.governor import (
+    DEFAULT_TARGET_FPS,
+    FrameRateGovernor,
+    RateMeter,
+)
+from oscillodsp.oscillodsp_pb2 import (  # pylint: disable=no-name-in-module
+    TriggerMode,
+    TriggerType,
+)
+from oscillodsp.recorder import frame_samples
+from oscillodsp.session import Session
+from oscillodsp.utils import modified_ylim
+from plotcanvas import CANVAS_BACKENDS, create_canvas
+from qtoscillo import (
+    DEFAULT_SAMPLE_QUANTIZE_BITS,
+    DSP_PIPELINE_DEPTH,
+    QtOscillo,
+)
+
+APPNAME = "QtOscillo Multi"
+
+
+class TargetView(
+    QtWidgets.QWidget
+):  # pylint: disable=too-many-instance-attributes
+    """
+    A canvas and a status line which show frames of a SessionTarget
+
+    The view has no timer.  render() is called by RenderScheduler.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments,
+        # pylint: disable=too-many-positional-arguments
+        self,
+        entry,
+        quantize_bits,
+        colorman,
+        backend=None,
+        logger=None,
+    ):
+        super().__init__()
+
+        self.entry = entry
+        self.quantize_bits = quantize_bits
+        self.colorman = colorman
+        self.logger = logger
+        self.acq_rate = RateMeter()
+        self.last_layout = None
+        self.xser = None
+        self.dequantizer = None
+        self.triggered = False
+        self.failed = False
+
+        self.canvas = create_canvas(backend, self, logger)
+        self.canvas.create_channels(len(entry.config_reply.chconfig))
+        self.label_status = QtWidgets.QLabel(entry.name)
+
+        vbox = QtWidgets.QVBoxLayout()
+        vbox.addWidget(self.canvas)
+        vbox.addWidget(self.label_status)
+        vbox.setStretch(0, 1)
+        self.setLayout(vbox)
+
+    def render(self):
+        """
+        Show the newest frame of the target if any.  Return True if the
+        canvas has been updated.
+        """
+        entry = self.entry
+        if entry.error is not None:
+            if not self.failed:
+                self.failed = True
+                self.label_status.setText(
+                    f"<b>{entry.name}</b>: <font color='red'>"
+                    f"{entry.error}</font>"
+                )
+            return False
+
+        if self.acq_rate.update(entry.seq, time.perf_counter()):
+            self.update_status()
+
+        frame = entry.latest()
+        if frame is None:
+            return False
+        self.triggered = frame.waves.triggered
+
+        # Not only WaveGroupArray of fast_decode, but also WaveGroup
+        _, samples = frame_samples(frame.waves)
+        if samples.size == 0:
+            # The normal trigger mode is waiting
+            return False
+        self.update_layout(
+            frame.config_reply.chconfig, frame.timescale, samples.shape[1]
+        )
+
+        # Dequantize all channels at once
+        self.dequantizer = get_dequantizer(
+            self.dequantizer, frame.config_reply.chconfig, self.quantize_bits
+        )
+        ysers = self.dequantizer(samples)
+        self.canvas.set_waves(
+            *minmax_decimate(self.xser, ysers, self.canvas.width())
+        )
+        self.canvas.request_draw()
+        return True
+
+    def update_layout(self, chconfig, timescale, n_xsamples):
+        """
+        Update limits, labels and legend of the canvas, only when the
+        channel config or the time scale has changed
+        """
+        layout = (
+            timescale,
+            n_xsamples,
+            tuple((ch.name, ch.unit, ch.min, ch.max) for ch in chconfig),
+        )
+        if layout == self.last_layout:
+            return
+        self.last_layout = layout
+
+        xlim = (-timescale / 2, timescale / 2)
+        self.xser = np.linspace(xlim[0], xlim[1], n_xsamples)
+
+        channels = []
+        for idx, ch in enumerate(chconfig):
+            # The same default position as QtOscillo
+            center = (ch.min + ch.max) / 2
+            width = ch.max - ch.min
+            ypos = math.floor(-2.0 * center / width + 0.5)
+            channels.append(
+                {
+                    "ylim": modified_ylim((ch.min, ch.max), 1.0, ypos),
+                    "color": self.colorman.color(idx),
+                    "label": ch.name,
+                    "visible": True,
+                    "name": ch.name,
+                    "unit": ch.unit,
+                }
+            )
+        self.canvas.set_layout(xlim, channels, 0)
+
+    def update_status(self):
+        """
+        Show the trigger status and the acquisition rate
+        """
+        status = "Triggered" if self.triggered else "Auto"
+        self.label_status.setText(
+            f"<b>{self.entry.name}</b>: {status}, "
+            f"acquisition {self.acq_rate.rate:.1f} fps, "
+            f"{self.entry.ring.dropped:d} frames skipped"
+        )
+
+
+class RenderScheduler:
+    """
+    A single timer which renders all views
+
+    Views which aren't visible (e.g. in hidden tabs) are skipped.  The
+    interval is decided by FrameRateGovernor from the time spent by
+    rendering all views, so that the GUI thread isn't occupied however
+    many targets there are.
+    """
+
+    def __init__(
+        self, views, target_fps=DEFAULT_TARGET_FPS, status=None, parent=None
+    ):
+        """
+        @param status is a function which shows a status message
+        @param parent is the Qt object which owns the timer
+        """
+        self.views = views
+        self.status = status
+        self.governor = FrameRateGovernor(target_fps)
+        self.timer = QTimer(parent)
+        self.timer.timeout.connect(self.tick)
+
+    def start(self):
+        self.timer.start(int(self.governor.interval()))
+
+    def stop(self):
+        self.timer.stop()
+
+    def tick(self):
+        start = time.perf_counter()
+        drawn = [
+            view for view in self.views if view.isVisible() and view.render()
+        ]
+        if not drawn:
+            return
+
+        # Canvases draw after this returns, so their draw_time are of the
+        # previous frame
+        now = time.perf_counter()
+        draw_time = now - start + sum(view.canvas.draw_time for view in drawn)
+        if self.governor.frame_drawn(draw_time, now) and self.status:
+            self.status(self.governor.status())
+        self.timer.setInterval(int(self.governor.interval()))
+
+
+class MultiOscilloWindow(QtWidgets.QMainWindow):
+    """
+    Main window which has views of all targets of a Session
+    """
+
+    def __init__(
+        self, session, views, tiles=False, target_fps=DEFAULT_TARGET_FPS
+    ):
+        super().__init__()
+
+        self.session = session
+        self.views = views
+
+        if tiles:
+            # As square as possible
+            n_columns = math.ceil(math.sqrt(len(views)))
+            grid = QtWidgets.QGridLayout()
+            for idx, view in enumerate(views):
+                grid.addWidget(view, idx // n_columns, idx % n_columns)
+            widget = QtWidgets.QWidget()
+            widget.setLayout(grid)
+        else:
+            widget = QtWidgets.QTabWidget()
+            for view in views:
+                widget.addTab(view, view.entry.name)
+        self.setCentralWidget(widget)
+        self.setWindowTitle(APPNAME)
+
+        self.scheduler = RenderScheduler(
+            views, target_fps, self.statusBar().showMessage, self
+        )
+        self.scheduler.start()
+
+    def closeEvent(self, event):
+        self.scheduler.stop()
+        self.session.stop()
+        for view in self.views:
+            view.entry.target.transport.close()
+        super().closeEvent(event)
+
+
+def open_targets(interfaces, quantize_bits, logger):
+    """
+    Open and configure the targets, and return a Session which has them
+    """
+    session = Session(logger=logger)
+    for tty in interfaces:
+        target = dsp.DSP(
+            tty,
+            QtOscillo.PCSIM_BAUDRATE,
+            console_handler=logging.StreamHandler(),
+            file_handler=logging.NullHandler(),
+            pipeline_depth=DSP_PIPELINE_DEPTH,
+            fast_decode=True,
+            crc=True,
+            compact=True,
+        )
+        config_reply = target.config(
+            resolution=quantize_bits,
+            trigmode=TriggerMode.Auto,
+            trigtype=TriggerType.RisingEdge,
+        )
+        session.add(tty, target, config_reply, config_reply.default_timescale)
+    return session
+
+
+def main():
+    parser = argparse.ArgumentParser(description=APPNAME)
+    parser.add_argument(
+        "interfaces",
+        nargs="+",
+        metavar="INTERFACE",
+        help="serial port or socket URL",
+    )
+    parser.add_argument(
+        "--tiles",
+        action="store_true",
+        help="show targets as tiles instead of tabs",
+    )
+    parser.add_argument(
+        "--backend", choices=CANVAS_BACKENDS, help="canvas backend"
+    )
+    args = parser.parse_args()
+
+    logger = logging.getLogger("oscillo")
+    logger.addHandler(logging.StreamHandler())
+
+    qt_app = QtWidgets.QApplication(sys.argv[:1])
+    confman = ConfigManager(
+        appname=QtOscillo.APPNAME, appauthor=QtOscillo.REVERSE_DOMAINNAME
+    )
+    colorman = ColorManager(confman)
+    quantize_bits = DEFAULT_SAMPLE_QUANTIZE_BITS
+
+    try:
+        session = open_targets(args.interfaces, quantize_bits, logger)
+    except OSError as err:
+        # Including time-out
+        QtWidgets.QMessageBox.critical(
+            None, "Error", f"Can't open the targets: {err}"
+        )
+        sys.exit(1)
+
+    views = [
+        TargetView(
+            entry,
+            quantize_bits,
+            colorman,
+            backend=args.backend or confman.get("canvas_backend"),
+            logger=logger,
+        )
+        for entry in session.targets
+    ]
+    window = MultiOscilloWindow(
+        session,
+        views,
+        tiles=args.tiles,
+        target_fps=confman.get("target_fps") or DEFAULT_TARGET_FPS,
+    )
+    window.show()
+    session.start()
+    sys.exit(qt_app.exec())
+
+
+if __name__ == "__main__":
+    main()
@@ -35,19 +35,16 @@ import threading
 import time
 
 import numpy as np
-from matplotlib.animation import FuncAnimation
-from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg
-from matplotlib.figure import Figure
-from matplotlib.ticker import EngFormatter
 from PySide6 import QtGui, QtWidgets
 from PySide6.QtCore import QSize, Qt, Signal
-from PySide6.QtGui import QAction
+from PySide6.QtGui import QAction, QActionGroup
 from PySide6.QtWidgets import (
     QApplication,
     QCheckBox,
     QComboBox,
     QDialogButtonBox,
     QHBoxLayout,
+    QInputDialog,
     QLabel,
     QLineEdit,
     QMessageBox,
@@ -62,11 +59,20 @@ from PySide6.QtWidgets import (
 from colorman import ColorManager
 from confman import ConfigManager
 from oscillodsp import dsp
+from oscillodsp.acquisition import Acquisition
+from oscillodsp.decimate import minmax_decimate
+from oscillodsp.dequantize import get_dequantizer
+from oscillodsp.export import save_csv_in_background
+from oscillodsp.governor import DEFAULT_TARGET_FPS, FrameRateGovernor
 from oscillodsp.oscillodsp_pb2 import (  # pylint: disable=no-name-in-module
     TriggerMode,
     TriggerType,
 )
+from oscillodsp.playback import Playback
+from oscillodsp.recorder import Recorder, frame_samples
+from oscillodsp.transport import is_socket_url
 from oscillodsp.utils import Blinker, get_filename, modified_ylim, run_pcsim
+from plotcanvas import CANVAS_BACKENDS, DEFAULT_CANVAS_BACKEND, create_canvas
 
 # Various definitions
 WIN_STYLE = "Fusion"
@@ -83,7 +89,7 @@ LOGVIEW_UPDATE_INTERVAL_SEC = 0.5
 VISIB_BUTTON_HEIGHT = 20
 VISIB_BUTTON_HEIGHT_MARGIN = 6  # XXX  more sophisticated way?
 LOGGING_DISABLE = logging.CRITICAL + 1
-MIN_UPDATE_INTERVAL = 30  # milliseconds
+DSP_PIPELINE_DEPTH = 2  # GetWaveGroup requests kept in flight
 DEBUG_PCSIM = False
 
 
@@ -124,7 +130,8 @@ def slider_tscale_to_actual_tscale(slider_val, max_timescale):
 def com_ports():
     """
     Make a list contains serial ports and FTDI URLs, and return it.
-    In the POSIX case, also add 'pcsim'.
+    Next add 'network' for socket URLs.  In the POSIX case, also add
+    'pcsim'.  Finally add 'playback' to replay a recording.
     """
     # The reason for importing here is that it may be required for PyInstaller.
     # This needs to be re-checked.
@@ -161,9 +168,13 @@ def com_ports():
         else:
             raise
 
+    items.append({"name": "network", "desc": None})
+
     if os.name == "posix":
         items.append({"name": "pcsim", "desc": None})
 
+    items.append({"name": "playback", "desc": None})
+
     return items
 
 
@@ -206,27 +217,6 @@ def show_msgbox_timeout(parent):
     )
 
 
-class PlotCanvas(FigureCanvasQTAgg):
-    """
-    Create a plotting canvas for Matplotlib
-    """
-
-    def __init__(self, parent=None, width=8, height=4.5, dpi=100):
-        self.fig = Figure(figsize=(width, height), dpi=dpi)
-        self.fig.set_tight_layout(True)
-
-        self.ax = self.fig.add_subplot(111)
-        self.ax.get_xaxis().set_visible(False)
-        self.ax.get_yaxis().set_visible(False)
-
-        super().__init__(self.fig)
-        self.setParent(parent)
-
-    def set_visible(self, b):
-        self.ax.get_xaxis().set_visible(b)
-        self.ax.get_yaxis().set_visible(b)
-
-
 class SuppressFractionSpinBox(QtWidgets.QDoubleSpinBox):
     """
     Child (or inherited) class of QDoubleSpinBox which always show the
@@ -245,7 +235,11 @@ class ComPortDialog(QtWidgets.QDialog):
     DEFAULT_BAUDRATE = 9600
 
     def __init__(  # pylint: disable=too-many-locals,too-many-statements
-        self, parent=None, logger=None, confman=None
+        # pylint: disable=too-many-branches
+        self,
+        parent=None,
+        logger=None,
+        confman=None,
     ):
         super().__init__(parent)
 
@@ -269,12 +263,16 @@ class ComPortDialog(QtWidgets.QDialog):
                     m.insertSeparator(idx)
                     # a separator is also included in the number of items
                     idx += 1
-                if port["name"] == "pcsim":
+                if port["name"] in ["network", "pcsim", "playback"]:
                     m.insertSeparator(idx)
                     idx += 1
 
-            if port["name"] == "pcsim":
+            if port["name"] == "network":
+                m.addItem("Network (tcp:// or unix://)", "network")
+            elif port["name"] == "pcsim":
                 m.addItem("PC Simulator (pcsim)", "pcsim")
+            elif port["name"] == "playback":
+                m.addItem("Recorded File (playback)", "playback")
             elif port["desc"]:
                 m.addItem(
                     f'{port["name"]} ({port["desc"]})',
@@ -287,7 +285,9 @@ class ComPortDialog(QtWidgets.QDialog):
         # Pre-select COM port, specified in the settings, in the combo box
         comport = self.confman.get("comport")
         if comport:
-            index = m.findData(comport)
+            index = m.findData(
+                "network" if is_socket_url(comport) else comport
+            )
             self.logger.debug(f"comport: index={index:d}")
             if index >= 0:
                 m.setCurrentIndex(index)
@@ -307,7 +307,18 @@ class ComPortDialog(QtWidgets.QDialog):
             baudrate = self.DEFAULT_BAUDRATE
         eb.setText(str(baudrate))
 
-        # This must come AFTER the self.edit_baudrate assignment above
+        #
+        # Create a line-edit to set URL of network
+        #
+
+        eu = QLineEdit()
+        self.edit_url = eu
+        eu.setPlaceholderText("tcp://host:port or unix:///path")
+        if comport and is_socket_url(comport):
+            eu.setText(comport)
+
+        # This must come AFTER the self.edit_baudrate and self.edit_url
+        # assignments above
         self.menu_changed(self.menu_comport.currentIndex())
 
         bb = QHBoxLayout()
@@ -315,6 +326,11 @@ class ComPortDialog(QtWidgets.QDialog):
         bb.addWidget(QLabel("<b>Baud rate (bps):</b>"))
         bb.addWidget(self.edit_baudrate)
 
+        bu = QHBoxLayout()
+        box_url = bu
+        bu.addWidget(QLabel("<b>URL:</b>"))
+        bu.addWidget(self.edit_url)
+
         #
         # Create dialog buttons
         #
@@ -329,6 +345,7 @@ class ComPortDialog(QtWidgets.QDialog):
         vbox.addWidget(QLabel("<b>Select interface:</b>"))
         vbox.addWidget(self.menu_comport)
         vbox.addLayout(box_baudrate)
+        vbox.addLayout(box_url)
         vbox.addWidget(dialog_buttons)
 
         self.setLayout(vbox)
@@ -336,10 +353,11 @@ class ComPortDialog(QtWidgets.QDialog):
     def menu_changed(self, index):
         _ = index  # Index is required by Qt, even if unused
 
-        if self.menu_comport.currentData() == "pcsim":
-            self.edit_baudrate.setEnabled(False)
-        else:
-            self.edit_baudrate.setEnabled(True)
+        data = self.menu_comport.currentData()
+        self.edit_baudrate.setEnabled(
+            data not in ["network", "pcsim", "playback"]
+        )
+        self.edit_url.setEnabled(data == "network")
 
     def button_ok_clicked(self):
         # The reason for importing here is that it may be required for
@@ -350,9 +368,32 @@ class ComPortDialog(QtWidgets.QDialog):
         baudrate = int(self.edit_baudrate.text())
         self.logger.debug(f"button_ok_clicked: {com_port} {baudrate:d}")
 
+        # Take URL of network
+        if com_port == "network":
+            com_port = self.edit_url.text().strip()
+            if not is_socket_url(com_port):
+                QMessageBox.critical(
+                    self,
+                    "Error",
+                    "Enter URL like tcp://host:port or unix:///path",
+                )
+                return
+
+        # Ask which recording is replayed
+        if com_port == "playback":
+            filename = QtWidgets.QFileDialog.getOpenFileName(
+                self,
+                "Open recording",
+                self.confman.get("playback_file") or "",
+                "Recording (*.oscrec)",
+            )
+            if not filename[0]:
+                return
+            self.confman.set("playback_file", filename[0])
+
         # Test if the com_port can accept the baudrate
         try:
-            if com_port != "pcsim":
+            if com_port not in ["pcsim", "playback"]:
                 dsp.open_interface(com_port, baudrate).close()
             self.confman.set("comport", com_port)
             self.confman.set("baudrate", baudrate)
@@ -363,6 +404,10 @@ class ComPortDialog(QtWidgets.QDialog):
                 "Error",
                 f"The baudrate {baudrate:d} isn't available on the interface",
             )
+        except OSError as err:
+            QMessageBox.critical(
+                self, "Error", f"Can't connect to {com_port}: {err}"
+            )
 
 
 class ChannelColorsDialog(QtWidgets.QDialog):
@@ -656,18 +701,20 @@ class OscilloWidget(  # pylint: disable=too-many-instance-attributes,
         # defined outside __init__).
         # These attributes are initialized elsewhere in the code, but pylint
         # expects them to be defined in __init__.
-        self.ani = None
         self.blinker = None
         self.ch_active = None
         self.ch_trig = None
         self.ch_trig_new = None
         self.clear_trig = None
+        self.config_seq = None
+        self.dequantizer = None
+        self.governor = None
         self.last_reply = None
-        self.last_ylim = None
-        self.lines = None
+        self.last_layout = None
         self.mag10 = None
         self.max_timescale = None
         self.old_status = None
+        self.rendered = None
         self.req_save_csv_filename = None
         self.triggered = None
         self.triglevel = None
@@ -676,9 +723,12 @@ class OscilloWidget(  # pylint: disable=too-many-instance-attributes,
         self.trigmode_new = None
         self.trigtype = None
         self.trigtype_new = None
+        self.frame_tscale = None
+        self.playback = None
         self.tscale = None
         self.tscale_new = None
         self.waves = None
+        self.xser = None
         self.ypos10 = None
 
         self.oscillo_app = oscillo_app
@@ -689,7 +739,11 @@ class OscilloWidget(  # pylint: disable=too-many-instance-attributes,
 
         # Initialize member variables
         self.running = False
-        self.sub_ax = []
+        self.blit = bool(self.confman.get("blit"))
+        self.target_fps = self.confman.get("target_fps") or DEFAULT_TARGET_FPS
+        self.canvas_backend = self.confman.get("canvas_backend")
+        if self.canvas_backend not in CANVAS_BACKENDS:
+            self.canvas_backend = DEFAULT_CANVAS_BACKEND
         self.buttons_visibility = []
         self.log_viewer_dialog = None
         self.colorman = ColorManager(self.confman)
@@ -708,12 +762,13 @@ class OscilloWidget(  # pylint: disable=too-many-instance-attributes,
         # Create a HBox contains canvas and sliders
         #
 
-        self.canvas = PlotCanvas(self)
+        self.canvas = create_canvas(self.canvas_backend, self, self.logger)
         vbox_slider_mag, self.slider_mag = self.create_slider_mag_layout()
         vbox_slider_ypos, self.slider_ypos = self.create_slider_ypos_layout()
 
         _ = QtWidgets.QHBoxLayout()
         hbox_canvas_and_vslider = _
+        self.hbox_canvas = _
         _.addWidget(self.canvas)
         _.addLayout(vbox_slider_mag)
         _.addLayout(vbox_slider_ypos)
@@ -940,7 +995,9 @@ class OscilloWidget(  # pylint: disable=too-many-instance-attributes,
         hbox.addStretch(1)
         return hbox
 
-    def create_menus(self):
+    def create_menus(  # pylint: disable=too-many-statements,too-many-locals
+        self,
+    ):
         # Menu Bar
         self.menubar = self.menuBar()
         self.menubar.setNativeMenuBar(False)  # for macOS
@@ -948,6 +1005,13 @@ class OscilloWidget(  # pylint: disable=too-many-instance-attributes,
         # File Menu
         menu_file = self.menubar.addMenu("&File")
 
+        self.action_record = QAction("&Record to File...", self)
+        self.action_record.setCheckable(True)
+        self.action_record.setEnabled(False)
+        self.action_record.triggered.connect(self.action_record_triggered)
+        menu_file.addAction(self.action_record)
+        menu_file.addSeparator()
+
         action_quit = QAction(f"&Quit {self.appname}", self)
         action_quit.setShortcut("Ctrl+Q")
         action_quit.triggered.connect(self.quit)
@@ -987,6 +1051,62 @@ class OscilloWidget(  # pylint: disable=too-many-instance-attributes,
         action_ch_color.triggered.connect(self.action_ch_color_triggered)
         menu_settings.addAction(action_ch_color)
 
+        action_blit = QAction("&Blitting", self)
+        action_blit.setCheckable(True)
+        action_blit.setChecked(self.blit)
+        action_blit.triggered.connect(self.action_blit_triggered)
+        menu_settings.addAction(action_blit)
+
+        action_target_fps = QAction("Target Frame &Rate...", self)
+        action_target_fps.triggered.connect(self.action_target_fps_triggered)
+        menu_settings.addAction(action_target_fps)
+
+        menu_backend = menu_settings.addMenu("Render &Backend")
+        group_backend = QActionGroup(self)
+        for backend in CANVAS_BACKENDS:
+            _ = QAction(backend, self)
+            _.setCheckable(True)
+            _.setChecked(backend == self.canvas_backend)
+            _.setData(backend)
+            _.triggered.connect(self.action_canvas_backend_triggered)
+            group_backend.addAction(_)
+            menu_backend.addAction(_)
+        self.menu_backend = menu_backend
+
+        # Playback Menu (enabled while replaying a recording)
+        menu_playback = self.menubar.addMenu("&Playback")
+
+        self.action_pause = QAction("&Pause", self)
+        self.action_pause.setCheckable(True)
+        self.action_pause.setShortcut("Ctrl+P")
+        self.action_pause.triggered.connect(self.action_pause_triggered)
+        menu_playback.addAction(self.action_pause)
+
+        action_step_forward = QAction("Step &Forward", self)
+        action_step_forward.setShortcut("Ctrl+Right")
+        action_step_forward.triggered.connect(
+            self.action_step_forward_triggered
+        )
+        menu_playback.addAction(action_step_forward)
+
+        action_step_backward = QAction("Step &Backward", self)
+        action_step_backward.setShortcut("Ctrl+Left")
+        action_step_backward.triggered.connect(
+            self.action_step_backward_triggered
+        )
+        menu_playback.addAction(action_step_backward)
+
+        action_go_to_frame = QAction("&Go to Frame...", self)
+        action_go_to_frame.triggered.connect(self.action_go_to_frame_triggered)
+        menu_playback.addAction(action_go_to_frame)
+
+        action_speed = QAction("&Speed...", self)
+        action_speed.triggered.connect(self.action_speed_triggered)
+        menu_playback.addAction(action_speed)
+
+        menu_playback.setEnabled(False)
+        self.menu_playback = menu_playback
+
         # Logging Menu
         menu_logging = self.menubar.addMenu("&Logging")
 
@@ -1070,7 +1190,7 @@ class OscilloWidget(  # pylint: disable=too-many-instance-attributes,
             self, "Save image file", candidate_filename, "PNG (*.png)"
         )
         if filename[0]:
-            self.canvas.fig.savefig(filename[0])
+            self.canvas.save_image(filename[0])
             self.confman.set(self.LAST_DIR, os.path.dirname(filename[0]))
 
     def button_save_csv_clicked(self):
@@ -1084,6 +1204,24 @@ class OscilloWidget(  # pylint: disable=too-many-instance-attributes,
             self.req_save_csv_filename = filename[0]
             self.confman.set(self.LAST_DIR, os.path.dirname(filename[0]))
 
+    def action_record_triggered(self, checked):
+        self.logger.debug(f"action_record: triggered ({checked})")
+        if not checked:
+            self.oscillo_app.stop_recording()
+            return
+
+        lastdir = self.confman.get(self.LAST_DIR)
+        candidate_filename = os.path.join(lastdir, get_filename(".oscrec"))
+        filename = QtWidgets.QFileDialog.getSaveFileName(
+            self, "Record to file", candidate_filename, "Recording (*.oscrec)"
+        )
+        if not filename[0] or not self.oscillo_app.start_recording(
+            filename[0]
+        ):
+            self.action_record.setChecked(False)
+            return
+        self.confman.set(self.LAST_DIR, os.path.dirname(filename[0]))
+
     def slider_mag_changed(self, value):
         if hasattr(self, "mag10"):
             self.mag10[self.ch_active] = value
@@ -1150,6 +1288,87 @@ class OscilloWidget(  # pylint: disable=too-many-instance-attributes,
         )
         w.exec()
 
+    def action_blit_triggered(self, checked):
+        self.logger.debug(f"action_blit: triggered ({checked})")
+        self.blit = checked
+        self.confman.set("blit", checked)
+        if self.running:
+            self.start_animation()
+
+    def action_target_fps_triggered(self):
+        self.logger.debug("action_target_fps: triggered")
+        fps, ok = QInputDialog.getDouble(
+            self,
+            "Target Frame Rate",
+            "Frames per second:",
+            self.target_fps,
+            1.0,
+            240.0,
+            1,
+        )
+        if ok:
+            self.target_fps = fps
+            self.confman.set("target_fps", fps)
+            if self.governor:
+                self.governor.target_fps = fps
+
+    def action_canvas_backend_triggered(self):
+        backend = self.sender().data()
+        self.logger.debug(f"action_canvas_backend: triggered ({backend})")
+        if backend == self.canvas_backend:
+            return
+        self.canvas_backend = backend
+        self.confman.set("canvas_backend", backend)
+
+        # The canvas can be replaced only while stopped (the menu is
+        # disabled while running)
+        canvas = create_canvas(backend, self, self.logger)
+        self.hbox_canvas.replaceWidget(self.canvas, canvas)
+        self.canvas.deleteLater()
+        self.canvas = canvas
+
+    def action_pause_triggered(self, checked):
+        self.logger.debug(f"action_pause: triggered ({checked})")
+        self.playback.pause(checked)
+
+    def action_step_forward_triggered(self):
+        self.logger.debug("action_step_forward: triggered")
+        self.playback.step(1)
+        self.action_pause.setChecked(True)
+
+    def action_step_backward_triggered(self):
+        self.logger.debug("action_step_backward: triggered")
+        self.playback.step(-1)
+        self.action_pause.setChecked(True)
+
+    def action_go_to_frame_triggered(self):
+        self.logger.debug("action_go_to_frame: triggered")
+        last = len(self.playback) - 1
+        index, ok = QInputDialog.getInt(
+            self,
+            "Go to Frame",
+            f"Frame (0-{last:d}):",
+            self.playback.position(),
+            0,
+            last,
+        )
+        if ok:
+            self.playback.seek(index)
+
+    def action_speed_triggered(self):
+        self.logger.debug("action_speed: triggered")
+        speed, ok = QInputDialog.getDouble(
+            self,
+            "Playback Speed",
+            "Speed (x):",
+            self.playback.speed,
+            0.01,
+            1000.0,
+            2,
+        )
+        if ok:
+            self.playback.set_speed(speed)
+
     def get_dsp_logger(self):
         """
         Call-back function which is called from LogViewerDialog()
@@ -1246,19 +1465,24 @@ class OscilloWidget(  # pylint: disable=too-many-instance-attributes,
         # pylint: disable=too-many-branches,
         # pylint: disable=too-many-statements
         """
-        Main function to update the plot.  Should be called by Matplotlib
-        FuncAnimation()
+        Main function to update the plot.  Should be called periodically by
+        the canvas animation (e.g. Matplotlib FuncAnimation()).  Returns the
+        artists to be redrawn in the blit mode.
         """
         app = self.oscillo_app
+        tick_start = time.perf_counter()
 
         # When requested by UI, clear triggered flag synchronously
         if self.clear_trig:
             self.triggered = False
             self.clear_trig = False  # Reset the request
 
-        # Communication with DSP may fail by time-out, so surround them by
-        # try and except clause.
+        # Communication with DSP is done by the acquisition thread.  It may
+        # fail by time-out, so surround them by try and except clause.
         try:
+            if app.acquisition.error:
+                raise app.acquisition.error
+
             # When requested by UI, clear triggered flag synchronously
             if (
                 self.trigmode_new != self.trigmode
@@ -1277,8 +1501,8 @@ class OscilloWidget(  # pylint: disable=too-many-instance-attributes,
                     (self.trigmode == TriggerMode.Single)
                 )
 
-                self.logger.debug("app.target.config()")
-                config_reply = app.target.config(
+                self.logger.debug("app.acquisition.request_config()")
+                self.config_seq = app.acquisition.request_config(
                     resolution=app.quantize_bits,
                     trigmode=self.trigmode,
                     trigtype=self.trigtype,
@@ -1287,27 +1511,33 @@ class OscilloWidget(  # pylint: disable=too-many-instance-attributes,
                     timescale=self.tscale,
                 )
 
-                self.last_reply = config_reply
-
             # Once triggered for single-shot mode, re-use wave data
             if self.trigmode != TriggerMode.Single or not self.triggered:
-                start_get_wave = time.time()
-
-                self.waves = app.target.get_waves()  # Trying update wave data
-                if len(self.waves.wave) > 0:
-                    self.triggered = self.waves.triggered
-
-                update_interval = (time.time() - start_get_wave) * 1000
-                update_interval = max(update_interval, MIN_UPDATE_INTERVAL)
-                self.ani.event_source.interval = update_interval
+                # Take the newest frame only.  Frames acquired before the
+                # last configuration request are stale, so skip them.
+                frame = app.acquisition.latest()
+                if frame is not None and frame.config_seq >= self.config_seq:
+                    self.waves = frame.waves
+                    self.last_reply = frame.config_reply
+                    self.frame_tscale = frame.timescale
+                    if len(self.waves.wave) > 0:
+                        self.triggered = self.waves.triggered
+
+                    if self.governor.frame_acquired(frame, tick_start):
+                        self.statusBar().showMessage(self.governor.status())
+                    self.canvas.set_interval(self.governor.interval())
 
         except Exception as err:  # pylint: disable=broad-exception-caught
             if "Timeout" in str(err) or "timeout" in str(err):
                 show_msgbox_timeout(self)
                 self.stop()
-                return
+                return []
             raise
 
+        # Nothing to show until the first frame arrives
+        if self.waves is None:
+            return self.canvas.artists()
+
         # Determine if plotting is required
         need_plot = len(self.waves.wave) > 0
         blank_screen = False
@@ -1341,131 +1571,111 @@ class OscilloWidget(  # pylint: disable=too-many-instance-attributes,
         self.old_status = new_status
 
         if need_plot:
-            # Generate CSV file header if required
-            csv_samples = []
-            if self.req_save_csv_filename:
-                csv_printer = open(  # pylint: disable=consider-using-with
-                    self.req_save_csv_filename, "w", encoding="utf-8"
-                )
-                csv_printer.write("time [sec]")
-                for ch in self.last_reply.chconfig:
-                    csv_printer.write(f",{ch.name} [{ch.unit}]")
-                csv_printer.write("\n")
-
             # Now we can determine samples in a wave
             n_xsamples = len(self.waves.wave[0].samples)
-            xlim = (-self.tscale / 2, self.tscale / 2)
-
-            chconfig_active = self.last_reply.chconfig[self.ch_active]
-
-            if blank_screen:
-                self.canvas.ax.clear()
-                for ax in self.sub_ax:
-                    ax.clear()
-                    # ax.set_axis_off() isn't required anymore because of
-                    # set_visible(False) in create_sub_ax()
-
-                self.canvas.ax.set_xlim(xlim)
-
-                if self.last_ylim is not None:
-                    self.canvas.ax.set_ylim(self.last_ylim)
-            else:
-                # [NOTICE} This self.lines must be a class member variable.
-                # Otherwise, Single-shot triggering will fail.
-                self.lines = []
-
-                # xser is common among multiple channels, so assign here
-                xser = np.linspace(xlim[0], xlim[1], n_xsamples)
-
-                ct_sub_ax = 0
-                for idx, wave in enumerate(self.waves.wave):
-                    chconfig_idx = self.last_reply.chconfig[idx]
-
-                    if idx == self.ch_active:
-                        cur_ax = self.canvas.ax
-                    else:
-                        cur_ax = self.sub_ax[ct_sub_ax]
-                        ct_sub_ax += 1
-
-                    cur_ax.clear()
-
-                    # ax.set_axis_off() isn't required anymore because of
-                    # set_visible(False) in create_sub_ax()
-
-                    # Convert wave samples to original float values
-                    ylim = (chconfig_idx.min, chconfig_idx.max)
-                    yser = np.asarray(wave.samples, dtype=np.float32)
-                    yser /= (1 << app.quantize_bits) / (ylim[1] - ylim[0])
-                    yser += (ylim[0] + ylim[1]) / 2
-
-                    # Keep yser samples for CSV output
-                    if self.req_save_csv_filename:
-                        csv_samples.append(yser)
-
-                    # Use a special ylim which taking account of mag and
-                    # ypos, and set_ylim()
-                    self.last_ylim = modified_ylim(
-                        ylim, self.mag10[idx] / 10, self.ypos10[idx] / 10
-                    )  # save for blank_screen
-                    cur_ax.set_ylim(self.last_ylim)
-
-                    # Generating label for line plot
-                    label = chconfig_idx.name
-                    if idx == self.ch_active:
-                        label += " (active)"
-
-                    # Finally plot line of a channel
-                    if self.view_enabled_ch[idx]:
-                        (line,) = cur_ax.plot(
-                            xser, yser, self.colorman.color(idx), label=label
-                        )
-
-                        # Append the line to lines[] to show legend on the
-                        # screen.
-                        # Note that this is required ONLY for legend purpose.
-                        # Even without this "lines", plottings themselves are
-                        # accomplished.
-                        self.lines.append(line)
-
-            # xlim is common among channels, so process here
-            self.canvas.ax.set_xlim(xlim)
-            self.canvas.ax.xaxis.set_major_formatter(EngFormatter())
-            self.canvas.ax.set_xlabel("[sec]")
-
-            # ylim is configured for currently active channel
-            self.canvas.ax.yaxis.set_major_formatter(EngFormatter())
-            self.canvas.ax.set_ylabel(
-                f"{chconfig_active.name} [{chconfig_active.unit}]"
+            self.update_layout(n_xsamples)
+
+            # Dequantizing and decimation are required only when the frame,
+            # the layout or the canvas width has changed
+            width = self.canvas.width()
+            redraw = (
+                self.rendered is None
+                or self.rendered[0] is not self.waves
+                or self.rendered[1:] != (self.last_layout, width)
+                or self.req_save_csv_filename
             )
 
-            # Show legend here
-            if len(self.lines) > 0:
-                self.canvas.ax.legend(
-                    self.lines,
-                    [_.get_label() for _ in self.lines],
-                    loc="upper left",
-                    # labelcolor='white',
-                    facecolor="lightgray",
-                    # edgecolor='white'
+            if blank_screen:
+                self.canvas.set_waves(None, None)
+                self.rendered = None
+            elif redraw:
+                # Convert samples of all channels to original float values
+                self.dequantizer = get_dequantizer(
+                    self.dequantizer,
+                    self.last_reply.chconfig,
+                    app.quantize_bits,
+                )
+                ysers = self.dequantizer(frame_samples(self.waves)[1])
+
+                # Save sample data to CSV file by a worker thread
+                if self.req_save_csv_filename:
+                    save_csv_in_background(
+                        self.req_save_csv_filename,
+                        self.xser,
+                        ysers,
+                        self.last_reply.chconfig,
+                        logger=self.logger,
+                    )
+                    self.req_save_csv_filename = None
+
+                # Only line data are updated for each frame.  Samples are
+                # reduced to about twice the canvas width.
+                self.canvas.set_waves(
+                    *minmax_decimate(self.xser, ysers, width)
                 )
+                self.rendered = (self.waves, self.last_layout, width)
 
-            # Show grid and finally draw everything
-            self.canvas.ax.grid(True)
+                # The canvas draws after this returns, so its draw_time is
+                # of the previous frame
+                now = time.perf_counter()
+                draw_time = now - tick_start + self.canvas.draw_time
+                if self.governor.frame_drawn(draw_time, now):
+                    self.statusBar().showMessage(self.governor.status())
 
-            self.canvas.set_visible(True)  # XXX Is here okay?
+        return self.canvas.artists()
+
+    def update_layout(self, n_xsamples):
+        """
+        Update limits, labels and legend of the canvas, only when anything
+        which affects them (channel config, mag10, ypos10, timescale, etc.)
+        has changed since the last call
+        """
+        chconfig = self.last_reply.chconfig
+        layout = (
+            self.ch_active,
+            self.frame_tscale,
+            n_xsamples,
+            tuple(self.mag10),
+            tuple(self.ypos10),
+            tuple(self.view_enabled_ch),
+            tuple(self.colorman.color(idx) for idx in range(len(chconfig))),
+            tuple((ch.name, ch.unit, ch.min, ch.max) for ch in chconfig),
+        )
+        if layout == self.last_layout:
+            return
+        self.last_layout = layout
+        self.logger.debug("update_layout()")
+
+        # xser is common among multiple channels
+        xlim = (-self.frame_tscale / 2, self.frame_tscale / 2)
+        self.xser = np.linspace(xlim[0], xlim[1], n_xsamples)
+
+        channels = []
+        for idx, ch in enumerate(chconfig):
+            # Generating label for line plot
+            label = ch.name
+            if idx == self.ch_active:
+                label += " (active)"
+
+            channels.append(
+                {
+                    # Use a special ylim which taking account of mag and ypos
+                    "ylim": modified_ylim(
+                        (ch.min, ch.max),
+                        self.mag10[idx] / 10,
+                        self.ypos10[idx] / 10,
+                    ),
+                    "color": self.colorman.color(idx),
+                    "label": label,
+                    "visible": self.view_enabled_ch[idx],
+                    "name": ch.name,
+                    "unit": ch.unit,
+                }
+            )
 
-            # Finally save sample data to CSV file
-            if self.req_save_csv_filename:
-                for i in range(n_xsamples):
-                    csv_printer.write(f"{i:e}")
-                    for ch_id in range(len(self.last_reply.chconfig)):
-                        csv_printer.write(f",{csv_samples[ch_id][i]:e}")
-                    csv_printer.write("\n")
-                csv_printer.close()
-                self.req_save_csv_filename = None
-                csv_printer.close()
+        self.canvas.set_layout(xlim, channels, self.ch_active)
 
-    def button_stop_changed(self):
+    def button_stop_changed(self):  # pylint: disable=too-many-statements
         """
         When Run/Stop button is clicked, this function (event handler)
         should be called.
@@ -1476,17 +1686,22 @@ class OscilloWidget(  # pylint: disable=too-many-instance-attributes,
             self.ch_active = 0
             self.ch_trig = 0
             self.clear_trig = False
+            self.config_seq = 0
+            self.frame_tscale = None
+            self.last_layout = None
             self.last_reply = None
-            self.last_ylim = None
             self.mag10 = None
             self.max_timescale = 0.0
+            self.governor = FrameRateGovernor(self.target_fps)
             self.old_status = ""
+            self.rendered = None
             self.req_save_csv_filename = None
             self.triggered = False
             self.triglevel = None
             self.trigmode = None
             self.trigtype = None
             self.tscale = None
+            self.waves = None
 
             self.reset()
 
@@ -1512,6 +1727,9 @@ class OscilloWidget(  # pylint: disable=too-many-instance-attributes,
             self.action_new.setEnabled(False)
             self.action_load.setEnabled(False)
             self.action_com_port.setEnabled(False)
+            self.menu_backend.setEnabled(False)
+            # A recording isn't recorded again while being replayed
+            self.action_record.setEnabled(config["playback"] is None)
             self.button_save_csv.setEnabled(True)
 
             self.button_stop.setText("Stop")
@@ -1521,6 +1739,10 @@ class OscilloWidget(  # pylint: disable=too-many-instance-attributes,
             self.ypos10 = config["ypos10"]
             self.max_timescale = config["max_timescale"]
             self.dsp_logger = config["logger"]
+            self.playback = config["playback"]
+            if self.playback:
+                self.action_pause.setChecked(False)
+                self.menu_playback.setEnabled(True)
 
             for item in config["ch_items"]:
                 self.menu_act_ch.addItem(item[0], item[1])
@@ -1531,15 +1753,7 @@ class OscilloWidget(  # pylint: disable=too-many-instance-attributes,
             )
             self.tscale_new = self.tscale
 
-            self.ani = FuncAnimation(
-                self.canvas.figure,
-                self.update_plot,
-                blit=False,
-                cache_frame_data=False,
-                interval=MIN_UPDATE_INTERVAL,
-            )
-            self.canvas.draw()  # In the blit=False case, this is required
-
+            self.start_animation()
             self.running = True
         else:
             self.stop()
@@ -1548,14 +1762,23 @@ class OscilloWidget(  # pylint: disable=too-many-instance-attributes,
         if self.cleanup_before_closing():
             QtWidgets.QApplication.quit()
 
+    def start_animation(self):
+        """
+        (Re-)start the canvas animation in the selected render mode
+        """
+        self.logger.debug(f"start_animation(): blit={self.blit}")
+        self.canvas.start_animation(
+            self.update_plot, self.governor.interval(), blit=self.blit
+        )
+
     def stop_animation(self):
         """
-        Stop Matplotlib FuncAnimation()
+        Stop the canvas animation
         """
         self.logger.debug("stop_animation()")
         if self.running:
             self.logger.debug("stop_animation(): self.running is True")
-            self.ani._stop()  # pylint: disable=protected-access
+            self.canvas.stop_animation()
             self.running = False
 
     def stop(self):
@@ -1568,24 +1791,17 @@ class OscilloWidget(  # pylint: disable=too-many-instance-attributes,
         self.action_new.setEnabled(True)
         self.action_load.setEnabled(True)
         self.action_com_port.setEnabled(True)
+        self.menu_backend.setEnabled(True)
+        self.action_record.setChecked(False)
+        self.action_record.setEnabled(False)
+        self.menu_playback.setEnabled(False)
+        self.playback = None
         self.button_stop.setChecked(False)
         self.button_stop.setText("Run")
         self.button_save_csv.setEnabled(False)
         self.oscillo_app.disconnect_target()
         self.stop_animation()
 
-    def create_sub_ax(self, n):
-        # First need to remove all sub_ax entities from the Figure
-        for ax in self.sub_ax:
-            ax.remove()
-
-        self.sub_ax = []
-        for _ in range(n):
-            new_sub_ax = self.canvas.ax.twinx()
-            new_sub_ax.get_xaxis().set_visible(False)
-            new_sub_ax.get_yaxis().set_visible(False)
-            self.sub_ax.append(new_sub_ax)
-
     def create_buttons_visibility(self, n):
         # First, remove QSpacerItem as a space holder
         self.visible_ch_layout.removeItem(self.visible_ch_layout.itemAt(0))
@@ -1627,6 +1843,8 @@ class QtOscillo:  # pylint: disable=too-many-instance-attributes
         # defined outside __init__).
         # These attributes are initialized elsewhere in the code, but pylint
         # expects them to be defined in __init__.
+        self.acquisition = None
+        self.recorder = None
         self.dsp_bitrate = None
         self.dsp_tty = None
         self.target = None
@@ -1676,7 +1894,9 @@ class QtOscillo:  # pylint: disable=too-many-instance-attributes
         # If the current comport is not available, disable the Run button
         curr_comport = self.confman.get("comport")
         for item in com_ports():
-            if item["name"] == curr_comport:
+            if item["name"] == curr_comport or is_socket_url(
+                curr_comport or ""
+            ):
                 break
         else:
             self.widget.button_stop.setEnabled(False)
@@ -1689,13 +1909,10 @@ class QtOscillo:  # pylint: disable=too-many-instance-attributes
         # Finally run the QApplication() and enter the GUI event handler loop
         sys.exit(qt_app.exec())
 
-    def connect_target(  # pylint: disable=too-many-locals
-        self, trigmode, trigtype, ch_trig, triglevel
-    ):
+    def open_dsp(self, comport):
         """
-        Connect to the target processor (MCU, DSP, etc.)
+        Open the target processor connected to the comport
         """
-        comport = self.confman.get("comport")
         if comport == "pcsim":
             if DEBUG_PCSIM:
                 # In the DEBUG case, manually run 'pcsim' by hand, and read
@@ -1719,8 +1936,33 @@ class QtOscillo:  # pylint: disable=too-many-instance-attributes
             ),
             console_handler=logging.StreamHandler(),
             file_handler=self.file_handler,
+            pipeline_depth=DSP_PIPELINE_DEPTH,
+            fast_decode=True,
+            crc=True,
+            compact=True,
         )
 
+    def connect_target(  # pylint: disable=too-many-locals
+        self, trigmode, trigtype, ch_trig, triglevel
+    ):
+        """
+        Connect to the target processor (MCU, DSP, etc.)
+        """
+        comport = self.confman.get("comport")
+        if comport == "playback":
+            try:
+                self.target = Playback(
+                    self.confman.get("playback_file") or "",
+                    logger=self.logger,
+                )
+            except (OSError, ValueError) as err:
+                QMessageBox.critical(
+                    self.widget, "Error", f"Can't open the recording: {err}"
+                )
+                return None
+        else:
+            self.open_dsp(comport)
+
         # Once configure the target to obtain various information need to
         # set-up variables
         try:
@@ -1748,7 +1990,7 @@ class QtOscillo:  # pylint: disable=too-many-instance-attributes
             width = ch.max - ch.min
             ypos10.append(int(math.floor(-2.0 * center / width + 0.5)) * 10)
 
-        self.widget.create_sub_ax(len(config_reply.chconfig) - 1)
+        self.widget.canvas.create_channels(len(config_reply.chconfig))
 
         self.widget.create_buttons_visibility(len(config_reply.chconfig))
 
@@ -1758,18 +2000,74 @@ class QtOscillo:  # pylint: disable=too-many-instance-attributes
         for idx, ch in enumerate(config_reply.chconfig):
             ch_items.append((f"{idx:d}: {ch.name}", idx))
 
+        # From now on, only the acquisition thread talks to the target
+        self.acquisition = Acquisition(
+            self.target,
+            config_reply,
+            config_reply.default_timescale,
+            logger=self.logger,
+        )
+        self.acquisition.start()
+
         return {
             "mag10": mag10,
             "ypos10": ypos10,
             "ch_items": ch_items,
             "max_timescale": config_reply.max_timescale,
             "logger": self.target.get_logger(),
+            "playback": (
+                self.target if isinstance(self.target, Playback) else None
+            ),
         }
 
+    def start_recording(self, filename):
+        """
+        Start recording acquired frames to a file
+
+        @param filename: name of the data file (the index file is created
+                         next to it)
+        Return False if the file couldn't be created.
+        """
+        self.stop_recording()
+        try:
+            self.recorder = Recorder(
+                filename, self.quantize_bits, logger=self.logger
+            )
+        except OSError as err:
+            self.logger.error("failed to start recording: %s", err)
+            return False
+
+        self.recorder.start()
+        self.acquisition.recorder = self.recorder
+        self.logger.info("recording to %s", filename)
+        return True
+
+    def stop_recording(self):
+        """
+        Stop recording, and flush and close the recording files
+        """
+        if self.recorder is None:
+            return
+        if self.acquisition:
+            self.acquisition.recorder = None
+        self.recorder.stop()
+        self.logger.info(
+            "recorded %d frames (%d dropped)",
+            self.recorder.n_frames,
+            self.recorder.dropped,
+        )
+        if self.recorder.error:
+            self.logger.error("recording failed: %s", self.recorder.error)
+        self.recorder = None
+
     def disconnect_target(self):
         """
         Disconnect from the target processor (MCU, DSP, etc.)
         """
+        self.stop_recording()
+        if self.acquisition:
+            self.acquisition.stop()
+            self.acquisition = None
         del self.target
         if self.confman.get("comport") == "pcsim":
             os.system("killall pcsim")
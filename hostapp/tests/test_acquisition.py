@@ -0,0 +1,120 @@
+# pylint: disable=missing-module-docstring
+
+import time
+
+from oscillodsp.acquisition import Acquisition, Frame, FrameRing
+
+
+class StubTarget:
+    """
+    Minimal DSP look-alike which counts frames and configurations
+    """
+
+    def __init__(self, fail_after=None):
+        self.n_frames = 0
+        self.configs = []
+        self.fail_after = fail_after
+
+    def config(self, **kwargs):
+        self.configs.append(kwargs)
+        return f"reply{len(self.configs):d}"
+
+    def get_waves(self):
+        if self.fail_after is not None and self.n_frames >= self.fail_after:
+            raise TimeoutError("Timeout.  No response from DSP.")
+        self.n_frames += 1
+        time.sleep(0.001)
+        return self.n_frames
+
+
+def wait_for(cond, timeout=2.0):
+    start = time.time()
+    while not cond():
+        assert time.time() - start < timeout
+        time.sleep(0.001)
+
+
+def test_ring_latest():
+    ring = FrameRing(size=3)
+    assert ring.latest() is None
+
+    for seq in range(5):
+        ring.push(Frame(seq, None, 0, None, 1e-3, 0.0))
+    assert len(ring.frames) == 3
+
+    # Only the newest frame is taken, and only once
+    assert ring.latest().seq == 4
+    assert ring.latest() is None
+
+    ring.push(Frame(5, None, 0, None, 1e-3, 0.0))
+    ring.push(Frame(6, None, 0, None, 1e-3, 0.0))
+    assert ring.latest().seq == 6
+    assert ring.dropped == 1
+
+
+def test_acquisition_config():
+    target = StubTarget()
+    acq = Acquisition(target, "reply0", 1e-3)
+    acq.start()
+    try:
+        seq = acq.request_config(resolution=16, timescale=2e-3)
+
+        def new_frame():
+            frame = acq.latest()
+            return frame is not None and frame.config_seq >= seq
+
+        wait_for(new_frame)
+        frame = acq.ring.frames[-1]
+        assert frame.config_reply == "reply1"
+        assert frame.timescale == 2e-3
+    finally:
+        acq.stop()
+
+    assert target.configs == [{"resolution": 16, "timescale": 2e-3}]
+
+
+def test_acquisition_error():
+    acq = Acquisition(StubTarget(fail_after=3), "reply0", 1e-3)
+    acq.start()
+    wait_for(lambda: not acq.is_alive())
+    assert isinstance(acq.error, TimeoutError)
+    assert acq.ring.frames[-1].waves == 3
+    acq.stop()
+
+
+def test_acquisition_config_error():
+    # An IndexError of config() isn't taken as no request
+    class BrokenTarget(StubTarget):
+        """
+        StubTarget whose configuration fails
+        """
+
+        def config(self, **kwargs):
+            raise IndexError("broken")
+
+    acq = Acquisition(BrokenTarget(), "reply0", 1e-3)
+    acq.start()
+    acq.request_config(resolution=16)
+    wait_for(lambda: not acq.is_alive())
+    assert isinstance(acq.error, IndexError)
+    acq.stop()
+
+
+def test_acquisition_recorder():
+    class ListRecorder:  # pylint: disable=too-few-public-methods
+        """
+        Recorder look-alike which keeps frames in a list
+        """
+
+        def __init__(self):
+            self.frames = []
+
+        def record(self, frame):
+            self.frames.append(frame)
+
+    acq = Acquisition(StubTarget(fail_after=3), "reply0", 1e-3)
+    acq.recorder = ListRecorder()
+    acq.start()
+    wait_for(lambda: not acq.is_alive())
+    assert [frame.seq for frame in acq.recorder.frames] == [0, 1, 2]
+    acq.stop()
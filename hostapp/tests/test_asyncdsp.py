@@ -0,0 +1,90 @@
+# pylint: disable=missing-module-docstring
+
+import asyncio
+import socket
+import threading
+
+import pytest
+from test_dsp import FakeTarget  # pylint: disable=import-error
+from test_session import serve  # pylint: disable=import-error
+
+from oscillodsp import dsp
+from oscillodsp.asyncdsp import AsyncDSP
+from oscillodsp.oscillodsp_pb2 import (  # pylint: disable=no-name-in-module
+    Auto,
+    RisingEdge,
+)
+from oscillodsp.transport import SerialTransport, SocketTransport
+
+
+@pytest.fixture(name="interface", params=["socket", "serial"])
+def fixture_interface(request, monkeypatch):
+    target = FakeTarget()
+    if request.param == "serial":
+        # No file descriptor, so the worker thread is used
+        monkeypatch.setattr(
+            dsp, "open_interface", lambda *_: SerialTransport(target)
+        )
+        yield target
+        return
+
+    host, peer = socket.socketpair()
+    threading.Thread(target=serve, args=(target, peer), daemon=True).start()
+    monkeypatch.setattr(
+        dsp, "open_interface", lambda *_: SocketTransport(host, 0.5)
+    )
+    yield target
+    peer.close()
+
+
+def test_async_get_waves(interface):
+    peer = AsyncDSP("fake", 0, pipeline_depth=2, fast_decode=True)
+    assert (peer.fd is None) == isinstance(peer.dsp.transport, SerialTransport)
+
+    async def main():
+        reply = await peer.config(
+            resolution=16, trigmode=Auto, trigtype=RisingEdge
+        )
+        assert len(reply.chconfig) == interface.n_channels
+
+        # The event loop keeps running while waiting for frames
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0)
+
+        task = asyncio.create_task(ticker())
+        samples = [(await peer.get_waves()).samples[0, 0] for _ in range(5)]
+        task.cancel()
+        assert samples == [0, 100, 200, 300, 400]
+        assert ticks > 0
+
+        # Frames already received are dropped by configuration
+        await peer.config(resolution=16, trigmode=Auto, trigtype=RisingEdge)
+        assert len(peer.dsp.inflight) == 0
+        assert await peer.echo_request("hello") == "hello"
+
+    asyncio.run(main())
+    peer.close()
+
+
+# DSP.get_waves() in the worker thread is tested by test_dsp.py
+@pytest.mark.parametrize("interface", ["socket"], indirect=True)
+def test_async_timeout(interface, monkeypatch):
+    monkeypatch.setattr(dsp, "DEFAULT_TIMEOUT_SECONDS", 0.05)
+    peer = AsyncDSP("fake", 0)
+
+    # Only the reply to the first request is lost, so requesting again
+    # works.  Then the target stops after the reply to the third one.
+    interface.mangle = {0: lambda _: b"", 3: lambda _: b"", 4: lambda _: b""}
+    assert asyncio.run(peer.get_waves()).triggered
+    assert interface.requests == [0, 1, 2]  # the next one is in flight
+    assert asyncio.run(peer.get_waves()).triggered
+
+    with pytest.raises(TimeoutError):
+        asyncio.run(peer.get_waves())
+    assert interface.requests == [0, 1, 2, 3, 4]
+    peer.close()
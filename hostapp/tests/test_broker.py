@@ -0,0 +1,221 @@
+# pylint: disable=missing-module-docstring
+
+import socket
+import struct
+import threading
+import time
+from urllib.parse import urlsplit
+
+import numpy as np
+import pytest
+from test_dsp import FakeTarget  # pylint: disable=import-error
+from test_session import serve, wait_for  # pylint: disable=import-error
+
+from oscillodsp import dsp
+from oscillodsp.acquisition import Frame
+from oscillodsp.broker import Broker, BrokerClient
+from oscillodsp.oscillodsp_pb2 import (  # pylint: disable=no-name-in-module
+    Auto,
+    MessageToDSP,
+    MessageToHost,
+    NoError,
+    RisingEdge,
+)
+from oscillodsp.shmring import SharedFrameRing, SharedRingReader
+from oscillodsp.transport import SocketTransport
+from oscillodsp.wavedecode import WaveGroupArray
+
+
+@pytest.fixture(name="target")
+def fixture_target():
+    return FakeTarget(n_samples=500)
+
+
+@pytest.fixture(name="broker")
+def fixture_broker(monkeypatch, tmp_path, target):
+    """
+    Yield a started Broker of the FakeTarget, and URLs which it listens on
+    """
+    host, peer = socket.socketpair()
+    threading.Thread(target=serve, args=(target, peer), daemon=True).start()
+    monkeypatch.setattr(
+        dsp, "open_interface", lambda *_: SocketTransport(host, 0.5)
+    )
+    upstream = dsp.DSP("fake", 0, pipeline_depth=2, fast_decode=True)
+    monkeypatch.undo()  # clients connect by sockets
+    reply = upstream.config(resolution=16, trigmode=Auto, trigtype=RisingEdge)
+
+    broker = Broker()
+    broker.add("fake", upstream, reply, reply.default_timescale, 16)
+    urls = [
+        broker.listen("tcp://127.0.0.1:0"),
+        broker.listen(f"unix://{tmp_path / 'broker.sock'}"),
+    ]
+    broker.start()
+    yield broker, urls
+    broker.stop()
+    peer.close()
+
+
+def connect(url, timescale=0.0, **kwargs):
+    client = dsp.DSP(url, 0, fast_decode=True, **kwargs)
+    reply = client.config(
+        resolution=16, trigmode=Auto, trigtype=RisingEdge, timescale=timescale
+    )
+    assert reply.err == NoError
+    return client
+
+
+def test_broker_clients(broker):
+    _, urls = broker
+    clients = [connect(url, pipeline_depth=2) for url in urls]
+    for client in clients:
+        assert client.echo_request("hello") == "hello"
+
+        # Frames are delivered in order, but may be skipped
+        last = -1
+        for _ in range(5):
+            samples = client.get_waves().samples
+            assert samples[0, 0] % 100 == 0
+            assert samples[1, 0] == samples[0, 0] + 1
+            assert samples[0, 0] > last
+            last = samples[0, 0]
+        client.transport.close()
+
+
+def test_broker_ownership(broker):
+    broker, urls = broker
+    entry = broker.targets[0]
+    owner = connect(urls[0], timescale=2e-3)
+    assert entry.timescale == pytest.approx(2e-3)
+
+    # Only the owner configures the DSP
+    other = connect(urls[1], timescale=5e-3)
+    assert entry.timescale == pytest.approx(2e-3)
+    assert other.get_waves().triggered
+
+    # The next oldest client owns after the owner disconnects
+    owner.transport.close()
+    wait_for(lambda: len(broker.clients) == 1)
+    other.config(
+        resolution=16, trigmode=Auto, trigtype=RisingEdge, timescale=5e-3
+    )
+    assert entry.timescale == pytest.approx(5e-3)
+
+
+def test_broker_stream_rate(broker):
+    _, urls = broker
+    client = connect(urls[0])
+    stream = client.stream_waves(max_rate=20.0)
+    start = time.monotonic()
+    for _ in range(3):
+        assert next(stream).triggered
+    assert time.monotonic() - start >= 2 / 20.0
+    stream.close()
+    assert client.get_waves().triggered
+
+
+def test_broker_slow_client(broker):
+    broker, urls = broker
+    parts = urlsplit(urls[0])
+    slow = socket.create_connection((parts.hostname, parts.port))
+    slow.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+
+    # Many requests, whose replies are never read
+    msg = MessageToDSP()
+    msg.getwave.SetInParent()
+    for id_ in range(10000):
+        msg.id = id_
+        s = msg.SerializeToString()
+        slow.sendall(struct.pack("!H", len(s)) + s)
+
+    wait_for(lambda: broker.clients and broker.clients[0].skipped > 0, 5.0)
+
+    # Other clients (and the DSP) are not slowed down
+    client = connect(urls[1])
+    seq = broker.targets[0].seq
+    for _ in range(5):
+        assert client.get_waves().triggered
+    assert broker.targets[0].seq > seq
+    slow.close()
+
+
+def test_broker_untriggered(broker, target):
+    # Frames without waves, while a normal trigger waits, are forwarded
+    broker, urls = broker
+    client = connect(urls[0])
+    target.untriggered = 1 << 30
+    frames = broker.targets[0].ring.frames
+    wait_for(lambda: frames and not frames[-1].waves.wave)
+    waves = client.get_waves()
+    assert not waves.triggered
+    assert not waves.wave
+
+    target.untriggered = 0
+    wait_for(lambda: client.get_waves().triggered)
+    assert broker.targets[0].error is None
+    assert broker.is_alive()
+
+
+def test_broker_publish_error(broker, monkeypatch):
+    # A failure to serve frames stops the broker as a DSP error does
+    broker, urls = broker
+    client = connect(urls[0])
+
+    def wavegroup(*_):
+        raise ValueError("broken")
+
+    monkeypatch.setattr(broker, "wavegroup", wavegroup)
+    with pytest.raises(OSError):
+        client.get_waves()
+    wait_for(lambda: not broker.is_alive())
+    assert isinstance(broker.targets[0].error, ValueError)
+
+
+def test_broker_shmring(broker):
+    broker, _ = broker
+    name = broker.share().name
+    reader = SharedRingReader(SharedFrameRing.attach(name))
+    wait_for(lambda: reader.ring.last_seq() >= 0)
+
+    frame = reader.latest()
+    assert frame.resolution == 16
+    assert frame.config_reply.chconfig[1].name == "ch1"
+    samples = frame.waves.samples
+    assert samples.shape == (2, 500)
+    assert samples[1, 0] == samples[0, 0] + 1
+    reader.ring.close()
+
+
+def test_wavegroup_settings():
+    broker = Broker()
+    broker.resolution = 16
+    client = BrokerClient(None, "stub")
+    client.resolution = 8
+    client.sample_bits = 16
+    waves = WaveGroupArray(
+        True, [0, 1], np.array([[256, 512], [1024, -256]], np.int32)
+    )
+
+    # The serialized field follows 'id'
+    s = broker.wavegroup(Frame(0, waves, 0, None, 1e-3, 0.0), client)
+    reply = MessageToHost()
+    reply.ParseFromString(MessageToHost(id=5).SerializeToString() + s)
+    assert reply.id == 5
+    assert reply.wavegroup.triggered
+    assert [wave.ch_id for wave in reply.wavegroup.wave] == [0, 1]
+    assert np.frombuffer(
+        reply.wavegroup.wave[1].packed_samples, "<i2"
+    ).tolist() == [4, -1]
+
+    # Cached for the same settings
+    assert broker.wavegroup(Frame(0, waves, 0, None, 1e-3, 0.0), client) is s
+
+    # Without waves
+    waves = WaveGroupArray(False, [], np.empty((0, 0), np.int32))
+    s = broker.wavegroup(Frame(1, waves, 0, None, 1e-3, 0.0), client)
+    reply = MessageToHost()
+    reply.ParseFromString(s)
+    assert reply.HasField("wavegroup")
+    assert not reply.wavegroup.triggered
+    assert not reply.wavegroup.wave
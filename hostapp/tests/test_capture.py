@@ -0,0 +1,199 @@
+# pylint: disable=missing-module-docstring
+
+import io
+
+import numpy as np
+import pytest
+from test_dsp import FakeTarget  # pylint: disable=import-error
+
+from oscillodsp import capture, dsp, recorder
+from oscillodsp.acquisition import Frame
+from oscillodsp.transport import SerialTransport
+from oscillodsp.wavedecode import WaveGroupArray
+
+
+@pytest.fixture(name="target")
+def fixture_target(monkeypatch):
+    target = FakeTarget()
+    monkeypatch.setattr(
+        dsp, "open_interface", lambda *_: SerialTransport(target)
+    )
+    return target
+
+
+def test_capture_recording(target, tmp_path):
+    filename = str(tmp_path / "capture.rec")
+    assert capture.main(["fake", "-o", filename, "-n", "5", "-q"]) == 0
+
+    recording = recorder.Recording(filename)
+    assert len(recording) == 5
+    frame = recording.frame(4)
+    assert frame.resolution == 16
+    assert frame.timescale == pytest.approx(1e-3)
+    assert frame.waves.samples[1, 0] == 401
+    assert frame.waves.samples.shape == (target.n_channels, target.n_samples)
+    recording.close()
+
+
+def test_capture_stream_to_stdout(target, capsysbinary):
+    assert capture.main(["fake", "-n", "3", "-q", "--stream"]) == 0
+    assert target.stream_id is None
+
+    # Records of the data file follow the file header
+    out = capsysbinary.readouterr().out
+    assert recorder.FILE_HEADER.unpack_from(out) == (
+        recorder.FILE_MAGIC,
+        recorder.FORMAT_VERSION,
+    )
+    offset = recorder.FILE_HEADER.size
+    types = []
+    while offset < len(out):
+        rtype, length = recorder.RECORD_HEADER.unpack_from(out, offset)
+        types.append(rtype)
+        offset += recorder.RECORD_HEADER.size + length
+    assert types == [recorder.RECORD_CONFIG] + [recorder.RECORD_FRAME] * 3
+
+
+def test_capture_npz(target, tmp_path):
+    filename = str(tmp_path / "capture.npz")
+    assert capture.main(["fake", "-f", "npz", "-o", filename, "-n", "3"]) == 0
+
+    with np.load(filename) as data:
+        samples = np.asarray(data["samples"])
+        assert samples.shape == (3, 2, target.n_samples)
+        assert samples[2, 1, 0] == 201
+        assert list(data["seq"]) == [0, 1, 2]
+        assert list(data["ch_name"]) == ["ch0", "ch1"]
+        assert int(data["resolution"]) == 16
+
+
+def test_capture_csv(target, tmp_path):
+    filename = str(tmp_path / "capture.csv")
+    assert capture.main(["fake", "-f", "csv", "-o", filename, "-n", "2"]) == 0
+
+    with open(filename, encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    assert lines[0] == "frame,time [sec],ch0 [volts],ch1 [volts]"
+    assert len(lines) == 1 + 2 * target.n_samples
+
+    # Samples of the second frame are 100 and 101
+    row = lines[-1].split(",")
+    assert row[0] == "1"
+    assert float(row[1]) == pytest.approx(0.5e-3)
+    assert float(row[2]) == pytest.approx(100 / (1 << 16) * 2)
+    assert float(row[3]) == pytest.approx(101 / (1 << 16) * 2)
+
+
+@pytest.mark.parametrize("encoding", ["sample-delta", "frame-delta"])
+def test_capture_delta(target, tmp_path, encoding):
+    # Delta encodings are requested without raw samples, which the DSP
+    # would send in plain instead
+    filename = str(tmp_path / "capture.rec")
+    argv = ["fake", "--encoding", encoding, "-o", filename, "-n", "3", "-q"]
+    assert capture.main(argv) == 0
+    assert target.sample_bits == 0
+    assert target.encoding == capture.ENCODINGS[encoding]
+
+    recording = recorder.Recording(filename)
+    assert recording.frame(2).waves.samples[1, 0] == 201
+    recording.close()
+
+
+@pytest.mark.parametrize("fmt", capture.FORMATS)
+def test_capture_untriggered(target, tmp_path, fmt):
+    # Frames without waves, while the normal trigger mode waits, are skipped
+    target.untriggered = 2
+    filename = str(tmp_path / f"capture.{fmt}")
+    argv = ["fake", "--trigmode", "normal", "-f", fmt, "-o", filename]
+    assert capture.main(argv + ["-n", "3", "-q"]) == 0
+
+    if fmt == "bin":
+        recording = recorder.Recording(filename)
+        assert len(recording) == 3
+        assert recording.frame(0).waves.samples[0, 0] == 0
+        recording.close()
+    elif fmt == "npz":
+        with np.load(filename) as data:
+            assert np.shape(data["samples"]) == (3, 2, target.n_samples)
+    else:
+        with open(filename, encoding="utf-8") as f:
+            assert len(f.read().splitlines()) == 1 + 3 * target.n_samples
+
+
+def test_capture_recorder_error(target, tmp_path, monkeypatch):
+    _ = target
+
+    def encode(*_):
+        raise ValueError("broken")
+
+    monkeypatch.setattr(recorder.RecordEncoder, "encode", encode)
+    filename = str(tmp_path / "capture.rec")
+    assert capture.main(["fake", "-o", filename, "-n", "5", "-q"]) == 1
+
+
+def test_sinks_channels_changed(target):
+    # A frame may have fewer channels than the configuration
+    _ = target
+    peer = dsp.DSP("fake", 0)
+    config_reply = peer.config(
+        resolution=16,
+        trigmode=capture.TRIGGER_MODES["auto"],
+        trigtype=capture.TRIGGER_TYPES["rising"],
+    )
+    frames = [
+        Frame(
+            0,
+            WaveGroupArray(True, [0, 1], np.full((2, 8), 100)),
+            0,
+            config_reply,
+            1e-3,
+            0.0,
+        ),
+        Frame(
+            1,
+            WaveGroupArray(True, [0], np.full((1, 4), 200)),
+            0,
+            config_reply,
+            1e-3,
+            0.0,
+        ),
+    ]
+
+    f = io.BytesIO()
+    sink = capture.NpzSink(f, 16)
+    for frame in frames:
+        sink.write(frame)
+    sink.close()
+    f.seek(0)
+    with np.load(f) as data:
+        samples = np.asarray(data["samples"])
+        assert samples.shape == (2, 2, 8)
+        assert list(samples[1, :, 3]) == [200, 0]
+        assert list(samples[1, :, 4]) == [0, 0]
+        assert list(data["n_channels"]) == [2, 1]
+        assert list(data["n_samples"]) == [8, 4]
+
+    f = io.StringIO()
+    sink = capture.CsvSink(f, 16)
+    for frame in frames:
+        sink.write(frame)
+    sink.close()
+    row = f.getvalue().splitlines()[-1].split(",")
+    assert row[0] == "1"
+    assert float(row[2]) == pytest.approx(200 / (1 << 16) * 2)
+    assert row[3] == "nan"
+
+
+def test_throughput_stats(target):
+    _ = target
+    peer = dsp.DSP("fake", 0)
+    out = io.StringIO()
+    stats = capture.ThroughputStats(peer, capture.StreamSink(out, 16), out)
+
+    stats.update(0, 0.0)
+    peer.recvd_total = 1000
+    stats.update(10, 0.5)
+    assert out.getvalue() == ""
+
+    stats.update(20, 1.0)
+    assert "20 frames, 20.0 fps, 8.0 kbps" in out.getvalue()
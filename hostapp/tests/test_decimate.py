@@ -0,0 +1,32 @@
+# pylint: disable=missing-module-docstring
+
+import numpy as np
+
+from oscillodsp.decimate import minmax_decimate
+
+
+def test_short_waves_untouched():
+    xser = np.arange(10)
+    ysers = [np.arange(10), -np.arange(10)]
+    xout, yout = minmax_decimate(xser, ysers, 5)
+    assert xout is xser
+    assert np.array_equal(yout, ysers)
+
+
+def test_glitch_preserved():
+    n_samples, n_columns = 10007, 100
+    xser = np.linspace(-1.0, 1.0, n_samples)
+    ysers = np.zeros((2, n_samples))
+    ysers[0, 1234] = 5.0
+    ysers[1, 9876] = -3.0
+
+    xout, yout = minmax_decimate(xser, ysers, n_columns)
+    assert xout.shape == (2 * n_columns,)
+    assert yout.shape == (2, 2 * n_columns)
+    assert yout[0].max() == 5.0
+    assert yout[1].min() == -3.0
+
+    # Each column gives its minimum and maximum at the same x value
+    assert np.array_equal(xout[0::2], xout[1::2])
+    assert np.all(np.diff(xout[0::2]) > 0)
+    assert np.all(yout[:, 0::2] <= yout[:, 1::2])
@@ -0,0 +1,59 @@
+# pylint: disable=missing-module-docstring
+
+import numpy as np
+import pytest
+
+from oscillodsp.dequantize import Dequantizer, get_dequantizer
+from oscillodsp.oscillodsp_pb2 import (  # pylint: disable=no-name-in-module
+    ConfigReply,
+)
+
+
+def chconfig(*ranges):
+    reply = ConfigReply()
+    for low, high in ranges:
+        ch = reply.chconfig.add()
+        ch.min = low
+        ch.max = high
+    return reply.chconfig
+
+
+def test_dequantize():
+    dequantizer = Dequantizer(chconfig((-1.0, 1.0), (0.0, 5.0)), 8)
+    samples = np.array([[-128, 0, 64], [-128, 0, 127]], np.int32)
+    ysers = dequantizer(samples)
+    assert ysers.dtype == np.float32
+    assert ysers[0].tolist() == [-1.0, 0.0, 0.5]
+    assert ysers[1].tolist() == pytest.approx([0.0, 2.5, 2.5 + 127 * 5 / 256])
+
+    # Fewer channels, into the given array
+    out = np.empty((1, 3), np.float32)
+    assert dequantizer(samples[:1], out) is out
+    assert out[0].tolist() == [-1.0, 0.0, 0.5]
+
+
+@pytest.mark.parametrize("dtype", [np.int16, np.int32])
+def test_dequantize_lut(dtype):
+    config = chconfig((-1.0, 1.0), (-3.0, 5.0))
+    samples = np.array(
+        [[-32768, -1, 0, 1, 32767], [100, -100, 12345, -12345, 0]], dtype
+    )
+    lut = Dequantizer(config, 16, lut=True)
+    assert lut.lut is not None
+    assert np.allclose(lut(samples), Dequantizer(config, 16)(samples))
+
+    # Samples above 16 bits aren't looked up
+    assert Dequantizer(config, 24, lut=True).lut is None
+
+
+def test_get_dequantizer():
+    dequantizer = get_dequantizer(None, chconfig((-1.0, 1.0)), 16)
+    assert get_dequantizer(dequantizer, chconfig((-1.0, 1.0)), 16) is (
+        dequantizer
+    )
+    assert get_dequantizer(dequantizer, chconfig((-2.0, 2.0)), 16) is not (
+        dequantizer
+    )
+    assert get_dequantizer(dequantizer, chconfig((-1.0, 1.0)), 8) is not (
+        dequantizer
+    )
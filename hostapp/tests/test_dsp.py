@@ -0,0 +1,382 @@
+# pylint: disable=missing-module-docstring
+
+import binascii
+import struct
+
+import pytest
+
+from oscillodsp import dsp
+from oscillodsp.oscillodsp_pb2 import (  # pylint: disable=no-name-in-module
+    Auto,
+    FrameDelta,
+    MessageToDSP,
+    MessageToHost,
+    NoError,
+    Normal,
+    RisingEdge,
+    SampleDelta,
+)
+from oscillodsp.transport import SerialTransport
+
+
+class FakeTarget:  # pylint: disable=too-many-instance-attributes
+    """
+    Serial-port look-alike which behaves as a (very simple) peer DSP
+    """
+
+    def __init__(self, n_channels=2, n_samples=8):
+        self.n_channels = n_channels
+        self.n_samples = n_samples
+        self.rxbuf = b""  # bytes from host
+        self.txbuf = b""  # bytes to host
+        self.requests = []  # IDs of GetWaveGroup requests received
+        self.frame_ct = 0
+        self.mangle = {}  # functions to alter replies, by request IDs
+        self.crc = False  # if sync word and CRC are sent
+        self.stream_id = None  # ID of StartStream while streaming
+        self.sample_bits = 0  # bits of raw samples, 0 for varints
+        self.encoding = 0
+        self.prev = None  # samples of the last frame for FrameDelta
+        self.frame_seq = 0
+        self.untriggered = 0  # frames without waves, as a normal trigger
+
+    def write(self, s):
+        self.rxbuf += s
+        while len(self.rxbuf) >= 2:
+            length = struct.unpack("!H", self.rxbuf[:2])[0]
+            if len(self.rxbuf) < 2 + length:
+                break
+            msg = MessageToDSP()
+            msg.ParseFromString(self.rxbuf[2 : 2 + length])
+            self.rxbuf = self.rxbuf[2 + length :]
+            self.reply(msg)
+
+    def reply(self, msg):
+        reply = MessageToHost()
+        reply.id = msg.id
+        payload = msg.WhichOneof("payload")
+        if payload == "getwave":
+            self.requests.append(msg.id)
+            if msg.getwave.keyframe:
+                self.prev = None
+            self.add_waves(reply)
+        elif payload == "config":
+            reply.configreply.err = NoError
+            reply.configreply.samplerate = 1e6
+            reply.configreply.default_timescale = 1e-3
+            reply.configreply.max_timescale = 16e-3
+            for ch in range(self.n_channels):
+                chconfig = reply.configreply.chconfig.add()
+                chconfig.name = f"ch{ch:d}"
+                chconfig.unit = "volts"
+                chconfig.min = -1.0
+                chconfig.max = 1.0
+            if msg.config.crc:
+                reply.configreply.crc = True
+            if msg.config.compact:
+                reply.configreply.sample_bits = 16
+            reply.configreply.encoding = msg.config.encoding
+        elif payload == "echoreq":
+            reply.echorep.content = msg.echoreq.content
+        elif payload in ["startstream", "stopstream"]:
+            reply.ack.err = NoError
+            self.send(reply)
+            self.stream_id = msg.id if payload == "startstream" else None
+            return
+        else:
+            return
+        self.send(reply)
+        if payload == "config":
+            self.crc = reply.configreply.crc
+            self.sample_bits = reply.configreply.sample_bits
+            self.encoding = reply.configreply.encoding
+            self.prev = None
+
+    def add_waves(self, reply):
+        if self.untriggered > 0:
+            self.untriggered -= 1
+            reply.wavegroup.triggered = False
+            return
+        reply.wavegroup.triggered = True
+        rows = [
+            [self.frame_ct * 100 + ch] * self.n_samples
+            for ch in range(self.n_channels)
+        ]
+        coded = rows
+        if self.encoding == SampleDelta:
+            coded = [[row[0]] + [0] * (len(row) - 1) for row in rows]
+        elif self.encoding == FrameDelta:
+            self.frame_seq += 1
+            reply.wavegroup.frame_seq = self.frame_seq
+            reply.wavegroup.delta = self.prev is not None
+            if self.prev is not None:
+                coded = [
+                    [x - y for x, y in zip(row, prev)]
+                    for row, prev in zip(rows, self.prev)
+                ]
+            self.prev = rows
+
+        for ch, samples in enumerate(coded):
+            wave = reply.wavegroup.wave.add()
+            wave.ch_id = ch
+            if self.sample_bits:
+                wave.packed_samples = struct.pack(
+                    f"<{self.n_samples:d}h", *samples
+                )
+            else:
+                wave.samples.extend(samples)
+        self.frame_ct += 1
+
+    def send(self, reply):
+        s = reply.SerializeToString()
+        frame = struct.pack("!H", len(s)) + s
+        if self.crc:
+            crc = binascii.crc_hqx(frame, 0xFFFF)
+            frame = b"\xa5\x5a" + frame + struct.pack("!H", crc)
+        if reply.id in self.mangle:
+            frame = self.mangle[reply.id](frame)
+        self.txbuf += frame
+
+    def read(self, n):
+        if self.stream_id is not None and not self.txbuf:
+            reply = MessageToHost()
+            reply.id = self.stream_id
+            self.add_waves(reply)
+            self.send(reply)
+        s, self.txbuf = self.txbuf[:n], self.txbuf[n:]
+        return s
+
+    def flush(self):
+        pass
+
+    @property
+    def in_waiting(self):
+        return len(self.txbuf)
+
+    @property
+    def out_waiting(self):
+        return 0
+
+    def reset_input_buffer(self):
+        self.txbuf = b""
+
+    def reset_output_buffer(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.fixture(name="target")
+def fixture_target(monkeypatch):
+    target = FakeTarget()
+    monkeypatch.setattr(
+        dsp, "open_interface", lambda *_: SerialTransport(target)
+    )
+    return target
+
+
+def test_get_waves_stop_and_wait(target):
+    peer = dsp.DSP("fake", 0)
+    waves = peer.get_waves()
+    assert waves.triggered
+    assert list(waves.wave[1].samples) == [1] * target.n_samples
+    assert target.requests == [0]
+
+
+def test_get_waves_pipelined(target):
+    peer = dsp.DSP("fake", 0, pipeline_depth=3)
+
+    # The first call fills the pipeline and returns the oldest reply
+    assert list(peer.get_waves().wave[0].samples)[0] == 0
+    assert target.requests == [0, 1, 2]
+
+    # Following calls keep three requests in flight
+    assert list(peer.get_waves().wave[0].samples)[0] == 100
+    assert target.requests == [0, 1, 2, 3]
+    assert list(peer.inflight) == [2, 3]
+
+
+def test_config_drains_pipeline(target):
+    peer = dsp.DSP("fake", 0, pipeline_depth=4)
+    peer.get_waves()
+    reply = peer.config(
+        resolution=16,
+        trigmode=Auto,
+        trigtype=RisingEdge,
+    )
+    assert len(reply.chconfig) == target.n_channels
+    assert len(peer.inflight) == 0
+    assert target.in_waiting == 0
+
+
+def test_pipeline_depth_invalid(target):
+    _ = target
+    with pytest.raises(ValueError):
+        dsp.DSP("fake", 0, pipeline_depth=0)
+
+
+def test_get_waves_fast_decode(target):
+    peer = dsp.DSP("fake", 0, pipeline_depth=2, fast_decode=True)
+    peer.get_waves()
+    waves = peer.get_waves()
+    assert waves.triggered
+    assert waves.samples.shape == (target.n_channels, target.n_samples)
+    assert list(waves.wave[1].samples) == [101] * target.n_samples
+
+
+def test_get_waves_reuse_samples(target):
+    with pytest.raises(ValueError):
+        dsp.DSP("fake", 0, reuse_samples=True)
+
+    peer = dsp.DSP("fake", 0, fast_decode=True, reuse_samples=True)
+    samples = peer.get_waves().samples
+    assert samples[1, 0] == 1
+
+    # Decoded into the same array
+    assert peer.get_waves().samples is samples
+    assert samples[1, 0] == 101
+    assert samples.shape == (target.n_channels, target.n_samples)
+
+
+def test_lost_replies_realigned(target):
+    peer = dsp.DSP("fake", 0, pipeline_depth=3)
+    target.mangle = {1: lambda _: b""}
+    assert list(peer.get_waves().wave[0].samples)[0] == 0
+
+    # The reply to request 1 never comes, so request 2 is taken instead
+    assert list(peer.get_waves().wave[0].samples)[0] == 200
+    assert peer.dropped_replies == 1
+    assert list(peer.inflight) == [3]
+
+
+def test_corrupted_reply_dropped(target):
+    # A broken message looks like a frame but can't be decoded
+    target.mangle = {1: lambda frame: b"\x00\x02\xff\xff" + frame}
+    peer = dsp.DSP("fake", 0, pipeline_depth=2)
+    peer.get_waves()
+    assert list(peer.get_waves().wave[0].samples)[0] == 100
+    assert peer.corrupted == 1
+
+
+def test_bogus_length_skipped(target):
+    # A length beyond any MessageToHost is skipped at once, instead of
+    # swallowing the replies which follow it
+    target.mangle = {1: lambda frame: b"\x7f\xff" + frame}
+    read = target.read
+    idle = []  # reads which would wait for the timeout
+    target.read = lambda n: read(n) or idle.append(n) or b""
+    peer = dsp.DSP("fake", 0, pipeline_depth=2)
+    assert list(peer.get_waves().wave[0].samples)[0] == 0
+    assert list(peer.get_waves().wave[0].samples)[0] == 100
+    assert peer.transport.reader.dropped_bytes == 2
+    assert not idle
+
+
+def test_send_config_in_flight(target):
+    # Replies before the one to Configure are framed as before, and
+    # those after it as it tells
+    peer = dsp.DSP("fake", 0, pipeline_depth=2, crc=True)
+    peer.send_requests()
+    peer.send_config(resolution=16, trigmode=Auto, trigtype=RisingEdge)
+    assert peer.config_id == 2
+
+    items = []
+    while len(items) < 5:
+        items += peer.poll_waves()
+    assert [waves.wave[0].samples[0] for waves in items[:2]] == [0, 100]
+    assert items[2].crc
+    assert peer.config_id is None
+    assert peer.transport.reader.crc
+    assert [waves.wave[0].samples[0] for waves in items[3:5]] == [200, 300]
+    assert target.requests == [0, 1, 3, 4, 5, 6]
+
+
+def test_crc_negotiated(target):
+    peer = dsp.DSP("fake", 0, pipeline_depth=2, crc=True)
+    peer.config(resolution=16, trigmode=Auto, trigtype=RisingEdge)
+    assert peer.transport.reader.crc
+
+    target.mangle = {2: lambda frame: frame[:10] + b"\x00" + frame[11:]}
+    peer.get_waves()
+    waves = peer.get_waves()
+
+    # The corrupted reply is dropped by CRC, and the next one is taken
+    assert list(waves.wave[0].samples)[0] == 200
+    assert peer.transport.reader.dropped_frames == 1
+
+
+def test_stream_waves(target):
+    peer = dsp.DSP("fake", 0, fast_decode=True)
+    stream = peer.stream_waves()
+    samples = [next(stream).wave[0].samples[0] for _ in range(3)]
+    assert samples == [0, 100, 200]
+    assert target.stream_id == 0
+
+    # Configuration while streaming
+    reply = peer.config(resolution=16, trigmode=Normal, trigtype=RisingEdge)
+    assert len(reply.chconfig) == target.n_channels
+    assert next(stream).triggered
+
+    stream.close()
+    assert target.stream_id is None
+    assert peer.stream_id is None
+    assert target.requests == []
+
+    # Requests work again after streaming
+    assert peer.get_waves().triggered
+
+
+def test_get_waves_compact(target):
+    with pytest.raises(ValueError):
+        dsp.DSP("fake", 0, compact=True)
+
+    peer = dsp.DSP("fake", 0, fast_decode=True, compact=True)
+    peer.config(resolution=16, trigmode=Auto, trigtype=RisingEdge)
+    assert peer.sample_bits == target.sample_bits == 16
+    waves = peer.get_waves()
+    assert list(waves.wave[1].samples) == [1] * target.n_samples
+
+
+def test_unknown_id_dropped(target):
+    stray = MessageToHost()
+    stray.id = 99
+    stray.echorep.content = "stray"
+    s = stray.SerializeToString()
+    target.mangle = {0: lambda frame: struct.pack("!H", len(s)) + s + frame}
+
+    peer = dsp.DSP("fake", 0)
+    assert peer.echo_request("hello") == "hello"
+    assert peer.dropped_replies == 1
+
+
+@pytest.mark.parametrize("encoding", [SampleDelta, FrameDelta])
+def test_get_waves_delta(target, encoding):
+    _ = target
+    with pytest.raises(ValueError):
+        dsp.DSP("fake", 0, encoding=encoding)
+    with pytest.raises(ValueError):
+        dsp.DSP("fake", 0, fast_decode=True, compact=True, encoding=encoding)
+
+    peer = dsp.DSP("fake", 0, fast_decode=True, encoding=encoding)
+    peer.config(resolution=16, trigmode=Auto, trigtype=RisingEdge)
+    assert peer.reply_encoding == encoding
+    for frame in range(3):
+        waves = peer.get_waves()
+        assert list(waves.wave[1].samples) == [frame * 100 + 1] * 8
+
+    # Only the first sample of each wave takes two bytes with SampleDelta
+    if encoding == SampleDelta:
+        assert peer.compression_ratio() > 1.5
+
+
+def test_get_waves_frame_delta_lost(target):
+    peer = dsp.DSP("fake", 0, fast_decode=True, encoding=FrameDelta)
+    peer.config(resolution=16, trigmode=Auto, trigtype=RisingEdge)
+    target.mangle = {2: lambda _: b""}
+    assert peer.get_waves().samples[0, 0] == 0
+
+    # The reply to request 2 is lost, so the next delta frame can't be
+    # reconstructed and a key frame is requested
+    assert peer.get_waves().samples[0, 0] == 300
+    assert target.requests == [1, 2, 3, 4]
@@ -0,0 +1,50 @@
+# pylint: disable=missing-module-docstring
+
+import numpy as np
+
+from oscillodsp import export
+from oscillodsp.oscillodsp_pb2 import (  # pylint: disable=no-name-in-module
+    ConfigReply,
+)
+
+
+def chconfig():
+    reply = ConfigReply()
+    for name, unit in [("input", "volts"), ("output", "amperes")]:
+        ch = reply.chconfig.add()
+        ch.name = name
+        ch.unit = unit
+    return reply.chconfig
+
+
+def test_save_csv(tmp_path, monkeypatch):
+    # Make sure that multiple chunks are written
+    monkeypatch.setattr(export, "CSV_CHUNK_ROWS", 7)
+
+    filename = tmp_path / "waves.csv"
+    xser = np.linspace(-1e-3, 1e-3, 50)
+    ysers = [np.sin(xser * 1e3), np.cos(xser * 1e3)]
+    export.save_csv(filename, xser, ysers, chconfig())
+
+    lines = filename.read_text(encoding="utf-8").splitlines()
+    assert lines[0] == "time [sec],input [volts],output [amperes]"
+    assert lines[1] == f"{xser[0]:e},{ysers[0][0]:e},{ysers[1][0]:e}"
+
+    data = np.loadtxt(filename, delimiter=",", skiprows=1)
+    assert data.shape == (50, 3)
+    assert np.allclose(data[:, 0], xser)
+    assert np.allclose(data[:, 2], ysers[1], rtol=1e-6)
+
+
+def test_save_csv_in_background(tmp_path):
+    filename = tmp_path / "waves.csv"
+    xser = np.arange(4, dtype=float)
+    ysers = np.ones((2, 4))
+    thread = export.save_csv_in_background(filename, xser, ysers, chconfig())
+
+    # The caller may reuse its arrays immediately
+    ysers[:] = 0
+    thread.join()
+
+    data = np.loadtxt(filename, delimiter=",", skiprows=1)
+    assert np.array_equal(data[:, 1:], np.ones((4, 2)))
@@ -0,0 +1,53 @@
+# pylint: disable=missing-module-docstring
+
+import pytest
+
+from oscillodsp.acquisition import Frame
+from oscillodsp.governor import (
+    MAX_GUI_LOAD,
+    FrameRateGovernor,
+    MovingAverage,
+    RateMeter,
+)
+
+
+def test_moving_average():
+    avg = MovingAverage(alpha=0.5)
+    assert avg.value is None
+    assert avg.update(4.0) == 4.0
+    assert avg.update(2.0) == 3.0
+
+
+def test_rate_meter():
+    meter = RateMeter(window=1.0)
+    assert not meter.update(0, now=10.0)
+    assert not meter.update(50, now=10.5)
+    assert meter.update(120, now=12.0)
+    assert meter.rate == pytest.approx(60.0)
+
+
+def test_interval_follows_slowest():
+    gov = FrameRateGovernor(target_fps=50)
+    assert gov.interval() == pytest.approx(20.0)
+
+    # Frames arrive slower than the target
+    gov.frame_acquired(Frame(0, None, 0, None, 1e-3, 0.04, 1e-4), now=0.0)
+    assert gov.interval() == pytest.approx(40.0)
+
+    # Drawing is so slow that the GUI would be overloaded
+    gov.frame_drawn(0.05, now=0.0)
+    assert gov.interval() == pytest.approx(50.0 / MAX_GUI_LOAD)
+
+
+def test_status():
+    gov = FrameRateGovernor(target_fps=30)
+    for seq in range(3):
+        gov.frame_acquired(Frame(seq * 10, None, 0, None, 1e-3, 0.01), seq)
+        gov.frame_drawn(0.005, now=seq)
+    assert "Acquisition 10.0 fps" in gov.status()
+    assert "Display 1.0 fps" in gov.status()
+
+
+def test_target_fps_invalid():
+    with pytest.raises(ValueError):
+        FrameRateGovernor(target_fps=0)
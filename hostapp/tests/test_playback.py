@@ -0,0 +1,113 @@
+# pylint: disable=missing-module-docstring
+
+import time
+
+import numpy as np
+import pytest
+
+from oscillodsp.acquisition import Acquisition, Frame
+from oscillodsp.oscillodsp_pb2 import (  # pylint: disable=no-name-in-module
+    ConfigReply,
+    NoError,
+)
+from oscillodsp.playback import POLL_INTERVAL_SEC, Playback
+from oscillodsp.recorder import Recorder
+from oscillodsp.wavedecode import WaveGroupArray
+
+N_FRAMES = 10
+FRAME_INTERVAL = 0.01
+
+
+@pytest.fixture(name="filename")
+def fixture_filename(tmp_path):
+    reply = ConfigReply()
+    reply.err = NoError
+    reply.samplerate = 1e6
+    reply.default_timescale = 1e-3
+    reply.max_timescale = 16e-3
+    chconfig = reply.chconfig.add()
+    chconfig.name = "ch0"
+    chconfig.unit = "volts"
+    chconfig.min = -1.0
+    chconfig.max = 1.0
+
+    filename = tmp_path / "rec.oscrec"
+    recorder = Recorder(filename, 16)
+    recorder.start()
+    for seq in range(N_FRAMES):
+        waves = WaveGroupArray(True, [0], np.full((1, 4), seq, np.int32))
+        frame = Frame(seq, waves, 0, reply, 2e-3, 0.0)
+        frame.timestamp = seq * FRAME_INTERVAL
+        recorder.record(frame)
+    recorder.stop()
+    return filename
+
+
+def first_sample(waves):
+    return int(waves.wave[0].samples[0])
+
+
+def test_playback_paced(filename):
+    playback = Playback(filename)
+    assert playback.config(resolution=16).chconfig[0].name == "ch0"
+    assert len(playback) == N_FRAMES
+    assert playback.timescale == 2e-3
+
+    # Frames are returned in order at the recorded pace
+    values = [first_sample(playback.get_waves()) for _ in range(3)]
+    assert values[0] == 0
+    assert values == sorted(values)
+
+    # At high speed, overdue frames are skipped, and playback loops.  Each
+    # call advances by a frame at least, so the end is reached in time.
+    playback.set_speed(1000.0)
+    values = [first_sample(playback.get_waves()) for _ in range(N_FRAMES)]
+    assert N_FRAMES - 1 in values or 0 in values
+    playback.close()
+
+
+def test_playback_seek_and_step(filename):
+    playback = Playback(filename, loop=False)
+    playback.seek(7)
+    assert first_sample(playback.get_waves()) == 7
+
+    playback.step(-2)
+    waves = playback.get_waves()
+    assert first_sample(waves) == 5
+    assert playback.position() == 5
+
+    # Paused playback doesn't return the frame again
+    assert playback.get_waves() is None
+
+    playback.seek(N_FRAMES + 5)
+    playback.pause(False)
+    assert first_sample(playback.get_waves()) == N_FRAMES - 1
+    assert playback.get_waves() is None
+
+
+def test_playback_resolution(filename):
+    playback = Playback(filename)
+    playback.seek(3)
+    playback.config(resolution=18)
+    waves = playback.get_waves()
+    assert first_sample(waves) == 3 << 2
+    assert waves.samples.dtype == np.int32
+
+    # The paused frame is returned again by a new resolution
+    playback.pause()
+    playback.config(resolution=14)
+    assert first_sample(playback.get_waves()) == 3 >> 2
+    assert playback.get_waves() is None
+
+
+def test_playback_acquisition(filename):
+    # Frames are acquired only once each
+    playback = Playback(filename)
+    playback.pause()
+    acq = Acquisition(playback, playback.config_reply, playback.timescale)
+    acq.start()
+    time.sleep(3 * POLL_INTERVAL_SEC)
+    acq.stop()
+    assert acq.error is None
+    assert acq.seq == 1
+    playback.close()
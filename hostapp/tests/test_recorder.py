@@ -0,0 +1,127 @@
+# pylint: disable=missing-module-docstring
+
+import os
+
+import numpy as np
+
+from oscillodsp.acquisition import Frame
+from oscillodsp.oscillodsp_pb2 import (  # pylint: disable=no-name-in-module
+    ConfigReply,
+    NoError,
+    WaveGroup,
+)
+from oscillodsp.recorder import Recorder, Recording, index_filename
+from oscillodsp.wavedecode import WaveGroupArray
+
+
+def config_reply(name):
+    reply = ConfigReply()
+    reply.err = NoError
+    reply.samplerate = 1e6
+    reply.default_timescale = 1e-3
+    reply.max_timescale = 16e-3
+    for ch in range(2):
+        chconfig = reply.chconfig.add()
+        chconfig.name = f"{name}{ch:d}"
+        chconfig.unit = "volts"
+        chconfig.min = -1.0
+        chconfig.max = 1.0
+    return reply
+
+
+def make_frame(seq, reply, n_samples=16):
+    samples = np.arange(2 * n_samples, dtype=np.int32).reshape(2, -1) + seq
+    waves = WaveGroupArray(seq % 2 == 0, [0, 1], samples)
+    return Frame(seq, waves, 0, reply, 1e-3 * (seq + 1), 0.0)
+
+
+def record(filename, frames, resolution=16, chunk_bytes=256):
+    recorder = Recorder(filename, resolution, chunk_bytes=chunk_bytes)
+    recorder.start()
+    for frame in frames:
+        recorder.record(frame)
+    recorder.stop()
+    assert recorder.error is None
+    assert recorder.n_frames == len(frames)
+
+
+def test_record_and_read(tmp_path):
+    filename = tmp_path / "rec.bin"
+    replies = [config_reply("a"), config_reply("b")]
+    frames = [make_frame(seq, replies[seq // 5]) for seq in range(10)]
+    record(filename, frames)
+
+    recording = Recording(filename)
+    assert len(recording) == 10
+    for i in [0, 7, 9]:
+        frame = recording.frame(i)
+        assert frame.seq == i
+        assert frame.timescale == frames[i].timescale
+        assert frame.waves.triggered == frames[i].waves.triggered
+        assert frame.waves.samples.dtype == np.int16
+        assert np.array_equal(frame.waves.samples, frames[i].waves.samples)
+        assert frame.config_reply == replies[i // 5]
+        assert frame.resolution == 16
+    assert np.all(np.diff(recording.timestamps()) >= 0)
+    recording.close()
+
+
+def test_record_int32(tmp_path):
+    filename = tmp_path / "rec.bin"
+    frame = make_frame(0, config_reply("a"))
+    frame.waves.samples[0, 0] = 1 << 20
+    record(filename, [frame], resolution=24)
+
+    recording = Recording(filename)
+    assert recording.frame(0).waves.samples[0, 0] == 1 << 20
+
+
+def test_truncated_recording(tmp_path):
+    filename = tmp_path / "rec.bin"
+    reply = config_reply("a")
+    record(filename, [make_frame(seq, reply) for seq in range(4)])
+
+    # As if the writer crashed in the middle of the last frame
+    size = os.path.getsize(filename)
+    with open(filename, "r+b") as f:
+        f.truncate(size - 10)
+    assert os.path.getsize(index_filename(filename)) > 0
+
+    recording = Recording(filename)
+    assert len(recording) == 3
+    assert recording.frame(2).seq == 2
+
+
+def test_record_empty_frame(tmp_path):
+    filename = tmp_path / "rec.bin"
+    reply = config_reply("a")
+
+    # The normal trigger mode sends no wave while waiting for a trigger
+    empty = WaveGroupArray(False, [], np.empty((0, 0), np.int32))
+    frames = [make_frame(0, reply), Frame(1, empty, 0, reply, 1e-3, 0.0)]
+    frames.append(Frame(2, WaveGroup(), 0, reply, 1e-3, 0.0))
+    frames.append(make_frame(3, reply))
+    record(filename, frames)
+
+    recording = Recording(filename)
+    assert len(recording) == 4
+    for i in [1, 2]:
+        assert recording.frame(i).waves.samples.shape == (0, 0)
+        assert not recording.frame(i).waves.triggered
+    assert recording.frame(3).waves.samples.shape == (2, 16)
+
+
+def test_recorder_error(tmp_path):
+    recorder = Recorder(tmp_path / "rec.bin", 16)
+    recorder.start()
+
+    # A frame which can't be encoded stops the writer with the error
+    recorder.record(make_frame(0, object()))
+    recorder.join(5.0)
+    assert not recorder.is_alive()
+    assert isinstance(recorder.error, AttributeError)
+
+    # Later frames are ignored rather than dropped
+    recorder.record(make_frame(1, config_reply("a")))
+    assert recorder.dropped == 0
+    recorder.stop()
@@ -0,0 +1,162 @@
+# pylint: disable=missing-module-docstring
+
+import io
+import socket
+import threading
+import time
+
+import pytest
+from test_dsp import FakeTarget  # pylint: disable=import-error
+
+from oscillodsp import dsp
+from oscillodsp.oscillodsp_pb2 import (  # pylint: disable=no-name-in-module
+    Auto,
+    RisingEdge,
+)
+from oscillodsp.session import Session
+from oscillodsp.transport import SerialTransport, SocketTransport
+
+
+def serve(target, sock):
+    """
+    Let the FakeTarget reply to requests coming through the socket
+    """
+    try:
+        while True:
+            s = sock.recv(4096)
+            if not s:
+                break
+            target.write(s)
+            s, target.txbuf = target.txbuf, b""
+            sock.sendall(s)
+    except OSError:
+        pass
+
+
+@pytest.fixture(name="peers")
+def fixture_peers(monkeypatch):
+    """
+    Yield a list of (FakeTarget, socket) of DSP objects opened
+    """
+    peers = []
+
+    def open_interface(*_):
+        target = FakeTarget()
+        host, peer = socket.socketpair()
+        threading.Thread(
+            target=serve, args=(target, peer), daemon=True
+        ).start()
+        peers.append((target, peer))
+        return SocketTransport(host, 0.5)
+
+    monkeypatch.setattr(dsp, "open_interface", open_interface)
+    yield peers
+    for _, sock in peers:
+        sock.close()
+
+
+def wait_for(cond, timeout=2.0):
+    start = time.time()
+    while not cond():
+        assert time.time() - start < timeout
+        time.sleep(0.001)
+
+
+def add_peer(session, name):
+    peer = dsp.DSP(name, 0, pipeline_depth=2, fast_decode=True)
+    reply = peer.config(resolution=16, trigmode=Auto, trigtype=RisingEdge)
+    return session.add(name, peer, reply, reply.default_timescale)
+
+
+def test_session_frames(peers):
+    _ = peers
+    session = Session()
+    entries = [add_peer(session, f"peer{i:d}") for i in range(3)]
+    session.start()
+    try:
+        for entry in entries:
+            wait_for(lambda entry=entry: entry.seq >= 10)
+
+        # Each target has its own frames in order
+        for entry in entries:
+            frame = entry.ring.frames[-1]
+            assert frame.waves.samples[0, 0] == frame.seq * 100
+            assert frame.config_reply is entry.config_reply
+    finally:
+        session.stop()
+
+    # The DSP objects can be used again
+    for entry in entries:
+        assert len(entry.target.inflight) == 0
+        assert entry.target.get_waves().triggered
+
+
+def test_session_config(peers):
+    _ = peers
+    session = Session()
+    entry = add_peer(session, "peer")
+    session.start()
+    try:
+        seq = entry.request_config(
+            resolution=16, trigmode=Auto, trigtype=RisingEdge, timescale=2e-3
+        )
+
+        def new_frame():
+            frame = entry.latest()
+            return frame is not None and frame.config_seq >= seq
+
+        wait_for(new_frame)
+        assert entry.ring.frames[-1].timescale == 2e-3
+    finally:
+        session.stop()
+
+
+def test_session_config_slow(peers):
+    session = Session(timeout=0.5)
+    entries = [add_peer(session, f"peer{i:d}") for i in range(2)]
+
+    # The first target doesn't reply to Configure any more
+    target = peers[0][0]
+    reply = target.reply
+    target.reply = lambda msg: (
+        None if msg.WhichOneof("payload") == "config" else reply(msg)
+    )
+    session.start()
+    try:
+        entries[0].request_config(
+            resolution=16, trigmode=Auto, trigtype=RisingEdge
+        )
+        wait_for(lambda: entries[0].sent_config is not None)
+
+        # The other target isn't held up while waiting for the reply
+        seq = entries[1].seq
+        wait_for(lambda: entries[1].seq > seq + 10, 0.3)
+        wait_for(lambda: entries[0].error is not None)
+        assert isinstance(entries[0].error, TimeoutError)
+        assert entries[1].error is None
+    finally:
+        session.stop()
+
+
+def test_session_error(peers):
+    session = Session(timeout=0.1)
+    entries = [add_peer(session, f"peer{i:d}") for i in range(2)]
+    session.start()
+    try:
+        # Only the target which has stopped is dropped
+        peers[0][1].close()
+        wait_for(lambda: entries[0].error is not None)
+        seq = entries[1].seq
+        wait_for(lambda: entries[1].seq > seq + 10)
+        assert entries[1].error is None
+    finally:
+        session.stop()
+
+
+def test_session_unselectable(monkeypatch):
+    monkeypatch.setattr(
+        dsp, "open_interface", lambda *_: SerialTransport(FakeTarget())
+    )
+    peer = dsp.DSP("fake", 0)
+    with pytest.raises(io.UnsupportedOperation):
+        Session().add("fake", peer, None, 1e-3)
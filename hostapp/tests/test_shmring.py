@@ -0,0 +1,126 @@
+# pylint: disable=missing-module-docstring
+
+import numpy as np
+import pytest
+from test_recorder import config_reply  # pylint: disable=import-error
+
+from oscillodsp.acquisition import Frame
+from oscillodsp.shmring import SharedFrameRing, SharedRingReader
+from oscillodsp.wavedecode import WaveGroupArray
+
+
+@pytest.fixture(name="ring")
+def fixture_ring():
+    ring = SharedFrameRing.create(2, 16, n_samples=8, n_slots=4)
+    yield ring
+    ring.close()
+
+
+def make_frame(seq, reply, n_samples=8):
+    samples = np.array(
+        [[seq * 100] * n_samples, [seq * 100 + 1] * n_samples], np.int32
+    )
+    waves = WaveGroupArray(seq % 2 == 0, [0, 1], samples)
+    return Frame(seq, waves, 0, reply, 1e-3 * (seq + 1), 0.0)
+
+
+def test_shmring_roundtrip(ring):
+    reply = config_reply("ch")
+    reader = SharedFrameRing.attach(ring.name)
+    assert (reader.n_slots, reader.n_channels, reader.n_samples) == (4, 2, 8)
+    assert reader.resolution == 16
+    assert reader.read(0) is None
+
+    for seq in range(3):
+        ring.write(make_frame(seq, reply))
+    frame = reader.read(2)
+    assert frame.seq == 2
+    assert frame.timescale == pytest.approx(3e-3)
+    assert frame.waves.triggered
+    assert [wave.ch_id for wave in frame.waves.wave] == [0, 1]
+    assert frame.waves.samples[1].tolist() == [201] * 8
+    assert frame.config_reply.chconfig[1].name == "ch1"
+    assert frame.resolution == 16
+
+    # Views refer to the ring and are overwritten by later frames
+    view = reader.read(1, copy=False)
+    copied = reader.read(1)
+    for seq in range(3, 6):
+        ring.write(make_frame(seq, reply))
+    assert view.waves.samples[0, 0] == 500
+    assert copied.waves.samples[0, 0] == 100
+    assert not reader.valid(1)
+    assert reader.read(1) is None
+
+    del view
+    reader.close()
+
+
+def test_shmring_reader(ring):
+    reply = config_reply("ch")
+    cursor = SharedRingReader(SharedFrameRing.attach(ring.name))
+    assert cursor.next() is None
+
+    ring.write(make_frame(0, reply))
+    assert [cursor.next().seq, cursor.next()] == [0, None]
+    ring.write(make_frame(1, reply))
+    assert cursor.latest().seq == 1
+    assert cursor.latest() is None
+
+    # Frames overwritten before being read are counted as dropped
+    for seq in range(2, 8):
+        ring.write(make_frame(seq, reply))
+    assert cursor.next().seq == 4
+    assert cursor.dropped == 2
+    assert cursor.latest().seq == 7
+    assert cursor.dropped == 4
+
+    # A new configuration follows frames
+    ring.write(make_frame(8, config_reply("new")))
+    assert cursor.next().config_reply.chconfig[0].name == "new0"
+    cursor.ring.close()
+
+
+def test_shmring_config_overwritten():
+    ring = SharedFrameRing.create(2, 16, n_samples=8, n_slots=8)
+    for seq in range(6):
+        ring.write(make_frame(seq, config_reply(f"c{seq:d}")))
+
+    # Configurations of frames 0 and 1 are overwritten by later ones
+    cursor = SharedRingReader(SharedFrameRing.attach(ring.name))
+    frame = cursor.next()
+    assert frame.seq == 2
+    assert frame.config_reply.chconfig[0].name == "c20"
+    assert cursor.dropped == 2
+    cursor.ring.close()
+    ring.close()
+
+
+def test_shmring_torn_read(ring):
+    ring.write(make_frame(0, config_reply("ch")))
+    reader = SharedFrameRing.attach(ring.name)
+
+    # The frame being written can't be read
+    ring.locks[0] = 1
+    assert reader.read(0) is None
+    ring.locks[0] = 2
+    assert reader.read(0).seq == 0
+    reader.close()
+
+
+def test_shmring_oversized(ring):
+    # Frames which don't fit in a slot are dropped by record()
+    with pytest.raises(ValueError):
+        ring.write(make_frame(0, config_reply("ch"), n_samples=9))
+    ring.record(make_frame(0, config_reply("ch"), n_samples=9))
+    assert ring.dropped == 1
+    assert ring.last_seq() == -1
+
+    # Fewer samples fit
+    ring.record(make_frame(0, config_reply("ch"), n_samples=5))
+    assert ring.read(0).waves.samples.shape == (2, 5)
+
+
+def test_shmring_attach_invalid():
+    with pytest.raises(FileNotFoundError):
+        SharedFrameRing.attach("oscillodsp-no-such-ring")
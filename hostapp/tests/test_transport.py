@@ -0,0 +1,181 @@
+# pylint: disable=missing-module-docstring
+
+import binascii
+import socket
+
+import pytest
+
+from oscillodsp.transport import (
+    MAX_FRAME_BYTES,
+    SYNC_WORD,
+    FrameReader,
+    SocketTransport,
+    is_socket_url,
+    open_transport,
+)
+
+
+@pytest.fixture(name="pair")
+def fixture_pair():
+    host, peer = socket.socketpair()
+    yield SocketTransport(host, 0.2), peer
+    host.close()
+    peer.close()
+
+
+def test_is_socket_url():
+    assert is_socket_url("tcp://localhost:5555")
+    assert is_socket_url("unix:///tmp/pcsim.sock")
+    assert not is_socket_url("/dev/ttyUSB0")
+    assert not is_socket_url("ftdi://ftdi:0xa6d0:TIU72PWC/2")
+
+
+def chunked_fill(data, chunk):
+    """
+    Return a fill function of FrameReader which gives data by chunks
+    """
+    pos = 0
+
+    def fill(view):
+        nonlocal pos
+        n = min(chunk, len(view), len(data) - pos)
+        view[:n] = data[pos : pos + n]
+        pos += n
+        return n
+
+    return fill
+
+
+def test_frame_reader_bulk():
+    payloads = [bytes([i]) * (i * 7 % 300) for i in range(200)]
+    data = b"".join(len(p).to_bytes(2, "big") + p for p in payloads)
+    reader = FrameReader(chunked_fill(data, 4096))
+    assert [bytes(reader.next_frame()) for _ in payloads] == payloads
+
+    # Many messages are taken by one read
+    assert reader.n_reads == -(-len(data) // 4096)
+
+    with pytest.raises(TimeoutError):
+        reader.next_frame()
+
+
+def test_frame_reader_partial():
+    # Long messages span reads, and wrap around the buffer
+    payloads = [bytes([i]) * 0xFFFF for i in range(3)]
+    data = b"".join(len(p).to_bytes(2, "big") + p for p in payloads)
+    reader = FrameReader(chunked_fill(data, 1000), size=MAX_FRAME_BYTES)
+    for p in payloads:
+        assert reader.next_frame() == p
+
+    with pytest.raises(ValueError):
+        FrameReader(None, size=MAX_FRAME_BYTES - 1)
+
+
+def test_frame_reader_backlog():
+    # Taken bytes are dropped even if the caller keeps a long backlog of
+    # messages in the buffer, so that reads don't run out of room
+    payloads = [bytes([i % 256]) * (i * 7 % 300) for i in range(3000)]
+    data = b"".join(len(p).to_bytes(2, "big") + p for p in payloads)
+    reader = FrameReader(chunked_fill(data, 999), size=2 * MAX_FRAME_BYTES)
+    taken = []
+    for _ in range(-(-len(data) // 999)):
+        assert reader.feed() > 0
+        while reader.buffered() > MAX_FRAME_BYTES + 300:
+            taken.append(bytes(reader.parse()))
+    while len(taken) < len(payloads):
+        taken.append(bytes(reader.parse()))
+    assert taken == payloads
+
+
+def test_frame_reader_bad_length():
+    # Garbage before a message makes an implausible length
+    data = b"\xff\xff\xff\x00\x03abc\x00\x02de"
+    reader = FrameReader(chunked_fill(data, 4096), max_length=16)
+    assert reader.next_frame() == b"abc"
+    assert reader.next_frame() == b"de"
+    assert reader.dropped_bytes == 3
+    assert reader.dropped_frames == 1
+
+
+def test_frame_reader_resync():
+    # The first frame is plausible but turns out to be broken
+    data = b"\x00\x01\x00\x02xy"
+    reader = FrameReader(chunked_fill(data, 4096))
+    assert reader.next_frame() == b"\x00"
+    reader.resync()
+    assert reader.next_frame() == b"xy"
+    assert reader.dropped_bytes == 2
+
+
+def test_frame_reader_partial_at_timeout():
+    # The rest of the first frame never comes
+    data = b"\x00\x10abc\x00\x02de"
+    reader = FrameReader(chunked_fill(data, 4096))
+    assert reader.next_frame() == b"de"
+    with pytest.raises(TimeoutError):
+        reader.next_frame()
+
+
+def crc_frame(payload):
+    frame = len(payload).to_bytes(2, "big") + payload
+    crc = binascii.crc_hqx(frame, 0xFFFF)
+    return SYNC_WORD + frame + crc.to_bytes(2, "big")
+
+
+def test_frame_reader_crc():
+    payloads = [b"first", b"second", b"third"]
+    frames = [crc_frame(p) for p in payloads]
+    broken = frames[1][:5] + b"X" + frames[1][6:]
+    data = b"junk" + frames[0] + broken + frames[2]
+    reader = FrameReader(chunked_fill(data, 7))
+    reader.crc = True
+    assert reader.next_frame() == b"first"
+    assert reader.next_frame() == b"third"
+    assert reader.dropped_bytes == 4 + len(broken)
+    assert reader.dropped_frames == 2
+
+
+def test_socket_frames(pair):
+    transport, peer = pair
+    transport.send_frame(b"hello")
+    assert peer.recv(16) == b"\x00\x05hello"
+
+    # Messages split and merged arbitrarily by the stream
+    peer.sendall(b"\x00\x03ab")
+    peer.sendall(b"c\x00\x01d\x00")
+    assert transport.recv_frame() == b"abc"
+    assert transport.recv_frame() == b"d"
+
+    # The rest of the third message never comes
+    with pytest.raises(TimeoutError):
+        transport.recv_frame()
+
+
+def test_socket_reset_input_buffer(pair):
+    transport, peer = pair
+    peer.sendall(b"\x00\x02xy\x00\x03z")
+    assert transport.recv_frame() == b"xy"
+    assert transport.in_waiting > 0
+    transport.reset_input_buffer()
+    assert transport.in_waiting == 0
+
+
+def test_socket_closed(pair):
+    transport, peer = pair
+    peer.close()
+    with pytest.raises(ConnectionError):
+        transport.recv_frame()
+
+
+@pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="no AF_UNIX")
+def test_open_unix_socket(tmp_path):
+    path = str(tmp_path / "dsp.sock")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+        server.bind(path)
+        server.listen(1)
+        transport = open_transport(f"unix://{path}", 0, 1.0)
+        conn, _ = server.accept()
+        with conn:
+            conn.sendall(b"\x00\x02ok")
+            assert transport.recv_frame() == b"ok"
+        transport.close()
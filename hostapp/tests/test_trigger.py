@@ -0,0 +1,94 @@
+# pylint: disable=missing-module-docstring
+
+import numpy as np
+import pytest
+
+from oscillodsp.oscillodsp_pb2 import (  # pylint: disable=no-name-in-module
+    FallingEdge,
+    RisingEdge,
+)
+from oscillodsp.trigger import TriggerEngine, find_edges, hysteresis
+
+
+def stream(n_periods=5, period=100):
+    """
+    Return (2, samples) of a sawtooth wave with noise around zero, and its
+    negation
+    """
+    rng = np.random.default_rng(0)
+    ramp = np.tile(np.arange(period) - period // 2, n_periods) * 100
+    ramp += rng.integers(-20, 21, ramp.size)
+    return np.stack([ramp, -ramp]).astype(np.int32)
+
+
+def test_find_edges():
+    # Noise around the level doesn't trigger again until re-armed
+    samples = [0, -5, -20, 5, -5, 10, -3, -11, 0, 1]
+    edges, armed = find_edges(samples, 0, 10, RisingEdge)
+    assert edges.tolist() == [3, 8]
+    assert not armed
+
+    edges, armed = find_edges(np.negative(samples), 0, 10, FallingEdge)
+    assert edges.tolist() == [3, 8]
+
+    # Armed by the previous block
+    assert find_edges([5], 0, 10, RisingEdge, True)[0].tolist() == [0]
+    assert find_edges([-11], 0, 10, RisingEdge)[1]
+    assert find_edges([], 0, 10, RisingEdge, True)[1]
+
+    with pytest.raises(ValueError):
+        find_edges(samples, 0, 10, 99)
+
+
+def test_hysteresis():
+    assert hysteresis(16) == 983
+    assert hysteresis(8) == 3
+
+
+@pytest.mark.parametrize("block_size", [1, 7, 100, 1000])
+def test_trigger_engine_blocks(block_size):
+    samples = stream()
+    engine = TriggerEngine(0, margin=1000, pre=30, post=60)
+    triggers = []
+    for start in range(0, samples.shape[1], block_size):
+        triggers += engine.feed(samples[:, start : start + block_size])
+
+    # Every edge is found once regardless of block boundaries.  The last
+    # window isn't completed.
+    positions = [trigger.position for trigger in triggers]
+    assert len(positions) == 4
+    assert np.all(np.abs(np.array(positions) % 100 - 50) <= 1)
+    for trigger in triggers:
+        assert trigger.samples.shape == (2, 90)
+        assert np.array_equal(
+            trigger.samples,
+            samples[:, trigger.position - 30 : trigger.position + 60],
+        )
+        assert trigger.samples[0, 30] >= 0 > trigger.samples[0, 29]
+
+    # Falling edges of the other channel are the same
+    engine = TriggerEngine(
+        0, FallingEdge, ch_trig=1, margin=1000, pre=30, post=60
+    )
+    assert [trigger.position for trigger in engine.feed(samples)] == (
+        positions
+    )
+
+
+def test_trigger_engine_holdoff():
+    samples = stream()
+
+    # The first edge comes too early for the window
+    engine = TriggerEngine(0, margin=1000, pre=60, post=10)
+    triggers = engine.feed(samples)
+    assert len(triggers) == 4
+    assert engine.dropped == 1
+
+    # Edges within the hold-off are ignored
+    engine = TriggerEngine(0, margin=1000, pre=0, post=10, holdoff=150)
+    positions = [trigger.position for trigger in engine.feed(samples)]
+    assert len(positions) == 3
+    assert np.all(np.abs(np.diff(positions) - 200) <= 2)
+
+    with pytest.raises(ValueError):
+        TriggerEngine(0, margin=0)
@@ -0,0 +1,168 @@
+# pylint: disable=missing-module-docstring
+
+import numpy as np
+import pytest
+
+from oscillodsp.oscillodsp_pb2 import (  # pylint: disable=no-name-in-module
+    MessageToHost,
+)
+from oscillodsp.wavedecode import (
+    ENCODING_FRAME_DELTA,
+    ENCODING_SAMPLE_DELTA,
+    DeltaDecoder,
+    NotWaveGroupError,
+    decode_message,
+    decode_packed_sint32,
+    decode_raw_samples,
+    varint_bytes,
+)
+
+
+def wavegroup_message(samples, msg_id=1, triggered=True):
+    msg = MessageToHost()
+    msg.id = msg_id
+    msg.wavegroup.triggered = triggered
+    for ch_id, row in enumerate(samples):
+        wave = msg.wavegroup.wave.add()
+        wave.ch_id = ch_id
+        wave.samples.extend(int(_) for _ in row)
+    return msg.SerializeToString()
+
+
+def pack_raw(row, bits):
+    """
+    Pack samples as the DSP does for Wave.packed_samples
+    """
+    if bits in [8, 16]:
+        return np.asarray(row).astype(f"<i{bits // 8:d}").tobytes()
+    data = bytearray()
+    for i, val in enumerate(row):
+        if i % 2 == 0:
+            data += bytes([val & 0xFF, (val >> 8) & 0x0F])
+        else:
+            data[-1] |= (val & 0x0F) << 4
+            data.append((val >> 4) & 0xFF)
+    return bytes(data)
+
+
+def raw_wavegroup_message(samples, bits):
+    msg = MessageToHost()
+    msg.id = 1
+    msg.wavegroup.triggered = True
+    for ch_id, row in enumerate(samples):
+        wave = msg.wavegroup.wave.add()
+        wave.ch_id = ch_id
+        wave.packed_samples = pack_raw([int(_) for _ in row], bits)
+    return msg.SerializeToString()
+
+
+@pytest.mark.parametrize("bits", [8, 12, 16, 32])
+def test_decode_message(bits):
+    rng = np.random.default_rng(bits)
+    samples = rng.integers(-(1 << (bits - 1)), 1 << (bits - 1), (2, 500))
+    samples[0, :4] = [0, -1, (1 << (bits - 1)) - 1, -(1 << (bits - 1))]
+
+    msg_id, waves = decode_message(wavegroup_message(samples, msg_id=300))
+
+    assert msg_id == 300
+    assert waves.triggered
+    assert waves.samples.dtype == np.int32
+    assert np.array_equal(waves.samples, samples)
+    assert len(waves.wave) == 2
+    assert waves.wave[1].ch_id == 1
+    assert np.array_equal(waves.wave[1].samples, samples[1])
+
+
+def test_decode_message_out():
+    out = np.zeros((2, 10), dtype=np.int32)
+    samples = np.arange(20).reshape(2, 10) - 10
+    _, waves = decode_message(wavegroup_message(samples), out)
+    assert waves.samples is out
+    assert np.array_equal(out, samples)
+
+    # A new array is allocated if the shape doesn't match
+    _, waves = decode_message(wavegroup_message(samples[:, :5]), out)
+    assert waves.samples is not out
+    assert waves.samples.shape == (2, 5)
+
+
+def test_decode_message_no_waves():
+    _, waves = decode_message(wavegroup_message([], triggered=False))
+    assert not waves.triggered
+    assert len(waves.wave) == 0
+
+
+def test_decode_message_not_wavegroup():
+    msg = MessageToHost()
+    msg.id = 1
+    msg.echorep.content = "hello"
+    with pytest.raises(NotWaveGroupError):
+        decode_message(msg.SerializeToString())
+
+
+def test_decode_message_truncated():
+    s = wavegroup_message([[1000] * 10])
+    with pytest.raises(NotWaveGroupError):
+        decode_message(s[:-1])
+
+
+def test_decode_packed_sint32():
+    # Zigzag: 0 -> 0, -1 -> 1, 1 -> 2, -2 -> 3, 150 -> 300 (0xac 0x02)
+    data = bytes([0x00, 0x01, 0x02, 0x03, 0xAC, 0x02])
+    assert list(decode_packed_sint32(data)) == [0, -1, 1, -2, 150]
+
+
+@pytest.mark.parametrize("bits", [8, 12, 16])
+@pytest.mark.parametrize("n_samples", [500, 7])
+def test_decode_message_raw(bits, n_samples):
+    rng = np.random.default_rng(bits)
+    low, high = -(1 << (bits - 1)), 1 << (bits - 1)
+    samples = rng.integers(low, high, (2, n_samples))
+    samples[0, :4] = [0, -1, high - 1, low]
+
+    data = raw_wavegroup_message(samples, bits)
+    _, waves = decode_message(data, sample_bits=bits)
+    assert waves.samples.dtype == np.int32
+    assert np.array_equal(waves.samples, samples)
+
+    # Raw samples can't be decoded without negotiated sample bits
+    with pytest.raises(NotWaveGroupError):
+        decode_message(data)
+
+
+def test_decode_raw_samples_truncated():
+    with pytest.raises(NotWaveGroupError):
+        decode_raw_samples(b"\x00\x01\x02", 16)
+    with pytest.raises(NotWaveGroupError):
+        decode_raw_samples(b"\x00\x01\x02\x03", 12)
+    with pytest.raises(NotWaveGroupError):
+        decode_raw_samples(b"\x00", 10)
+
+
+def test_varint_bytes():
+    samples = np.array([[0, -1, 63, -64, 64, 8191, -8192, 8192, -(1 << 31)]])
+    _, waves = decode_message(wavegroup_message(samples))
+    assert varint_bytes(samples) == waves.payload_bytes == 4 + 2 * 3 + 3 + 5
+
+
+def test_delta_decoder_sample_delta():
+    samples = np.array([[5, -2, 3, 0], [0, 1, 1, 1]])
+    _, waves = decode_message(wavegroup_message(samples))
+    assert DeltaDecoder().decode(waves, ENCODING_SAMPLE_DELTA)
+    assert waves.samples.tolist() == [[5, 3, 6, 6], [0, 1, 2, 3]]
+
+
+def test_delta_decoder_frame_delta():
+    decoder = DeltaDecoder()
+    frames = []
+    for seq, delta, row in [(1, False, [10, 20]), (2, True, [1, -1])]:
+        _, waves = decode_message(wavegroup_message([row]))
+        waves.frame_seq, waves.delta = seq, delta
+        frames.append(waves)
+    assert decoder.decode(frames[0], ENCODING_FRAME_DELTA)
+    assert decoder.decode(frames[1], ENCODING_FRAME_DELTA)
+    assert frames[1].samples.tolist() == [[11, 19]]
+
+    # The reference of a delta frame is lost
+    frames[1].frame_seq = 4
+    assert not decoder.decode(frames[1], ENCODING_FRAME_DELTA)
@@ -0,0 +1,23 @@
+_.ch_id  # unused attribute (tests/test_dsp.py:50)
+_.samplerate  # unused attribute (tests/test_dsp.py:57)
+_.default_timescale  # unused attribute (tests/test_dsp.py:58)
+_.max_timescale  # unused attribute (tests/test_dsp.py:59)
+_.unit  # unused attribute (tests/test_dsp.py:63)
+_.min  # unused attribute (tests/test_dsp.py:64)
+_.max  # unused attribute (tests/test_dsp.py:65)
+_.read  # unused method (tests/test_dsp.py:73)
+_.out_waiting  # unused property (tests/test_dsp.py:84)
+_.reset_input_buffer  # unused method (tests/test_dsp.py:88)
+_.reset_output_buffer  # unused method (tests/test_dsp.py:91)
+fixture_target  # unused function (tests/test_dsp.py:95)
+_.packed_samples  # unused attribute (tests/test_dsp.py:91)
+fixture_filename  # unused function (tests/test_playback.py:19)
+_.err  # unused attribute (tests/test_playback.py:22)
+_.timestamp  # unused attribute (tests/test_playback.py:38)
+fixture_pair  # unused function (tests/test_transport.py:14)
+_.packed_samples  # unused attribute (tests/test_wavedecode.py:51)
+fixture_peers  # unused function (tests/test_session.py:36)
+fixture_interface  # unused function (tests/test_asyncdsp.py:20)
+_.recvd_total  # unused attribute (tests/test_capture.py:92)
+fixture_broker  # unused function (tests/test_broker.py:28)
+fixture_ring  # unused function (tests/test_shmring.py:12)
@@ -28,18 +28,33 @@ OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 /*
  * UART Abstraction Layer for POSIX
  *
+ * A pseudo terminal is used as UART by default.  If a URL is given by
+ * comdrv_set_url(), a TCP ("tcp://host:port") or Unix-domain socket
+ * ("unix:///path") is listened on instead, and a connection from the
+ * host is used as UART.
+ *
  * Written by Atsushi Yokoyama, Firmlogics (contact@flogics.com)
  */
 
 
 #undef DEBUG_READ
 #define PTYNAME_FILE    "ptyname.txt"
+#define XMIT_BUF_SIZE   (64 * 1024)
+#define SOCKET_BUF_SIZE (4 * 1024 * 1024)
 
 #include <stdio.h>
 #include <fcntl.h>
+#include <netdb.h>
+#include <signal.h>
 #include <stdlib.h>
+#include <string.h>
+#include <time.h>
 #include <unistd.h>
+#include <netinet/in.h>
+#include <netinet/tcp.h>
 #include <sys/select.h>
+#include <sys/socket.h>
+#include <sys/un.h>
 #include "pb.h"
 #include "config.h"
 #include "comdrv.h"
@@ -47,6 +62,150 @@ OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 
 static int fd_tty;
+static const char *listen_url = NULL;
+static int fd_listen = -1;
+static uint8_t xmit_buf[XMIT_BUF_SIZE];
+static int xmit_len = 0;
+
+
+/**
+ * Set URL to listen on instead of using a pseudo terminal
+ */
+void comdrv_set_url(const char *url)
+{
+    listen_url = url;
+}
+
+
+/**
+ * Create a socket listening on listen_url
+ *
+ * @return -1 if failed, otherwise file descriptor of the socket
+ */
+static int open_listener(void)
+{
+    int fd;
+    int on = 1;
+
+    if (strncmp(listen_url, "unix://", 7) == 0) {
+        struct sockaddr_un addr;
+
+        memset(&addr, 0, sizeof(addr));
+        addr.sun_family = AF_UNIX;
+        strncpy(addr.sun_path, listen_url + 7, sizeof(addr.sun_path) - 1);
+        unlink(addr.sun_path);
+
+        fd = socket(AF_UNIX, SOCK_STREAM, 0);
+        if (fd < 0 || bind(fd, (struct sockaddr *) &addr, sizeof(addr)) < 0)
+            return -1;
+    } else if (strncmp(listen_url, "tcp://", 6) == 0) {
+        char host[256];
+        char *port;
+        struct addrinfo hints;
+        struct addrinfo *res;
+
+        strncpy(host, listen_url + 6, sizeof(host) - 1);
+        host[sizeof(host) - 1] = '\0';
+        port = strrchr(host, ':');
+        if (port == NULL)
+            return -1;
+        *port++ = '\0';
+
+        memset(&hints, 0, sizeof(hints));
+        hints.ai_family = AF_UNSPEC;
+        hints.ai_socktype = SOCK_STREAM;
+        hints.ai_flags = AI_PASSIVE;
+        if (getaddrinfo(host[0] ? host : NULL, port, &hints, &res) != 0)
+            return -1;
+
+        fd = socket(res->ai_family, res->ai_socktype, res->ai_protocol);
+        if (fd >= 0) {
+            setsockopt(fd, SOL_SOCKET, SO_REUSEADDR, &on, sizeof(on));
+            if (bind(fd, res->ai_addr, res->ai_addrlen) < 0) {
+                close(fd);
+                fd = -1;
+            }
+        }
+        freeaddrinfo(res);
+        if (fd < 0)
+            return -1;
+    } else {
+        return -1;
+    }
+
+    if (listen(fd, 1) < 0) {
+        close(fd);
+        return -1;
+    }
+
+    return fd;
+}
+
+
+/**
+ * Wait for a connection from host
+ */
+static int accept_host(void)
+{
+    int on = 1;
+    int size = SOCKET_BUF_SIZE;
+
+    if (fd_listen < 0) {
+        fd_listen = open_listener();
+        if (fd_listen < 0) {
+            perror(listen_url);
+            exit(1);
+        }
+
+        /*
+         * Host may disconnect while replies are being written.  Then
+         * write() fails instead of killing the simulator, and the next
+         * host is waited for.
+         */
+        signal(SIGPIPE, SIG_IGN);
+    }
+
+    printf("listening: %s\n", listen_url);
+    fflush(stdout);
+
+    fd_tty = accept(fd_listen, NULL, NULL);
+    if (fd_tty < 0) {
+        perror("accept");
+        exit(1);
+    }
+
+    /*
+     * Messages are written at once by comdrv_flush(), so don't delay them.
+     * (This fails harmlessly on Unix-domain sockets.)
+     */
+    setsockopt(fd_tty, IPPROTO_TCP, TCP_NODELAY, &on, sizeof(on));
+    setsockopt(fd_tty, SOL_SOCKET, SO_SNDBUF, &size, sizeof(size));
+    setsockopt(fd_tty, SOL_SOCKET, SO_RCVBUF, &size, sizeof(size));
+
+    return 0;
+}
+
+
+/**
+ * Read exactly len bytes
+ *
+ * @return 0 if succeeded, otherwise -1 (e.g. connection closed by host)
+ */
+static int read_full(void *buf, int len)
+{
+    uint8_t *p = buf;
+    int ret;
+
+    while (len > 0) {
+        ret = read(fd_tty, p, len);
+        if (ret <= 0)
+            return -1;
+        p += ret;
+        len -= ret;
+    }
+
+    return 0;
+}
 
 
 /**
@@ -60,6 +219,11 @@ int comdrv_init(void)
     extern int unlockpt(int fd);
     FILE *fp;
 
+    xmit_len = 0;
+
+    if (listen_url)
+        return accept_host();
+
     fd_tty = posix_openpt(O_RDWR | O_NOCTTY);
     printf("ptsname: %s\n", ptsname(fd_tty));
 
@@ -81,6 +245,7 @@ void comdrv_restart(void)
 {
     printf("cmp_proc(): len < -1\n");
     fflush(stdout);
+    xmit_len = 0;
     close(fd_tty);
     oscillo_reinit();
     comdrv_init();
@@ -91,12 +256,13 @@ void comdrv_restart(void)
  * Read a protobuf msg from UART
  *
  * @return -1 if no bytes are available, -2 if null message received,
- *         -3 if buf is too short to store message, otherwise length of
- *         received message
+ *         -3 if buf is too short to store message, -4 if failed to read
+ *         (e.g. connection closed by host), otherwise length of received
+ *         message
  */
 int comdrv_read_protobuf(pb_byte_t *buf, int max_len)
 {
-    char c;
+    uint8_t c[2];
     int len;        // Only 16 LSB are used to store message length
     int ret;        // Return-value.  Length or error code
     fd_set rfds;
@@ -115,11 +281,12 @@ int comdrv_read_protobuf(pb_byte_t *buf, int max_len)
     if (ret == 0)
         return -1;
 
-    ret = read(fd_tty, &c, 1);
-    len = (int) c << 8;   // Store it as upper part of length
-
-    read(fd_tty, &c, 1);
-    len |= (int) c;  // Then lower part of length
+    /*
+     * Read length.  Upper part comes first.
+     */
+    if (read_full(c, 2) < 0)
+        return -4;
+    len = (int) c[0] << 8 | c[1];
 
     ret = len;  // Set length as return value, but may be overwritten later
 
@@ -140,7 +307,12 @@ int comdrv_read_protobuf(pb_byte_t *buf, int max_len)
      * Actually read message bytes from UART.  Never store bytes which don't
      * fit into the buffer.
      */
-    read(fd_tty, buf, len);
+    if (read_full(buf, len > max_len ? max_len : len) < 0)
+        return -4;
+    for (int i = max_len; i < len; i ++) {
+        if (read_full(c, 1) < 0)
+            return -4;
+    }
 
 #ifdef DEBUG_READ
     if (len > 16)
@@ -155,15 +327,23 @@ int comdrv_read_protobuf(pb_byte_t *buf, int max_len)
 
 
 /**
- * Write a block of bytes to UART.
+ * Write a block of bytes to UART.  Bytes are buffered until comdrv_flush()
+ * so that a message is written by a single write().
  *
- * @return -1 if no bytes are available, -2 if null message received,
- *         -3 if buf is too short to store message, otherwise length of
- *         received message
+ * @return len
  */
 int comdrv_write_block(const uint8_t *s, int len)
 {
-    return write(fd_tty, s, len);
+    if (xmit_len + len > XMIT_BUF_SIZE)
+        comdrv_flush();
+
+    if (len > XMIT_BUF_SIZE)
+        return write(fd_tty, s, len);
+
+    memcpy(xmit_buf + xmit_len, s, len);
+    xmit_len += len;
+
+    return len;
 }
 
 
@@ -172,9 +352,9 @@ int comdrv_write_block(const uint8_t *s, int len)
  */
 int comdrv_ensure_xmit_buffer_available(int len)
 {
-    /*
-     * In POSIX environment, write() usually blocks so we do nothing here.
-     */
+    if (xmit_len + len > XMIT_BUF_SIZE)
+        comdrv_flush();
+
     return 0;
 }
 
@@ -184,9 +364,17 @@ int comdrv_ensure_xmit_buffer_available(int len)
  */
 int comdrv_flush(void)
 {
-    /*
-     * POSIX write() doesn't require flush.
-     */
+    int pos = 0;
+    int ret;
+
+    while (pos < xmit_len) {
+        ret = write(fd_tty, xmit_buf + pos, xmit_len - pos);
+        if (ret <= 0)
+            break;
+        pos += ret;
+    }
+    xmit_len = 0;
+
     return 0;
 }
 
@@ -198,3 +386,16 @@ int comdrv_terminate(void)
 {
     exit(0);
 }
+
+
+/**
+ * Return free-running time in milliseconds
+ */
+uint32_t comdrv_get_msec(void)
+{
+    struct timespec ts;
+
+    clock_gettime(CLOCK_MONOTONIC, &ts);
+
+    return (uint32_t) ts.tv_sec * 1000 + ts.tv_nsec / 1000000;
+}
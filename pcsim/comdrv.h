@@ -1,5 +1,6 @@
 #ifndef __COMDRV_H__
 
+void comdrv_set_url(const char *url);
 int comdrv_init(void);
 void comdrv_restart(void);
 int comdrv_read_protobuf(pb_byte_t *buf, int max_len);
@@ -7,6 +8,7 @@ int comdrv_write_block(const uint8_t *s, int len);
 int comdrv_ensure_xmit_buffer_available(int len);
 int comdrv_flush(void);
 int comdrv_terminate(void);
+uint32_t comdrv_get_msec(void);
 
 #define __COMDRV_H__
 #endif /* ! defined(__COMDRV_H__) */
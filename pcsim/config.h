@@ -30,6 +30,7 @@ typedef float sample_t;
 typedef short buffer_t;
 enum oscillo {
     LEN_BUFFER = 16384,
+    KEYFRAME_INTERVAL = 32,     /* WaveGroups between key frames */
 };
 static const float HIST_MARGIN_X = 0.01f;
 static const float HIST_MARGIN_Y = 0.015f;
@@ -34,6 +34,7 @@ OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 #include <sys/time.h>
 #include "com.h"
+#include "comdrv.h"
 #include "oscillo.h"
 
 int main(int argc, char **argv)
@@ -44,6 +45,13 @@ int main(int argc, char **argv)
     int ch1;
     int ch2;
 
+    /*
+     * A URL (tcp://host:port or unix:///path) may be given to use a socket
+     * instead of a pseudo terminal
+     */
+    if (argc > 1)
+        comdrv_set_url(argv[1]);
+
     com_init();
     oscillo_init(1e6, 1e-3);
 
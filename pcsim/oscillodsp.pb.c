@@ -15,6 +15,12 @@ PB_BIND(GetWaveGroup, GetWaveGroup, AUTO)
 PB_BIND(Terminate, Terminate, AUTO)
 
 
+PB_BIND(StartStream, StartStream, AUTO)
+
+
+PB_BIND(StopStream, StopStream, AUTO)
+
+
 PB_BIND(Configure, Configure, AUTO)
 
 
@@ -36,10 +42,12 @@ PB_BIND(ConfigReply, ConfigReply, AUTO)
 PB_BIND(Wave, Wave, 2)
 
 
-PB_BIND(WaveGroup, WaveGroup, 2)
+PB_BIND(WaveGroup, WaveGroup, 4)
+
+
+PB_BIND(MessageToHost, MessageToHost, 4)
 
 
-PB_BIND(MessageToHost, MessageToHost, 2)
 
 
 
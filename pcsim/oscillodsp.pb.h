@@ -30,6 +30,16 @@ typedef enum _TriggerType {
     TriggerType_FallingEdge = 1
 } TriggerType;
 
+/* Encodings of Wave.samples.  With SampleDelta, each sample is the
+ difference from the previous sample in the Wave.  With FrameDelta, each
+ sample is the difference from the same sample of the previous WaveGroup
+ if WaveGroup.delta is set. */
+typedef enum _Encoding {
+    Encoding_Plain = 0,
+    Encoding_SampleDelta = 1,
+    Encoding_FrameDelta = 2
+} Encoding;
+
 /* Struct definitions */
 /* Definitions of messages from host to DSP */
 typedef struct _EchoRequest {
@@ -37,13 +47,22 @@ typedef struct _EchoRequest {
 } EchoRequest;
 
 typedef struct _GetWaveGroup {
-    char dummy_field;
+    bool has_keyframe;
+    bool keyframe; /* request a WaveGroup without FrameDelta */
 } GetWaveGroup;
 
 typedef struct _Terminate {
     char dummy_field;
 } Terminate;
 
+typedef struct _StartStream {
+    float max_rate; /* frames per second, 0.0 means no limit */
+} StartStream;
+
+typedef struct _StopStream {
+    char dummy_field;
+} StopStream;
+
 typedef struct _Configure {
     uint32_t resolution; /* quantization bits of Wave sample */
     TriggerMode trigmode;
@@ -51,6 +70,12 @@ typedef struct _Configure {
     uint32_t ch_trig;
     float triglevel;
     float timescale; /* 0.0 means "no timescale update" */
+    bool has_crc;
+    bool crc; /* request sync word and CRC on messages to host */
+    bool has_compact;
+    bool compact; /* request Wave.packed_samples */
+    bool has_encoding;
+    Encoding encoding; /* request encoding of Wave.samples */
 } Configure;
 
 typedef struct _MessageToDSP {
@@ -61,6 +86,8 @@ typedef struct _MessageToDSP {
         Configure config;
         GetWaveGroup getwave;
         Terminate terminate;
+        StartStream startstream; /* WaveGroups follow with this ID */
+        StopStream stopstream;
     } payload;
 } MessageToDSP;
 
@@ -87,17 +114,35 @@ typedef struct _ConfigReply {
     float max_timescale;
     pb_size_t chconfig_count;
     ChannelConfig chconfig[2];
+    bool has_crc;
+    bool crc; /* sync word and CRC follow from the next message */
+    bool has_sample_bits;
+    uint32_t sample_bits; /* of Wave.packed_samples (8, 12 or 16) */
+    bool has_encoding;
+    Encoding encoding; /* of Wave.samples */
 } ConfigReply;
 
+typedef PB_BYTES_ARRAY_T(1000) Wave_packed_samples_t;
+/* If ConfigReply.sample_bits is set, samples are sent in packed_samples
+ instead of samples.  packed_samples holds two's complement samples in
+ little endian, by 8 or 16 bits each, or by 12 bits (two samples in three
+ bytes, and the first sample takes the lower 12 bits). */
 typedef struct _Wave {
     uint32_t ch_id;
+    pb_size_t samples_count;
     int32_t samples[500];
+    bool has_packed_samples;
+    Wave_packed_samples_t packed_samples;
 } Wave;
 
 typedef struct _WaveGroup {
     bool triggered;
     pb_size_t wave_count;
     Wave wave[2];
+    bool has_frame_seq;
+    uint32_t frame_seq; /* counts WaveGroups with FrameDelta */
+    bool has_delta;
+    bool delta; /* differences from WaveGroup of frame_seq - 1 */
 } WaveGroup;
 
 typedef struct _MessageToHost {
@@ -129,11 +174,18 @@ extern "C" {
 #define _TriggerType_MAX TriggerType_FallingEdge
 #define _TriggerType_ARRAYSIZE ((TriggerType)(TriggerType_FallingEdge+1))
 
+#define _Encoding_MIN Encoding_Plain
+#define _Encoding_MAX Encoding_FrameDelta
+#define _Encoding_ARRAYSIZE ((Encoding)(Encoding_FrameDelta+1))
+
+
+
 
 
 
 #define Configure_trigmode_ENUMTYPE TriggerMode
 #define Configure_trigtype_ENUMTYPE TriggerType
+#define Configure_encoding_ENUMTYPE Encoding
 
 
 #define Acknowledge_err_ENUMTYPE ErrorCode
@@ -141,6 +193,7 @@ extern "C" {
 
 
 #define ConfigReply_err_ENUMTYPE ErrorCode
+#define ConfigReply_encoding_ENUMTYPE Encoding
 
 
 
@@ -148,43 +201,54 @@ extern "C" {
 
 /* Initializer values for message structs */
 #define EchoRequest_init_default                 {""}
-#define GetWaveGroup_init_default                {0}
+#define GetWaveGroup_init_default                {false, 0}
 #define Terminate_init_default                   {0}
-#define Configure_init_default                   {0, _TriggerMode_MIN, _TriggerType_MIN, 0, 0, 0}
+#define StartStream_init_default                 {0}
+#define StopStream_init_default                  {0}
+#define Configure_init_default                   {0, _TriggerMode_MIN, _TriggerType_MIN, 0, 0, 0, false, 0, false, 0, false, _Encoding_MIN}
 #define MessageToDSP_init_default                {0, 0, {EchoRequest_init_default}}
 #define Acknowledge_init_default                 {_ErrorCode_MIN}
 #define EchoReply_init_default                   {""}
 #define ChannelConfig_init_default               {"", "", 0, 0}
-#define ConfigReply_init_default                 {_ErrorCode_MIN, 0, 0, 0, 0, {ChannelConfig_init_default, ChannelConfig_init_default}}
-#define Wave_init_default                        {0, {0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0}}
-#define WaveGroup_init_default                   {0, 0, {Wave_init_default, Wave_init_default}}
+#define ConfigReply_init_default                 {_ErrorCode_MIN, 0, 0, 0, 0, {ChannelConfig_init_default, ChannelConfig_init_default}, false, 0, false, 0, false, _Encoding_MIN}
+#define Wave_init_default                        {0, 0, {0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0}, false, {0, {0}}}
+#define WaveGroup_init_default                   {0, 0, {Wave_init_default, Wave_init_default}, false, 0, false, 0}
 #define MessageToHost_init_default               {0, 0, {Acknowledge_init_default}}
 #define EchoRequest_init_zero                    {""}
-#define GetWaveGroup_init_zero                   {0}
+#define GetWaveGroup_init_zero                   {false, 0}
 #define Terminate_init_zero                      {0}
-#define Configure_init_zero                      {0, _TriggerMode_MIN, _TriggerType_MIN, 0, 0, 0}
+#define StartStream_init_zero                    {0}
+#define StopStream_init_zero                     {0}
+#define Configure_init_zero                      {0, _TriggerMode_MIN, _TriggerType_MIN, 0, 0, 0, false, 0, false, 0, false, _Encoding_MIN}
 #define MessageToDSP_init_zero                   {0, 0, {EchoRequest_init_zero}}
 #define Acknowledge_init_zero                    {_ErrorCode_MIN}
 #define EchoReply_init_zero                      {""}
 #define ChannelConfig_init_zero                  {"", "", 0, 0}
-#define ConfigReply_init_zero                    {_ErrorCode_MIN, 0, 0, 0, 0, {ChannelConfig_init_zero, ChannelConfig_init_zero}}
-#define Wave_init_zero                           {0, {0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0}}
-#define WaveGroup_init_zero                      {0, 0, {Wave_init_zero, Wave_init_zero}}
+#define ConfigReply_init_zero                    {_ErrorCode_MIN, 0, 0, 0, 0, {ChannelConfig_init_zero, ChannelConfig_init_zero}, false, 0, false, 0, false, _Encoding_MIN}
+#define Wave_init_zero                           {0, 0, {0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0}, false, {0, {0}}}
+#define WaveGroup_init_zero                      {0, 0, {Wave_init_zero, Wave_init_zero}, false, 0, false, 0}
 #define MessageToHost_init_zero                  {0, 0, {Acknowledge_init_zero}}
 
 /* Field tags (for use in manual encoding/decoding) */
 #define EchoRequest_content_tag                  1
+#define GetWaveGroup_keyframe_tag                1
+#define StartStream_max_rate_tag                 1
 #define Configure_resolution_tag                 1
 #define Configure_trigmode_tag                   2
 #define Configure_trigtype_tag                   3
 #define Configure_ch_trig_tag                    4
 #define Configure_triglevel_tag                  5
 #define Configure_timescale_tag                  6
+#define Configure_crc_tag                        7
+#define Configure_compact_tag                    8
+#define Configure_encoding_tag                   9
 #define MessageToDSP_id_tag                      1
 #define MessageToDSP_echoreq_tag                 2
 #define MessageToDSP_config_tag                  3
 #define MessageToDSP_getwave_tag                 4
 #define MessageToDSP_terminate_tag               5
+#define MessageToDSP_startstream_tag             6
+#define MessageToDSP_stopstream_tag              7
 #define Acknowledge_err_tag                      1
 #define EchoReply_content_tag                    1
 #define ChannelConfig_name_tag                   1
@@ -196,10 +260,16 @@ extern "C" {
 #define ConfigReply_default_timescale_tag        3
 #define ConfigReply_max_timescale_tag            4
 #define ConfigReply_chconfig_tag                 5
+#define ConfigReply_crc_tag                      6
+#define ConfigReply_sample_bits_tag              7
+#define ConfigReply_encoding_tag                 8
 #define Wave_ch_id_tag                           1
 #define Wave_samples_tag                         2
+#define Wave_packed_samples_tag                  3
 #define WaveGroup_triggered_tag                  1
 #define WaveGroup_wave_tag                       2
+#define WaveGroup_frame_seq_tag                  3
+#define WaveGroup_delta_tag                      4
 #define MessageToHost_id_tag                     1
 #define MessageToHost_ack_tag                    2
 #define MessageToHost_echorep_tag                3
@@ -213,7 +283,7 @@ X(a, STATIC,   REQUIRED, STRING,   content,           1)
 #define EchoRequest_DEFAULT NULL
 
 #define GetWaveGroup_FIELDLIST(X, a) \
-
+X(a, STATIC,   OPTIONAL, BOOL,     keyframe,          1)
 #define GetWaveGroup_CALLBACK NULL
 #define GetWaveGroup_DEFAULT NULL
 
@@ -222,13 +292,26 @@ X(a, STATIC,   REQUIRED, STRING,   content,           1)
 #define Terminate_CALLBACK NULL
 #define Terminate_DEFAULT NULL
 
+#define StartStream_FIELDLIST(X, a) \
+X(a, STATIC,   REQUIRED, FLOAT,    max_rate,          1)
+#define StartStream_CALLBACK NULL
+#define StartStream_DEFAULT NULL
+
+#define StopStream_FIELDLIST(X, a) \
+
+#define StopStream_CALLBACK NULL
+#define StopStream_DEFAULT NULL
+
 #define Configure_FIELDLIST(X, a) \
 X(a, STATIC,   REQUIRED, UINT32,   resolution,        1) \
 X(a, STATIC,   REQUIRED, UENUM,    trigmode,          2) \
 X(a, STATIC,   REQUIRED, UENUM,    trigtype,          3) \
 X(a, STATIC,   REQUIRED, UINT32,   ch_trig,           4) \
 X(a, STATIC,   REQUIRED, FLOAT,    triglevel,         5) \
-X(a, STATIC,   REQUIRED, FLOAT,    timescale,         6)
+X(a, STATIC,   REQUIRED, FLOAT,    timescale,         6) \
+X(a, STATIC,   OPTIONAL, BOOL,     crc,               7) \
+X(a, STATIC,   OPTIONAL, BOOL,     compact,           8) \
+X(a, STATIC,   OPTIONAL, UENUM,    encoding,          9)
 #define Configure_CALLBACK NULL
 #define Configure_DEFAULT NULL
 
@@ -237,13 +320,17 @@ X(a, STATIC,   REQUIRED, UINT32,   id,                1) \
 X(a, STATIC,   ONEOF,    MESSAGE,  (payload,echoreq,payload.echoreq),   2) \
 X(a, STATIC,   ONEOF,    MESSAGE,  (payload,config,payload.config),   3) \
 X(a, STATIC,   ONEOF,    MESSAGE,  (payload,getwave,payload.getwave),   4) \
-X(a, STATIC,   ONEOF,    MESSAGE,  (payload,terminate,payload.terminate),   5)
+X(a, STATIC,   ONEOF,    MESSAGE,  (payload,terminate,payload.terminate),   5) \
+X(a, STATIC,   ONEOF,    MESSAGE,  (payload,startstream,payload.startstream),   6) \
+X(a, STATIC,   ONEOF,    MESSAGE,  (payload,stopstream,payload.stopstream),   7)
 #define MessageToDSP_CALLBACK NULL
 #define MessageToDSP_DEFAULT NULL
 #define MessageToDSP_payload_echoreq_MSGTYPE EchoRequest
 #define MessageToDSP_payload_config_MSGTYPE Configure
 #define MessageToDSP_payload_getwave_MSGTYPE GetWaveGroup
 #define MessageToDSP_payload_terminate_MSGTYPE Terminate
+#define MessageToDSP_payload_startstream_MSGTYPE StartStream
+#define MessageToDSP_payload_stopstream_MSGTYPE StopStream
 
 #define Acknowledge_FIELDLIST(X, a) \
 X(a, STATIC,   REQUIRED, UENUM,    err,               1)
@@ -268,20 +355,26 @@ X(a, STATIC,   REQUIRED, UENUM,    err,               1) \
 X(a, STATIC,   REQUIRED, FLOAT,    samplerate,        2) \
 X(a, STATIC,   REQUIRED, FLOAT,    default_timescale,   3) \
 X(a, STATIC,   REQUIRED, FLOAT,    max_timescale,     4) \
-X(a, STATIC,   REPEATED, MESSAGE,  chconfig,          5)
+X(a, STATIC,   REPEATED, MESSAGE,  chconfig,          5) \
+X(a, STATIC,   OPTIONAL, BOOL,     crc,               6) \
+X(a, STATIC,   OPTIONAL, UINT32,   sample_bits,       7) \
+X(a, STATIC,   OPTIONAL, UENUM,    encoding,          8)
 #define ConfigReply_CALLBACK NULL
 #define ConfigReply_DEFAULT NULL
 #define ConfigReply_chconfig_MSGTYPE ChannelConfig
 
 #define Wave_FIELDLIST(X, a) \
 X(a, STATIC,   REQUIRED, UINT32,   ch_id,             1) \
-X(a, STATIC,   FIXARRAY, SINT32,   samples,           2)
+X(a, STATIC,   REPEATED, SINT32,   samples,           2) \
+X(a, STATIC,   OPTIONAL, BYTES,    packed_samples,    3)
 #define Wave_CALLBACK NULL
 #define Wave_DEFAULT NULL
 
 #define WaveGroup_FIELDLIST(X, a) \
 X(a, STATIC,   REQUIRED, BOOL,     triggered,         1) \
-X(a, STATIC,   REPEATED, MESSAGE,  wave,              2)
+X(a, STATIC,   REPEATED, MESSAGE,  wave,              2) \
+X(a, STATIC,   OPTIONAL, UINT32,   frame_seq,         3) \
+X(a, STATIC,   OPTIONAL, BOOL,     delta,             4)
 #define WaveGroup_CALLBACK NULL
 #define WaveGroup_DEFAULT NULL
 #define WaveGroup_wave_MSGTYPE Wave
@@ -302,6 +395,8 @@ X(a, STATIC,   ONEOF,    MESSAGE,  (payload,configreply,payload.configreply),
 extern const pb_msgdesc_t EchoRequest_msg;
 extern const pb_msgdesc_t GetWaveGroup_msg;
 extern const pb_msgdesc_t Terminate_msg;
+extern const pb_msgdesc_t StartStream_msg;
+extern const pb_msgdesc_t StopStream_msg;
 extern const pb_msgdesc_t Configure_msg;
 extern const pb_msgdesc_t MessageToDSP_msg;
 extern const pb_msgdesc_t Acknowledge_msg;
@@ -316,6 +411,8 @@ extern const pb_msgdesc_t MessageToHost_msg;
 #define EchoRequest_fields &EchoRequest_msg
 #define GetWaveGroup_fields &GetWaveGroup_msg
 #define Terminate_fields &Terminate_msg
+#define StartStream_fields &StartStream_msg
+#define StopStream_fields &StopStream_msg
 #define Configure_fields &Configure_msg
 #define MessageToDSP_fields &MessageToDSP_msg
 #define Acknowledge_fields &Acknowledge_msg
@@ -329,17 +426,19 @@ extern const pb_msgdesc_t MessageToHost_msg;
 /* Maximum encoded size of messages (where known) */
 #define Acknowledge_size                         2
 #define ChannelConfig_size                       32
-#define ConfigReply_size                         85
-#define Configure_size                           26
+#define ConfigReply_size                         95
+#define Configure_size                           32
 #define EchoReply_size                           41
 #define EchoRequest_size                         41
-#define GetWaveGroup_size                        0
+#define GetWaveGroup_size                        2
 #define MessageToDSP_size                        49
-#define MessageToHost_size                       6029
+#define MessageToHost_size                       8043
 #define OSCILLODSP_PB_H_MAX_SIZE                 MessageToHost_size
+#define StartStream_size                         5
+#define StopStream_size                          0
 #define Terminate_size                           0
-#define WaveGroup_size                           6020
-#define Wave_size                                3006
+#define WaveGroup_size                           8034
+#define Wave_size                                4009
 
 #ifdef __cplusplus
 } /* extern "C" */
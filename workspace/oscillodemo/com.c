@@ -45,10 +45,19 @@ OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 #define MAX(a, b)   ((a) > (b) ? (a) : (b))
 
+#define SYNC_WORD   0xa55a
+#define CRC_INIT    0xffff
+#define CRC_POLY    0x1021
+
 
 static pb_byte_t stream_buf[MAX(MessageToDSP_size, MessageToHost_size) + 1];
 static MessageToDSP msg;
 static MessageToHost reply;
+static bool crc_framing = false;  // if sync word and CRC are sent to host
+static bool streaming = false;  // if WaveGroups are sent without requests
+static uint32_t stream_id;      // ID of StartStream, put to WaveGroups
+static uint32_t stream_interval_msec;
+static uint32_t stream_last_msec;
 
 int debug_com_ct = 0;   // XXX
 
@@ -56,6 +65,23 @@ int debug_id;   // XXX
 int debug_port; // XXX
 int debug_val;  // XXX
 
+
+/**
+ * Update CRC-16/CCITT-FALSE by bytes
+ */
+static uint16_t crc16_update(uint16_t crc, const uint8_t *buf, int len)
+{
+    int i, bit;
+
+    for (i = 0; i < len; i ++) {
+        crc ^= (uint16_t) buf[i] << 8;
+        for (bit = 0; bit < 8; bit ++)
+            crc = (crc & 0x8000) ? (crc << 1) ^ CRC_POLY : crc << 1;
+    }
+
+    return crc;
+}
+
 /**
  * Reply a message to host
  *
@@ -139,13 +165,66 @@ static int cmd_config(uint32_t id, Configure config)
     ret = oscillo_config(config, &reply.payload.configreply);
     reply.payload.configreply.err =
         (ret == 0) ? ErrorCode_NoError : ErrorCode_ConfigError;
+    reply.payload.configreply.has_crc = true;
+    reply.payload.configreply.crc = config.has_crc && config.crc;
     reply.which_payload = MessageToHost_configreply_tag;
     send_reply(&reply);
 
+    /*
+     * The reply itself is sent in the framing which the host expects now
+     */
+    crc_framing = reply.payload.configreply.crc;
+
     return 0;
 }
 
 
+/**
+ * Start sending WaveGroups without GetWaveGroup requests
+ */
+static int cmd_startstream(uint32_t id, const StartStream *startstream)
+{
+    streaming = true;
+    stream_id = id;
+    stream_interval_msec = 0;
+    if (startstream->max_rate > 0.0f)
+        stream_interval_msec = (uint32_t) (1000.0f / startstream->max_rate);
+    stream_last_msec = comdrv_get_msec() - stream_interval_msec;
+
+    return ack(id, ErrorCode_NoError);
+}
+
+
+/**
+ * Stop sending WaveGroups.  The acknowledgement follows the last WaveGroup.
+ */
+static int cmd_stopstream(uint32_t id)
+{
+    streaming = false;
+
+    return ack(id, ErrorCode_NoError);
+}
+
+
+/**
+ * Send a WaveGroup if streaming and the interval has elapsed
+ */
+static void proc_stream(void)
+{
+    uint32_t now;
+
+    if (! streaming)
+        return;
+
+    now = comdrv_get_msec();
+    if (now - stream_last_msec < stream_interval_msec)
+        return;
+
+    stream_last_msec = now;
+    cmd_getwave(stream_id);
+}
+
+
 /**
  * Decode a message from host
  */
@@ -156,7 +235,6 @@ static int decode_msg(const pb_byte_t *buf, int len)
     int err = 0;
 
     (void) err;
-    (void) ack;
 
     memset(&msg, 0, sizeof(msg));
     status = pb_decode(&stream, MessageToDSP_fields, &msg);
@@ -169,11 +247,20 @@ static int decode_msg(const pb_byte_t *buf, int len)
             cmd_config(msg.id, msg.payload.config);
             break;
         case MessageToDSP_getwave_tag:
+            if (msg.payload.getwave.has_keyframe &&
+                    msg.payload.getwave.keyframe)
+                oscillo_request_keyframe();
             cmd_getwave(msg.id);
             break;
         case MessageToDSP_terminate_tag:
             comdrv_terminate();
             break;
+        case MessageToDSP_startstream_tag:
+            cmd_startstream(msg.id, &msg.payload.startstream);
+            break;
+        case MessageToDSP_stopstream_tag:
+            cmd_stopstream(msg.id);
+            break;
         default:
             // XXX
             break;
@@ -209,15 +296,26 @@ int com_proc(void)
         if (len == -1)
             break;
 
-        if (len < -1)
+        if (len < -1) {
+            crc_framing = false;
+            streaming = false;
             comdrv_restart();
 
+            /*
+             * Nothing has been received.  Don't decode stale bytes in
+             * stream_buf.
+             */
+            continue;
+        }
+
         /*
          * Decode message if available.
          */
         decode_msg(stream_buf, len);
     }
 
+    proc_stream();
+
     return 0;
 }
 
@@ -230,6 +328,8 @@ int com_proc(void)
 int com_send_msg(MessageToHost *reply)
 {
     uint8_t c;
+    uint8_t header[2];
+    uint16_t crc;
 
     pb_ostream_t stream =
         pb_ostream_from_buffer(stream_buf, sizeof(stream_buf));
@@ -242,20 +342,44 @@ int com_send_msg(MessageToHost *reply)
     if (status != true)
         return -1;
 
-    comdrv_ensure_xmit_buffer_available(2 + message_length);
+    comdrv_ensure_xmit_buffer_available(
+            (crc_framing ? 6 : 2) + message_length);
+
+    /*
+     * Send sync word so that host can find the start of message again
+     * after lost or corrupted bytes
+     */
+    if (crc_framing) {
+        c = (SYNC_WORD >> 8) & 0xff;
+        comdrv_write_block(&c, 1);
+        c = SYNC_WORD & 0xff;
+        comdrv_write_block(&c, 1);
+    }
 
     /*
      * Send message length in 16-bit integer
      */
-    c = (message_length >> 8) & 0xff;
-    comdrv_write_block(&c, 1);
-    c = message_length & 0xff;
-    comdrv_write_block(&c, 1);
+    header[0] = (message_length >> 8) & 0xff;
+    header[1] = message_length & 0xff;
+    comdrv_write_block(header, 2);
 
     /*
-     * Finally send the reply message
+     * Then send the reply message
      */
     comdrv_write_block(stream_buf, message_length);
+
+    /*
+     * Finally send CRC of the length and the message
+     */
+    if (crc_framing) {
+        crc = crc16_update(CRC_INIT, header, 2);
+        crc = crc16_update(crc, stream_buf, message_length);
+        c = (crc >> 8) & 0xff;
+        comdrv_write_block(&c, 1);
+        c = crc & 0xff;
+        comdrv_write_block(&c, 1);
+    }
+
     comdrv_flush();
 
     return 0;
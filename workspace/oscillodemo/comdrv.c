@@ -32,6 +32,7 @@ OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
  */
 
 
+#include <ti/sysbios/knl/Clock.h>
 #include "pb.h"
 #include "config.h"
 #include "comdrv.h"
@@ -160,3 +161,13 @@ int comdrv_terminate(void)
 
     return 0;
 }
+
+
+/**
+ * Return free-running time in milliseconds
+ */
+uint32_t comdrv_get_msec(void)
+{
+    // Clock_tickPeriod is in microseconds
+    return Clock_getTicks() * (Clock_tickPeriod / 1000);
+}
@@ -9,6 +9,7 @@ int comdrv_write_block(const uint8_t *s, int len);
 int comdrv_ensure_xmit_buffer_available(int len);
 int comdrv_flush(void);
 int comdrv_terminate(void);
+uint32_t comdrv_get_msec(void);
 
 #define __COMDRV_H__
 #endif /* ! defined(__COMDRV_H__) */
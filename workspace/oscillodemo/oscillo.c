@@ -60,6 +60,10 @@ static ConfigReply config_reply;
 static dsp_channel_config_t dsp_ch_config[N_CHANNELS];
 static int idx_write_buffer[N_CHANNELS];
 static Configure config;
+static int32_t prev_samples[N_CHANNELS][N_WAVE_SAMPLES];  // for FrameDelta
+static bool prev_valid = false;     // if prev_samples can be referred
+static uint32_t frame_seq = 0;
+static int frames_since_keyframe = 0;
 
 
 /**
@@ -158,12 +162,28 @@ int oscillo_init(float sample_rate, float default_timescale)
 
 
 /**
- * Re-initialize oscillo library
+ * Re-initialize oscillo library.  Channels configured by oscillo_config_ch()
+ * are kept.
  */
 int oscillo_reinit(void)
 {
-    return oscillo_init(
+    ChannelConfig chconfig[N_CHANNELS];
+    dsp_channel_config_t ch_config[N_CHANNELS];
+    pb_size_t chconfig_count;
+    int ret;
+
+    chconfig_count = config_reply.chconfig_count;
+    memcpy(chconfig, config_reply.chconfig, sizeof(chconfig));
+    memcpy(ch_config, dsp_ch_config, sizeof(ch_config));
+
+    ret = oscillo_init(
             config_reply.samplerate, config_reply.default_timescale);
+
+    config_reply.chconfig_count = chconfig_count;
+    memcpy(config_reply.chconfig, chconfig, sizeof(chconfig));
+    memcpy(dsp_ch_config, ch_config, sizeof(ch_config));
+
+    return ret;
 }
 
 
@@ -196,6 +216,39 @@ int oscillo_pass_one(int ch, sample_t val)
 }
 
 
+/**
+ * Return number of bits of a sample in Wave.packed_samples, or 0 if
+ * Wave.samples is used
+ */
+static int get_sample_bits(void)
+{
+    if (! (config.has_compact && config.compact))
+        return 0;
+
+    if (config.resolution <= 8)
+        return 8;
+    else if (config.resolution <= 12)
+        return 12;
+    else
+        return 16;
+}
+
+
+/**
+ * Return encoding of Wave.samples
+ */
+static Encoding get_encoding(void)
+{
+    if (! config.has_encoding || get_sample_bits() > 0)
+        return Encoding_Plain;
+
+    if (config.encoding > Encoding_FrameDelta)
+        return Encoding_Plain;
+
+    return config.encoding;
+}
+
+
 /**
  * Configure oscillo mode
  */
@@ -231,6 +284,15 @@ int oscillo_config(Configure arg_config, ConfigReply *arg_config_reply)
     if (arg_config.timescale == 0.0f)
         config.timescale = config_reply.default_timescale;
 
+    /*
+     * Tell how samples are packed if host requested
+     */
+    config_reply.has_sample_bits = config.has_compact && config.compact;
+    config_reply.sample_bits = get_sample_bits();
+    config_reply.has_encoding = config.has_encoding;
+    config_reply.encoding = get_encoding();
+    prev_valid = false;
+
     memcpy(arg_config_reply, &config_reply, sizeof(ConfigReply));
 
     return 0;
@@ -380,6 +442,50 @@ static int get_pos(bool *triggered)
 }
 
 
+/**
+ * Move samples in wave->samples[] to wave->packed_samples
+ *
+ * @param bits is number of bits of a sample (8, 12 or 16)
+ */
+static void pack_samples(Wave *wave, int bits)
+{
+    int i;
+    int32_t val;
+    pb_byte_t *p = wave->packed_samples.bytes;
+
+    for (i = 0; i < N_WAVE_SAMPLES; i ++) {
+        val = wave->samples[i];
+
+        switch (bits) {
+        case 8:
+            *p ++ = val & 0xff;
+            break;
+        case 16:
+            *p ++ = val & 0xff;
+            *p ++ = (val >> 8) & 0xff;
+            break;
+        default:
+            /*
+             * Two samples in three bytes.  The lower 4 bits of the second
+             * sample fill the upper half of the second byte.
+             */
+            if (i % 2 == 0) {
+                *p ++ = val & 0xff;
+                *p ++ = (val >> 8) & 0x0f;
+            } else {
+                p[-1] |= (val & 0x0f) << 4;
+                *p ++ = (val >> 4) & 0xff;
+            }
+            break;
+        }
+    }
+
+    wave->packed_samples.size = p - wave->packed_samples.bytes;
+    wave->has_packed_samples = true;
+    wave->samples_count = 0;
+}
+
+
 /**
  * Return a wave frame
  */
@@ -410,11 +516,76 @@ static int get_wave(int ch, int pos_buf, Wave *wave)
          */
         wave->samples[N_WAVE_SAMPLES - 1 - i] = buffer[ch][idx];
     }
+    wave->samples_count = N_WAVE_SAMPLES;
+
+    if (get_sample_bits() > 0)
+        pack_samples(wave, get_sample_bits());
 
     return 0;
 }
 
 
+/**
+ * Encode samples of waves by the configured encoding
+ */
+static void encode_waves(WaveGroup *waves)
+{
+    int i;
+    int ch;
+    int32_t val;
+    int32_t *samples;
+    bool delta;
+
+    switch (get_encoding()) {
+    case Encoding_SampleDelta:
+        for (ch = 0; ch < waves->wave_count; ch ++) {
+            samples = waves->wave[ch].samples;
+            for (i = N_WAVE_SAMPLES - 1; i > 0; i --)
+                samples[i] -= samples[i - 1];
+        }
+        break;
+
+    case Encoding_FrameDelta:
+        /*
+         * Only triggered frames are aligned to each other.  A key frame is
+         * sent periodically so that host can recover from lost frames.
+         */
+        delta = prev_valid && waves->triggered &&
+            frames_since_keyframe < KEYFRAME_INTERVAL;
+        frames_since_keyframe = delta ? frames_since_keyframe + 1 : 0;
+
+        for (ch = 0; ch < waves->wave_count; ch ++) {
+            samples = waves->wave[ch].samples;
+            for (i = 0; i < N_WAVE_SAMPLES; i ++) {
+                val = samples[i];
+                if (delta)
+                    samples[i] -= prev_samples[ch][i];
+                prev_samples[ch][i] = val;
+            }
+        }
+        prev_valid = waves->triggered;
+
+        waves->has_frame_seq = true;
+        waves->frame_seq = ++ frame_seq;
+        waves->has_delta = true;
+        waves->delta = delta;
+        break;
+
+    default:
+        break;
+    }
+}
+
+
+/**
+ * Make the next WaveGroup a key frame (without FrameDelta)
+ */
+void oscillo_request_keyframe(void)
+{
+    prev_valid = false;
+}
+
+
 /**
  * Return group of wave frames
  */
@@ -441,6 +612,8 @@ int oscillo_get_waves(WaveGroup *waves)
     waves->triggered = triggered;
     waves->wave_count = config_reply.chconfig_count;
 
+    encode_waves(waves);
+
     return 0;
 }
 
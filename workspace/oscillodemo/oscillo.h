@@ -13,6 +13,7 @@ int oscillo_pass_one(int ch, sample_t val);
 int oscillo_config(Configure arg_config, ConfigReply *arg_config_reply);
 int oscillo_config_ch(const char *name, const char *unit, float min, float max);
 int oscillo_get_waves(WaveGroup *waves);
+void oscillo_request_keyframe(void);
 float oscillo_get_demo1_value(bool enabled);
 float oscillo_get_demo2_value(bool enabled);
 float oscillo_get_demo3_value(bool enabled);